@@ -5,7 +5,7 @@ This is the primary docma API for compiling and rendering document templates.
 Typical usage would be:
 
 ```python
-from docma import compile_template, render_template
+from docma import TemplateSession, compile_template, render_template_to_pdf
 
 template_src_dir = 'a/b/c'
 template_location = 'my-template.zip'  # ... or a directory when experimenting
@@ -18,23 +18,38 @@ pdf = render_template_to_pdf(template_location, params)
 
 # We now have a pypdf PdfWriter object. Do with it what you will. e.g.
 pdf.write(pdf_location)
+
+# When rendering the same template many times, use a session instead so that
+# the template is only loaded once.
+with TemplateSession(template_location) as session:
+    for n, params in enumerate(lots_of_params):
+        session.render_pdf(params).write(f'my-doc-{n}.pdf')
 ```
 
 """
 
-from .docma_core import (
-    compile_template as compile_template,
-    get_template_info as get_template_info,
-    read_template_version_info as read_template_version_info,
-    render_template_to_html as render_template_to_html,
-    render_template_to_pdf as render_template_to_pdf,
-    safe_render_path as safe_render_path,
-)
+from __future__ import annotations
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
 from .version import __version__ as __version__
 
+if TYPE_CHECKING:
+    from .docma_core import (
+        TemplateSession as TemplateSession,
+        compile_template as compile_template,
+        get_template_info as get_template_info,
+        read_template_version_info as read_template_version_info,
+        render_template_to_html as render_template_to_html,
+        render_template_to_pdf as render_template_to_pdf,
+        safe_render_path as safe_render_path,
+    )
+
 __author__ = 'Murray Andrews'
 
 __all__ = [
+    'TemplateSession',
     'compile_template',
     'get_template_info',
     'read_template_version_info',
@@ -43,3 +58,25 @@ __all__ = [
     'safe_render_path',
     '__version__',
 ]
+
+
+# ------------------------------------------------------------------------------
+def __getattr__(name: str) -> Any:
+    """
+    Import the API components on first use.
+
+    The core API drags in a lot of slow loading packages so we don't want that
+    to happen for things like `docma --version`.
+    """
+
+    if name in __all__:
+        value = getattr(import_module('.docma_core', __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+# ------------------------------------------------------------------------------
+def __dir__() -> list[str]:
+    """List the API components."""
+    return sorted(set(globals()) | set(__all__))
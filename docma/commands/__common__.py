@@ -2,16 +2,56 @@
 
 from __future__ import annotations
 
+import importlib
 import json
+import multiprocessing
+import os
 import sys
 from abc import ABC, abstractmethod
 from argparse import ArgumentParser, Namespace
+from collections import deque
+from collections.abc import Generator, Iterable, Iterator, Sequence
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import asdict, dataclass
+from functools import cache, partial
+from itertools import tee
+from logging import getLogger
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Callable
+from time import perf_counter, sleep
+from typing import TYPE_CHECKING, Any, Callable
 
 import yaml
 
-from docma.lib.misc import StoreNameValuePair, deep_update_dict
+import docma
+from docma.config import (
+    BATCH_RETRY_DELAY,
+    BATCH_ROW_RETRIES,
+    BATCH_VALIDATE_CHUNK_SIZE,
+    LOGNAME,
+)
+from docma.data_providers import DataSourceSpec, load_data
+from docma.exceptions import DocmaDataProviderError, DocmaError
+from docma.lib.batch import BatchErrorReport, BatchManifest, batch_map
+from docma.lib.lazy import lazy_import
+from docma.lib.logging import setup_logging
+from docma.lib.misc import StoreNameValuePair, deep_update_dict, is_transient_error
+from docma.lib.scope import ParamScope
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from multiprocessing.context import BaseContext
+
+    from docma import TemplateSession
+    from docma.jinja import DocmaRenderContext
+    from docma.lib.packager import PackageReader
+
+LOG = getLogger(LOGNAME)
+
+jsonschema = lazy_import('jsonschema')
+
+# Rendering parameters common to all rows in a batch, in a worker process.
+_BATCH_COMMON_PARAMS: dict[str, Any] = {}
 
 
 # ------------------------------------------------------------------------------
@@ -187,3 +227,522 @@ def marshal_rendering_params(args: Namespace) -> dict[str, Any]:
                 render_params[k] = [s.strip() for s in fp.readlines()]
 
     return render_params
+
+
+# ------------------------------------------------------------------------------
+@cache
+def batch_template_session(template_pkg_name: str) -> TemplateSession:
+    """
+    Get the template session for a batch rendering worker process.
+
+    Each worker process opens the template package once and then reuses the
+    session for every batch item it renders.
+
+    :param template_pkg_name:   Name of the ZIP file / directory containing the
+                                compiled template package.
+    :return:                    A template session.
+    """
+
+    return docma.TemplateSession(template_pkg_name)
+
+
+# ------------------------------------------------------------------------------
+def batch_worker_init(
+    template_pkg_name: str,
+    doc_format: str,
+    level: str,
+    colour: bool = True,
+    common_params: dict[str, Any] = None,
+    warm_up: bool = False,
+) -> None:
+    """
+    Initialise a batch rendering worker process.
+
+    This sets up logging and saves the common rendering parameters for the
+    batch (see `batch_row_params()`). These are sent to each worker once,
+    here, rather than with every batch row. It then opens and warms up the
+    template session for the worker (see `TemplateSession.warm_up()`) so the
+    first row rendered by the worker doesn't pay the start-up costs. Warm-up
+    failures are logged but are otherwise ignored. Any real problem will show
+    up when rendering rows.
+
+    :param template_pkg_name:   Name of the ZIP file / directory containing the
+                                compiled template package.
+    :param doc_format:          Output document format (`PDF` or `HTML`).
+    :param level:               Logging level.
+    :param colour:              If True, colourise log messages.
+    :param common_params:       Rendering parameters common to all batch rows.
+    :param warm_up:             If True, render a throwaway document with the
+                                common rendering parameters as part of warm-up.
+    """
+
+    setup_logging(level, name=LOGNAME, colour=colour)
+    _BATCH_COMMON_PARAMS.clear()
+    _BATCH_COMMON_PARAMS.update(common_params or {})
+    start = perf_counter()
+    try:
+        batch_template_session(template_pkg_name).warm_up(
+            _BATCH_COMMON_PARAMS if warm_up else None, doc_format
+        )
+    except Exception as e:
+        LOG.warning('PID=%d: Warm-up failed: %s', os.getpid(), e)
+    LOG.info('PID=%d: Warm-up took %.2fs', os.getpid(), perf_counter() - start)
+
+
+# ------------------------------------------------------------------------------
+def batch_row_params(batch_params: dict[str, Any]) -> ParamScope:
+    """
+    Layer the rendering parameters for a batch row over the common parameters.
+
+    The common rendering parameters are set in each worker process by
+    `batch_worker_init()` and are shared by all of the rows it renders. They
+    are not copied or modified for each row.
+
+    :param batch_params:    Rendering parameters for one batch row.
+    :return:                The rendering parameters for the row.
+    """
+
+    return ParamScope(_BATCH_COMMON_PARAMS, batch_params)
+
+
+# ------------------------------------------------------------------------------
+def batch_row_check(
+    batch_params: dict[str, Any], template_pkg_name: str, doc_format: str
+) -> str | None:
+    """
+    Work function to validate the rendering parameters for a batch row.
+
+    :param batch_params:        Rendering parameters for one batch row.
+    :param template_pkg_name:   Name of the template package.
+    :param doc_format:          Output document format (`PDF` or `HTML`).
+    :return:                    A validation error message or None if the
+                                parameters are valid.
+    """
+
+    try:
+        batch_template_session(template_pkg_name).validate_params(
+            batch_row_params(batch_params), doc_format
+        )
+    except jsonschema.ValidationError as e:
+        return f'{e.json_path}: {e.message}'
+    return None
+
+
+# ------------------------------------------------------------------------------
+def batch_prevalidate(
+    executor: Executor,
+    batch_data: Sequence[dict[str, Any]],
+    template_pkg_name: str,
+    doc_format: str,
+    window: int,
+) -> None:
+    """
+    Validate all of the rows in a batch before any rendering starts.
+
+    Each row's rendering parameters are validated against the template
+    parameter schema by the worker processes, just as they would be when the
+    row is rendered. All of the bad rows are logged.
+
+    :param executor:            The batch worker pool. This must have been
+                                created with `batch_worker_init()` as the
+                                initializer.
+    :param batch_data:          Rendering parameters for each batch row.
+    :param template_pkg_name:   Name of the template package.
+    :param doc_format:          Output document format (`PDF` or `HTML`).
+    :param window:              Maximum number of chunks of rows in flight.
+
+    :raise ValueError:          If any of the rows are not valid.
+    """
+
+    start = perf_counter()
+    checker = partial(batch_row_check, template_pkg_name=template_pkg_name, doc_format=doc_format)
+    errors = 0
+    for row_num, error in enumerate(
+        batch_map(
+            executor, checker, batch_data, chunksize=BATCH_VALIDATE_CHUNK_SIZE, window=window
+        ),
+        start=1,
+    ):
+        if error:
+            errors += 1
+            LOG.error('Batch row %d: %s', row_num, error)
+    LOG.info('Validated %d batch rows in %.2fs', len(batch_data), perf_counter() - start)
+    if errors:
+        raise ValueError(f'{errors} of {len(batch_data)} batch rows failed validation')
+
+
+# ------------------------------------------------------------------------------
+def batch_row_count(
+    data_src: DataSourceSpec, count_query: str | None, context: DocmaRenderContext
+) -> int | None:
+    """
+    Get the number of rows in a batch using a row count query.
+
+    The batch data is streamed, so the row count is not otherwise known until
+    the batch is finished. It is only used to show progress.
+
+    :param data_src:    The data source specification for the batch.
+    :param count_query: A query, for the same data source type and location as
+                        the batch data, that returns a single row containing
+                        the row count in its first column. If None, the row
+                        count is unknown.
+    :param context:     Document rendering context.
+    :return:            The row count or None if unknown.
+    """
+
+    if not count_query:
+        return None
+
+    count_src = DataSourceSpec(data_src.type, data_src.location, count_query)
+    data = load_data(count_src, context)
+    try:
+        return int(next(iter(data[0].values())))
+    except (IndexError, StopIteration, TypeError, ValueError):
+        raise DocmaDataProviderError(f'{count_query}: Row count query must return a number')
+
+
+# ------------------------------------------------------------------------------
+def add_batch_process_args(argp: ArgumentParser) -> None:
+    """
+    Add the batch rendering process start-up arguments to an argument parser.
+
+    :param argp:    Argument parser.
+    """
+
+    procp = argp.add_argument_group('process options')
+
+    procp.add_argument(
+        '--preload',
+        metavar='MODULE',
+        action='append',
+        default=[],
+        help=(
+            'Import the specified Python module before starting the rendering'
+            ' processes, in addition to the core docma modules. This only has an'
+            ' effect with the "fork" and "forkserver" start methods. Can be'
+            ' specified multiple times.'
+        ),
+    )
+
+    procp.add_argument(
+        '--start-method',
+        choices=multiprocessing.get_all_start_methods(),
+        help=(
+            'The method used to start the rendering processes. With "fork", the'
+            ' template is opened and prepared once, before the processes are'
+            ' started, and shared by them. With "forkserver", the modules are'
+            ' imported once, by the fork server. The default depends on the platform.'
+        ),
+    )
+
+
+# ------------------------------------------------------------------------------
+def add_batch_manifest_args(argp: ArgumentParser) -> None:
+    """
+    Add the batch manifest arguments to an argument parser.
+
+    :param argp:    Argument parser.
+    """
+
+    manifestp = argp.add_argument_group('manifest options')
+
+    manifestp.add_argument(
+        '--manifest',
+        metavar='FILE',
+        help=(
+            'Append an entry for each document rendered to the specified JSONL'
+            ' manifest file. This allows an interrupted batch to be resumed.'
+        ),
+    )
+
+    manifestp.add_argument(
+        '--resume',
+        action='store_true',
+        help=(
+            'Skip batch rows that the manifest shows were already rendered with'
+            ' the same rendering parameters and template package, provided the'
+            ' output file still exists. Requires --manifest.'
+        ),
+    )
+
+
+# ------------------------------------------------------------------------------
+def batch_manifest(
+    args: Namespace, tpkg: PackageReader, common_params: Any
+) -> BatchManifest | AbstractContextManager[None]:
+    """
+    Open the batch manifest specified on the command line, if any.
+
+    :param args:            The argparse arguments namespace from the CLI.
+    :param tpkg:            The template package.
+    :param common_params:   Anything, other than the batch rows, that affects the
+                            rendered output (see `BatchManifest`).
+    :return:                A batch manifest or, if there isn't one, a context
+                            manager that provides None.
+    """
+
+    if not args.manifest:
+        return nullcontext()
+    return BatchManifest(args.manifest, tpkg.digest(), common_params, resume=args.resume)
+
+
+# ------------------------------------------------------------------------------
+def add_batch_error_args(argp: ArgumentParser) -> None:
+    """
+    Add the batch row error handling arguments to an argument parser.
+
+    :param argp:    Argument parser.
+    """
+
+    errorp = argp.add_argument_group('error handling options')
+
+    errorp.add_argument(
+        '--continue-on-error',
+        action='store_true',
+        help=(
+            'Keep rendering the rest of the batch when a row fails. Failed rows'
+            ' are logged and the command fails at the end. By default, no more'
+            ' rows are started after the first failure.'
+        ),
+    )
+
+    errorp.add_argument(
+        '--error-report',
+        metavar='FILE',
+        help='Write a JSONL entry for each failed row to the specified file.',
+    )
+
+    errorp.add_argument(
+        '--retries',
+        type=int,
+        metavar='N',
+        default=BATCH_ROW_RETRIES,
+        help=(
+            'Number of times to retry a row that fails because of a connection or'
+            ' timeout error, with increasing delays in between. These errors are'
+            ' often transient. Default is %(default)s.'
+        ),
+    )
+
+
+# ------------------------------------------------------------------------------
+def batch_error_report(args: Namespace) -> BatchErrorReport | AbstractContextManager[None]:
+    """
+    Open the batch error report specified on the command line, if any.
+
+    :param args:            The argparse arguments namespace from the CLI.
+    :return:                A batch error report or, if there isn't one, a
+                            context manager that provides None.
+    """
+
+    return BatchErrorReport(args.error_report) if args.error_report else nullcontext()
+
+
+# ------------------------------------------------------------------------------
+def batch_jobs(
+    batch_rows: Iterable[dict[str, Any]],
+    output: str,
+    context: DocmaRenderContext,
+    manifest: BatchManifest | None = None,
+    job_errors: deque[BatchRowResult] | None = None,
+) -> tuple[Iterator[int], Iterator[dict[str, Any]], Iterator[str]]:
+    """
+    Generate the batch rows to render and their output file names.
+
+    :param batch_rows:  Rendering parameters for each batch row.
+    :param output:      A Jinja template for output file names.
+    :param context:     The rendering context for output file names.
+    :param manifest:    If specified, rows the manifest shows are already
+                        done are skipped. The others are noted as started.
+    :param job_errors:  If specified, rows for which the output file name
+                        can't be rendered are not rendered. An error result
+                        for each is appended here instead, for
+                        `batch_results()` to process with the others.
+                        Otherwise, the exception is raised.
+    :return:            Matching iterators of batch row numbers, batch rows
+                        and output file names.
+    """
+
+    def jobs() -> Iterator[tuple[int, dict[str, Any], str]]:
+        """Generate (row number, row, output file) tuples."""
+        for row_num, row in enumerate(batch_rows, start=1):
+            try:
+                output_file = docma.safe_render_path(output, context, row)
+            except Exception as e:
+                if job_errors is None:
+                    raise
+                job_errors.append(
+                    BatchRowResult(
+                        row_num, '', status='error', error=str(e), error_type=type(e).__name__
+                    )
+                )
+                continue
+            if manifest is None or manifest.start(row_num, row, output_file):
+                yield row_num, row, output_file
+
+    return tuple(map(itemgetter(n), it) for n, it in enumerate(tee(jobs(), 3)))
+
+
+# ------------------------------------------------------------------------------
+@dataclass
+class BatchRowResult:
+    """The outcome of rendering a batch row."""
+
+    row: int
+    output: str
+    status: str = 'ok'
+    elapsed: float = 0.0
+    attempts: int = 1
+    error: str | None = None
+    error_type: str | None = None
+
+
+# ------------------------------------------------------------------------------
+def batch_run_row(
+    row_num: int,
+    batch_params: dict[str, Any],
+    output_file: str,
+    renderer: Callable,
+    retries: int = 0,
+    **kwargs: Any,
+) -> BatchRowResult:
+    """
+    Work function to render a batch row, with retries for transient errors.
+
+    Exceptions from the renderer are not raised. They are returned in the
+    result instead. This means one bad row doesn't have to abort the batch and
+    the parent process doesn't need to unpickle the exception (which is not
+    always possible).
+
+    :param row_num:         Row number in the batch.
+    :param batch_params:    Rendering parameters for the row.
+    :param output_file:     Output file name for the row.
+    :param renderer:        The function that renders the row. It is called
+                            with the rendering parameters, the output file
+                            name and the keyword arguments.
+    :param retries:         Maximum number of retries after errors that may be
+                            transient (see `is_transient_error()`).
+    :param kwargs:          Passed to the renderer.
+    :return:                The result.
+    """
+
+    start = perf_counter()
+    for attempt in range(1, retries + 2):
+        try:
+            renderer(batch_params, output_file, **kwargs)
+            return BatchRowResult(
+                row_num, output_file, elapsed=round(perf_counter() - start, 3), attempts=attempt
+            )
+        except Exception as e:
+            if attempt > retries or not is_transient_error(e):
+                error = e
+                break
+            LOG.warning('PID=%d: %s: Retrying after error: %s', os.getpid(), output_file, e)
+            sleep(BATCH_RETRY_DELAY * 2 ** (attempt - 1))
+
+    # noinspection PyUnboundLocalVariable
+    return BatchRowResult(
+        row_num,
+        output_file,
+        status='error',
+        elapsed=round(perf_counter() - start, 3),
+        attempts=attempt,
+        error=str(error),
+        error_type=type(error).__name__,
+    )
+
+
+# ------------------------------------------------------------------------------
+def batch_results(
+    results: Generator[BatchRowResult, None, None],
+    progress: Callable[[Iterable], Iterable] = iter,
+    manifest: BatchManifest | None = None,
+    error_report: BatchErrorReport | None = None,
+    continue_on_error: bool = False,
+    job_errors: deque[BatchRowResult] | None = None,
+) -> None:
+    """
+    Process the results of rendering the rows of a batch as they arrive.
+
+    :param results:         Results from `batch_run_row()` (via `batch_map()`).
+    :param progress:        A progress reporter that wraps an iterable.
+    :param manifest:        If specified, each result is recorded here.
+    :param error_report:    If specified, failed rows are recorded here.
+    :param continue_on_error: If False, stop on the first failed row and don't
+                            start any more rows.
+    :param job_errors:      Error results for rows that `batch_jobs()` could
+                            not dispatch. These are processed as they appear.
+
+    :raise DocmaError:      If any rows failed.
+    """
+
+    def all_results() -> Iterator[BatchRowResult]:
+        """Merge in the job errors as consuming the results uncovers them."""
+        for result in results:
+            while job_errors:
+                yield job_errors.popleft()
+            yield result
+        while job_errors:
+            yield job_errors.popleft()
+
+    failed = 0
+    try:
+        for result in progress(all_results()):
+            # Rows without an output file never made it into the manifest.
+            if manifest and result.output:
+                manifest.record(
+                    result.row,
+                    result.status,
+                    **({'error': result.error} if result.error else {}),
+                )
+            if result.status == 'ok':
+                continue
+            failed += 1
+            if error_report:
+                error_report.record(**asdict(result))
+            message = ': '.join(
+                filter(None, (f'Batch row {result.row}', result.output, result.error))
+            )
+            if not continue_on_error:
+                raise DocmaError(message)
+            LOG.error(message)
+    finally:
+        # This cancels any chunks not yet started
+        results.close()
+    if failed:
+        raise DocmaError(f'{failed} batch rows failed')
+
+
+# ------------------------------------------------------------------------------
+def batch_mp_context(
+    start_method: str | None, preload: Sequence[str], template_pkg_name: str, doc_format: str
+) -> BaseContext:
+    """
+    Get the multiprocessing context for a batch rendering process pool.
+
+    With the `fork` start method, the modules are imported and the worker
+    template session is opened and warmed up (see `batch_worker_init()`) in
+    this process. The worker processes inherit them copy-on-write. With the
+    `forkserver` start method, the modules are imported in the fork server.
+
+    :param start_method:        Process start method. If None, use the default.
+    :param preload:             Names of modules to preload.
+    :param template_pkg_name:   Name of the ZIP file / directory containing the
+                                compiled template package.
+    :param doc_format:          Output document format (`PDF` or `HTML`).
+    :return:                    A multiprocessing context.
+    """
+
+    mp_context = multiprocessing.get_context(start_method)
+    if (method := mp_context.get_start_method()) == 'forkserver':
+        mp_context.set_forkserver_preload(list(preload))
+    elif method == 'fork':
+        start = perf_counter()
+        try:
+            for module in preload:
+                importlib.import_module(module)
+            batch_template_session(template_pkg_name).warm_up(doc_format=doc_format)
+        except Exception as e:
+            LOG.warning('Preload failed: %s', e)
+        LOG.info('Preload took %.2fs', perf_counter() - start)
+    return mp_context
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from argparse import Namespace
 
-from docma import compile_template
+import docma
 from .__common__ import CliCommand
 
 
@@ -36,4 +36,4 @@ class Compile(CliCommand):
     @staticmethod
     def execute(args: Namespace) -> None:
         """Execute the command."""
-        compile_template(src_dir=args.input, tpkg=args.template)
+        docma.compile_template(src_dir=args.input, tpkg=args.template)
@@ -5,49 +5,78 @@ from __future__ import annotations
 import logging
 import os
 from argparse import Namespace
+from collections import deque
 from concurrent.futures import ProcessPoolExecutor
 from functools import partial
 from logging import getLogger
+from time import perf_counter
 from pathlib import Path
 from typing import Any
 
 import yaml
-from tqdm import tqdm
 
-from docma import render_template_to_html, safe_render_path
-from docma.config import LOGNAME
-from docma.data_providers import DataSourceSpec, load_data
-from docma.docma_core import PKG_CONFIG_FILE, coalesce_docma_render_params
+from docma.config import (
+    BATCH_CHUNK_SIZE,
+    BATCH_PRELOAD_MODULES,
+    BATCH_WINDOW_PER_WORKER,
+    LOGNAME,
+    VEGA_CACHE_DIR_ENV,
+)
+from docma.data_providers import DataSourceSpec, stream_data
 from docma.jinja import DocmaRenderContext
-from docma.lib.logging import setup_logging
-from docma.lib.misc import deep_update_dict
+from docma.lib.batch import batch_map
+from docma.lib.lazy import lazy_import
 from docma.lib.packager import PackageReader
-from .__common__ import CliCommand, add_rendering_param_args, marshal_rendering_params
+from .__common__ import (
+    BatchRowResult,
+    CliCommand,
+    add_batch_error_args,
+    add_batch_manifest_args,
+    add_batch_process_args,
+    add_rendering_param_args,
+    batch_error_report,
+    batch_jobs,
+    batch_manifest,
+    batch_mp_context,
+    batch_prevalidate,
+    batch_results,
+    batch_row_count,
+    batch_row_params,
+    batch_run_row,
+    batch_template_session,
+    batch_worker_init,
+    marshal_rendering_params,
+)
 
 LOG = getLogger(LOGNAME)
 
+docma_core = lazy_import('docma.docma_core')
+tqdm = lazy_import('tqdm')
+
 
 # ------------------------------------------------------------------------------
 def renderer(
-    batch_params: dict[str, Any], output_file: str, common_params: dict[str, Any], **kwargs: Any
+    batch_params: dict[str, Any],
+    output_file: str,
+    template_pkg_name: str,
 ) -> None:
     """
-    Work function for the multiprocessing pool.
+    Render a batch row in a worker process (see `batch_run_row()`).
 
     :param batch_params: Rendering parameters for one batch item coming from
                         the batch generator.
     :param output_file: Name of the HTML output file.
-    :param common_params: Common (non batch item specific) parameters for the
-                        rendering process.
-    :param kwargs:      Passed directly to render_template_to_html(),.
+    :param template_pkg_name: Name of the template package. Each worker process
+                        opens this once and reuses it for all of its batch items.
     """
 
     LOG.debug('PID=%d: Output to %s', os.getpid(), output_file)
-    html = render_template_to_html(
-        render_params=deep_update_dict({}, common_params, batch_params), **kwargs
+    start = perf_counter()
+    html = batch_template_session(template_pkg_name).render_html(
+        render_params=batch_row_params(batch_params)
     )
     Path(output_file).write_text(html.prettify())
-    LOG.info('Created %s', output_file)
+    LOG.info('Created %s in %.2fs', output_file, perf_counter() - start)
 
 
 # ------------------------------------------------------------------------------
@@ -59,6 +88,17 @@ class HtmlBatch(CliCommand):
     def add_arguments(self) -> None:
         """Add arguments to the command handler."""
 
+        self.argp.add_argument(
+            '--chart-cache',
+            metavar='DIR',
+            help=(
+                'Cache rendered Vega charts in the specified directory. The cache'
+                ' is shared by all of the rendering processes and can be reused'
+                ' across runs. Defaults to the value of the'
+                f' {VEGA_CACHE_DIR_ENV} environment variable, if set.'
+            ),
+        )
+
         self.argp.add_argument(
             '-d',
             '--data-source-spec',
@@ -72,6 +112,29 @@ class HtmlBatch(CliCommand):
             ),
         )
 
+        self.argp.add_argument(
+            '--count-query',
+            metavar='QUERY',
+            help=(
+                'A query that returns the number of rows in the batch. This uses the'
+                ' same data source type and location as the data source specification.'
+                ' It is only used to show progress. Without it, the progress bar shows'
+                ' the number of documents rendered so far.'
+            ),
+        )
+
+        self.argp.add_argument(
+            '--chunk-size',
+            type=int,
+            metavar='ROWS',
+            default=BATCH_CHUNK_SIZE,
+            help=(
+                'Number of batch rows sent to a rendering process at a time.'
+                ' Larger values reduce the overhead for fast renders at the cost'
+                ' of less even load balancing. Default is %(default)s.'
+            ),
+        )
+
         self.argp.add_argument(
             '-n',
             '--nproc',
@@ -127,8 +190,44 @@ class HtmlBatch(CliCommand):
             help='Name of a template package.',
         )
 
+        self.argp.add_argument(
+            '--warm-up',
+            action='store_true',
+            help=(
+                'Each rendering process always prepares the template before rendering'
+                ' its first batch row. This option also has each process render, and'
+                ' discard, a document using the rendering parameters from the command'
+                ' line. This reduces the time to render the first few batch rows.'
+            ),
+        )
+
+        self.argp.add_argument(
+            '--prevalidate',
+            action='store_true',
+            help=(
+                'Validate the rendering parameters for every batch row against the'
+                ' template parameter schema before rendering any of them. The batch'
+                ' is abandoned if any rows are invalid. This requires all of the'
+                ' batch rows to be held in memory.'
+            ),
+        )
+
+        add_batch_error_args(self.argp)
+        add_batch_manifest_args(self.argp)
+        add_batch_process_args(self.argp)
         add_rendering_param_args(self.argp)
 
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def check_arguments(args: Namespace):
+        """Validate arguments."""
+        if args.chunk_size < 1:
+            raise ValueError('Chunk size must be at least 1.')
+        if args.resume and not args.manifest:
+            raise ValueError('--resume requires --manifest.')
+        if args.retries < 0:
+            raise ValueError('Retries must not be negative.')
+
     # --------------------------------------------------------------------------
     @staticmethod
     def execute(args: Namespace) -> None:
@@ -136,33 +235,91 @@ class HtmlBatch(CliCommand):
 
         if args.realm:
             os.environ['LAVA_REALM'] = args.realm
+        if args.chart_cache:
+            os.environ[VEGA_CACHE_DIR_ENV] = args.chart_cache
 
         data_source_spec = DataSourceSpec.from_string(args.data_source_spec)
-        init = partial(setup_logging, args.level, name=LOGNAME, colour=args.colour)
         cli_params = marshal_rendering_params(args)
+        init = partial(
+            batch_worker_init,
+            args.template,
+            'HTML',
+            args.level,
+            colour=args.colour,
+            common_params=cli_params,
+            warm_up=args.warm_up,
+        )
 
-        with PackageReader.new(args.template) as tpkg:
+        with (
+            PackageReader.new(args.template) as tpkg,
+            batch_manifest(args, tpkg, {'params': cli_params}) as manifest,
+            batch_error_report(args) as error_report,
+        ):
             # We need to create a full rendering context for the data source spec
             # specified on the command line used to generate iteration data.
-            render_params = coalesce_docma_render_params(
-                yaml.safe_load(tpkg.read_text(PKG_CONFIG_FILE)), cli_params
+            render_params = docma_core.coalesce_docma_render_params(
+                yaml.safe_load(tpkg.read_text(docma_core.PKG_CONFIG_FILE)), cli_params
             )
             context = DocmaRenderContext(tpkg, render_params)
-            batch_data = load_data(data_source_spec, context)
-
-            # We need to create a full rendering context for the data source spec
-            # specified on the command line used to generate iteration data.
+            if args.prevalidate:
+                # All the rows have to be read before rendering starts anyway.
+                batch_rows = list(stream_data(data_source_spec, context))
+                row_count = len(batch_rows)
+            else:
+                # Batch rows are streamed from the data source and the row count
+                # (if known) is only used for progress and the pool size.
+                batch_rows = stream_data(data_source_spec, context)
+                row_count = batch_row_count(data_source_spec, args.count_query, context)
+            job_errors: deque[BatchRowResult] = deque()
+            row_nums, batch_data, output_files = batch_jobs(
+                batch_rows, args.output, context, manifest, job_errors
+            )
             batch_worker_fn = partial(
-                renderer, common_params=cli_params, template_pkg_name=args.template
+                batch_run_row,
+                renderer=renderer,
+                retries=args.retries,
+                template_pkg_name=args.template,
             )
             progress = (
-                partial(tqdm, colour='green', total=len(batch_data))
+                partial(tqdm.tqdm, colour='green', total=row_count)
                 if args.progress and LOG.getEffectiveLevel() >= logging.WARNING
                 else lambda x: x
             )
-            output_files = (safe_render_path(args.output, context, row) for row in batch_data)
+            max_workers = args.nproc if row_count is None else max(min(row_count, args.nproc), 1)
+            mp_context = batch_mp_context(
+                args.start_method,
+                BATCH_PRELOAD_MODULES + tuple(args.preload),
+                args.template,
+                'HTML',
+            )
             with ProcessPoolExecutor(
-                max_workers=min(len(batch_data), args.nproc), initializer=init
+                max_workers=max_workers, mp_context=mp_context, initializer=init
             ) as executor:
-                for _ in progress(executor.map(batch_worker_fn, batch_data, output_files)):
-                    pass
+                if args.prevalidate:
+                    batch_prevalidate(
+                        executor,
+                        batch_rows,
+                        args.template,
+                        'HTML',
+                        window=max_workers * BATCH_WINDOW_PER_WORKER,
+                    )
+                results = batch_map(
+                    executor,
+                    batch_worker_fn,
+                    row_nums,
+                    batch_data,
+                    output_files,
+                    chunksize=args.chunk_size,
+                    window=max_workers * BATCH_WINDOW_PER_WORKER,
+                    ordered=False,
+                )
+                batch_results(
+                    results,
+                    progress,
+                    manifest,
+                    error_report,
+                    args.continue_on_error,
+                    job_errors,
+                )
+            if manifest and manifest.skipped:
+                LOG.info('Skipped %d previously rendered rows', manifest.skipped)
@@ -5,7 +5,7 @@ from __future__ import annotations
 import os
 from argparse import Namespace
 
-from docma import render_template_to_html
+import docma
 from .__common__ import CliCommand, add_rendering_param_args, marshal_rendering_params
 
 
@@ -54,7 +54,7 @@ class Render(CliCommand):
         if args.realm:
             os.environ['LAVA_REALM'] = args.realm
 
-        output_html = render_template_to_html(
+        output_html = docma.render_template_to_html(
             template_pkg_name=args.template, render_params=marshal_rendering_params(args)
         )
         with open(args.output, 'w') as f:
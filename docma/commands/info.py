@@ -7,7 +7,7 @@ from argparse import Namespace
 
 import yaml
 
-from docma import get_template_info
+import docma
 from docma.lib.packager import PackageReader
 from .__common__ import CliCommand
 
@@ -34,4 +34,6 @@ class Info(CliCommand):
     def execute(args: Namespace) -> None:
         """Execute the CLI command with the specified arguments."""
         with PackageReader.new(args.template) as tpkg:
-            yaml.safe_dump(get_template_info(tpkg), sys.stdout, default_flow_style=False, indent=2)
+            yaml.safe_dump(
+                docma.get_template_info(tpkg), sys.stdout, default_flow_style=False, indent=2
+            )
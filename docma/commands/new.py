@@ -9,13 +9,14 @@ from contextlib import contextmanager
 from importlib import resources
 from pathlib import Path
 
-from babel import default_locale
-from cookiecutter.main import cookiecutter
-
 import docma
+from docma.lib.lazy import lazy_import
 from docma.lib.misc import StoreNameValuePair
 from .__common__ import CliCommand
 
+babel = lazy_import('babel')
+cookiecutter_main = lazy_import('cookiecutter.main')
+
 
 # ------------------------------------------------------------------------------
 @CliCommand.register('new')
@@ -81,11 +82,11 @@ class New(CliCommand):
             pythonpath_prepended(resources.files(docma).parent.resolve()),
             resources.as_file(template_path) as template_dir,
         ):
-            new_dir = cookiecutter(
+            new_dir = cookiecutter_main.cookiecutter(
                 str(template_dir),
                 overwrite_if_exists=False,
                 extra_context={
-                    'locale': default_locale(),
+                    'locale': babel.default_locale(),
                     'template_id': d.stem,
                     'template_src_dir': args.directory,
                 }
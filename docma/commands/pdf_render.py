@@ -5,7 +5,7 @@ from __future__ import annotations
 import os
 from argparse import Namespace
 
-from docma import render_template_to_pdf
+import docma
 from .__common__ import CliCommand, add_rendering_param_args, marshal_rendering_params
 
 
@@ -84,6 +84,16 @@ class Render(CliCommand):
             ),
         )
 
+        c_render_pdf.add_argument(
+            '--deduplicate',
+            action='store_true',
+            help=(
+                'Merge identical objects (fonts, images etc.) that are repeated across'
+                ' the component documents and overlays in the PDF. This can reduce the'
+                ' PDF size considerably when the documents share fonts and images.'
+            ),
+        )
+
         add_rendering_param_args(self.argp)
 
     # --------------------------------------------------------------------------
@@ -101,11 +111,12 @@ class Render(CliCommand):
         if args.realm:
             os.environ['LAVA_REALM'] = args.realm
 
-        output_pdf = render_template_to_pdf(
+        output_pdf = docma.render_template_to_pdf(
             template_pkg_name=args.template,
             render_params=marshal_rendering_params(args),
             watermark=args.watermark,
             stamp=args.stamp,
             compression=args.compress,
+            deduplicate=args.deduplicate,
         )
         output_pdf.write(args.output)
@@ -5,6 +5,8 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Callable
 
+from docma.lib.lazy import import_submodules
+
 _CONTENT_COMPILERS = {}
 
 
@@ -38,6 +40,7 @@ def content_compiler(*suffixes: str) -> Callable:
 def compiler_for_suffix(suffix: str) -> Callable:
     """Get the handler for the specfied format."""
 
+    import_submodules(__package__)
     return _CONTENT_COMPILERS[suffix.lower()]
 
 
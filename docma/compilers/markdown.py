@@ -2,10 +2,11 @@
 
 from __future__ import annotations
 
-import markdown
-
+from docma.lib.lazy import lazy_import
 from .__common__ import content_compiler
 
+markdown = lazy_import('markdown')
+
 
 # ------------------------------------------------------------------------------
 @content_compiler('md')
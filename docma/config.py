@@ -22,8 +22,106 @@ EMBED_IMG_MIN_SIZE = 100  # bytes
 
 VEGA_PPI = 72
 
+# Resources referenced in HTML documents using these URL schemes are fetched
+# concurrently, with this many threads, before WeasyPrint lays out the document.
+# Set the number of threads to 0 to disable this. Only schemes with fetchers
+# that are safe to run concurrently can be used. For docma: URLs, each prefetch
+# gets its own render context and data provider calls are serialised, as they
+# share cached database connections. s3: can't be used as the fetcher uses a
+# shared boto3 resource.
+URL_PREFETCH_SCHEMES = ('docma', 'http', 'https')
+URL_PREFETCH_THREADS = 8
+
+# Rendered Vega charts are cached by content. The in-memory tier holds this
+# many charts (per process). If the environment variable is set, rendered
+# charts are also cached in that directory, which can be shared by multiple
+# processes. The disk cache is limited to the specified size in bytes.
+VEGA_CACHE_SIZE = 100
+VEGA_CACHE_DIR_ENV = 'DOCMA_VEGA_CACHE_DIR'
+VEGA_CACHE_DISK_MAX_SIZE = 200_000_000
+
+# Maximum number of compiled Jinja templates cached (per Jinja environment) for
+# template strings rendered via DocmaRenderContext.render(). 0 disables it.
+JINJA_TEMPLATE_CACHE_SIZE = 1000
+
+# Directory in compiled template packages where precompiled Jinja bytecode is
+# stored. Source files starting with "." are excluded from packages so this
+# can't collide with template content.
+JINJA_BYTECODE_DIR = '.jinja-bytecode'
+
+# Directory in compiled template packages where HTML documents that contain no
+# Jinja and only reference resources with these URL schemes (i.e. content
+# within the package) are stored, pre-rendered to PDF.
+PRERENDER_DIR = '.prerendered'
+PRERENDER_SCHEMES = ('data', 'file')
+
+# Content fetched by URLs with these schemes, and the decoded images, are reused
+# across renders in a TemplateSession, up to this many of each. These schemes
+# must be for content that doesn't vary with the rendering parameters.
+WEASYPRINT_RESOURCE_CACHE_SCHEMES = ('file', 's3', 'http', 'https')
+WEASYPRINT_RESOURCE_CACHE_SIZE = 100
+
 # Set these default weasyprint options. Template can override.
 WEASYPRINT_OPTIONS = {
     'optimize_images': True,  # Essential to avoid Weasyprint bug where it bypasses url fetcher
     'media': 'print',
 }
+
+# Rendered overlay (watermark / stamp) pages are cached in a template session,
+# keyed by the content of the rendered overlay HTML. Overlays that don't depend
+# on per-document parameters are then only laid out once per session.
+OVERLAY_CACHE_SIZE = 20
+
+# Rendered HTML component documents that only reference resources with these
+# URL schemes (i.e. content in the template package) are cached as PDF, keyed
+# by the rendered HTML, the template stylesheets and a digest of the template
+# package. A document is cached the second time the same rendered HTML is seen
+# in a template session. The in-memory tier holds this many documents (per
+# session). If the environment variable is set, documents are also cached in
+# that directory, which can be shared by multiple processes. The disk cache is
+# limited to the specified size in bytes. Remote (e.g. s3, http) content is not
+# allowed as it can change without the key changing.
+DOC_CACHE_SCHEMES = ('data', 'file')
+DOC_CACHE_SIZE = 50
+DOC_CACHE_DIR_ENV = 'DOCMA_DOC_CACHE_DIR'
+DOC_CACHE_DISK_MAX_SIZE = 500_000_000
+
+# Static PDF documents from template packages are parsed once per process (and
+# thread) and the readers are kept, up to this many, for reuse in later renders.
+STATIC_PDF_CACHE_SIZE = 20
+
+# Batch rendering submits rows to the worker processes in chunks of this many
+# rows, with up to this many chunks per worker in flight at any time.
+BATCH_CHUNK_SIZE = 4
+BATCH_WINDOW_PER_WORKER = 2
+
+# Validating batch rows against the template parameter schema is much quicker
+# than rendering them, so rows are sent for validation in larger chunks.
+BATCH_VALIDATE_CHUNK_SIZE = 100
+
+# Batch rows that fail with a possibly transient error (see TRANSIENT_ERRORS)
+# are retried up to this many times by default. The delay (in seconds) before
+# the first retry doubles for each subsequent retry.
+BATCH_ROW_RETRIES = 2
+BATCH_RETRY_DELAY = 1.0
+
+# Exception class names that indicate a transient (connection or timeout)
+# failure. An error is transient if any exception in its chain (__cause__ /
+# __context__) is of, or derived from, one of these classes. Names are used so
+# that optional dependencies (requests, botocore etc.) need not be imported.
+TRANSIENT_ERRORS = frozenset(
+    (
+        'ConnectionError',  # Builtin and requests.exceptions.ConnectionError
+        'TimeoutError',  # Builtin (incl. socket.timeout), urllib3 and botocore
+        'Timeout',  # requests.exceptions.Timeout
+        'EndpointConnectionError',  # botocore
+    )
+)
+
+# Modules imported before batch rendering processes are started, so that they
+# are inherited by forked processes (or imported once by the fork server).
+BATCH_PRELOAD_MODULES = ('docma.docma_core', 'pypdf', 'weasyprint')
+
+# Batch driving queries are streamed from the database this many rows at a
+# time, rather than all at once.
+DATA_STREAM_FETCH_SIZE = 1000
@@ -2,12 +2,21 @@
 
 from __future__ import annotations
 
+from collections.abc import Iterator
+from threading import RLock
 from typing import Any, Callable
 
 from docma.exceptions import DocmaDataProviderError
 from docma.jinja import DocmaRenderContext
+from docma.lib.lazy import import_submodules
 
 _DATA_SOURCE_TYPE = {}
+_DATA_STREAM_TYPE = {}
+
+# Data providers share cached resources, such as database connections, that are
+# not safe for concurrent use. Loads (e.g. from docma: URLs that are prefetched
+# concurrently) are serialised. Streams are only read by the batch commands.
+_LOAD_DATA_LOCK = RLock()
 
 
 # ------------------------------------------------------------------------------
@@ -37,10 +46,44 @@ def data_provider(data_src_type: str) -> Callable:
     return decorate
 
 
+# ------------------------------------------------------------------------------
+def data_stream_provider(data_src_type: str) -> Callable:
+    """
+    Register a streaming data provider function for the specified data source type.
+
+    A streaming data provider takes the same arguments as a normal data provider
+    but returns an iterator over the rows instead of a list. It is used for large
+    data sets (e.g. the rows driving batch rendering) that shouldn't be held in
+    memory all at once. Data source types without a streaming data provider are
+    streamed from the list returned by the normal data provider.
+
+    This is a decorator used like so:
+
+    ```python
+    @data_stream_provider('postgres')
+    def postgres(
+        data_src: DataSourceSpec, pkg: PackageReader, params: dict[str, Any]
+    )  -> Iterator[dict[str, Any]]:
+        ...
+    ```
+
+    :param data_src_type: Data source type.
+
+    """
+
+    def decorate(func: Callable) -> Callable:
+        """Register the handler function."""
+        _DATA_STREAM_TYPE[data_src_type] = func
+        return func
+
+    return decorate
+
+
 # ------------------------------------------------------------------------------
 def data_provider_for_src_type(data_src_type: str) -> Callable:
     """Get the data provider function for the specified type."""
 
+    import_submodules(__package__)
     try:
         return _DATA_SOURCE_TYPE[data_src_type]
     except KeyError:
@@ -149,9 +192,37 @@ def load_data(
     """
 
     load_handler = data_provider_for_src_type(data_src.type)
-    data = load_handler(data_src, context, **kwargs)
+    with _LOAD_DATA_LOCK:
+        data = load_handler(data_src, context, **kwargs)
 
     if not isinstance(data, list) or (data and not isinstance(data[0], dict)):
         raise DocmaDataProviderError(f'{data_src}: Bad data - must be a list of dicts')
 
     return data
+
+
+# ------------------------------------------------------------------------------
+def stream_data(
+    data_src: DataSourceSpec, context: DocmaRenderContext, **kwargs
+) -> Iterator[dict[str, Any]]:
+    """
+    Load a data set one row at a time.
+
+    Unlike `load_data()`, the data provider may not be invoked until the first
+    row is requested, so errors may be raised during iteration.
+
+    :param data_src:    Data source specifier.
+    :param context:     Document rendering context.
+    :param kwargs:      Additional keyword arguments for the data loader.
+    :return:            An iterator over dicts, each containing one row.
+    """
+
+    import_submodules(__package__)
+    if not (stream_handler := _DATA_STREAM_TYPE.get(data_src.type)):
+        yield from load_data(data_src, context, **kwargs)
+        return
+
+    for row in stream_handler(data_src, context, **kwargs):
+        if not isinstance(row, dict):
+            raise DocmaDataProviderError(f'{data_src}: Bad data - must be a list of dicts')
+        yield row
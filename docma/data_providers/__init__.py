@@ -39,24 +39,23 @@ Data providers must return a list of dictionaries, where each dictionary
 contains one row of data. This is the format required by Altair-Vega and is also
 suitable for consumption in Jinja templates.
 
+Data providers that can deliver rows incrementally (e.g. from a database
+cursor) can also register a streaming variant using the `data_stream_provider`
+decorator. This has the same signature but returns an iterator over the rows
+instead of a list. Streaming providers are used by `stream_data()`, which is
+used for batch rendering.
+
 Data providers should generally raise a
 <a href="#docma.exceptions.DocmaDataProviderError">`DocmaDataProviderError`</a>
 on failure.
 """
 
-import pkgutil
-from importlib import import_module
-
 from .__common__ import (
     DataSourceSpec as DataSourceSpec,
     data_provider as data_provider,
+    data_stream_provider as data_stream_provider,
     load_data as load_data,
+    stream_data as stream_data,
 )
 
-# Auto import our data provider functions
-for _, module_name, _ in pkgutil.iter_modules(__path__):
-    if module_name.startswith('_'):
-        continue
-    import_module(f'.{module_name}', package=__name__)
-
-__all__ = ['DataSourceSpec', 'data_provider', 'load_data']
+__all__ = ['DataSourceSpec', 'data_provider', 'data_stream_provider', 'load_data', 'stream_data']
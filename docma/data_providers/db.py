@@ -4,15 +4,15 @@ from __future__ import annotations
 
 import atexit
 import os
+from collections.abc import Iterator
 from contextlib import suppress
 from functools import cache
 from logging import getLogger
 from pathlib import Path
 from ssl import SSLContext
 from typing import Any
+from uuid import uuid4
 
-import boto3
-import pg8000
 import yaml
 from pydantic import BaseModel, ConfigDict, Field, NonNegativeInt, computed_field, model_validator
 
@@ -20,10 +20,14 @@ from docma.config import LOGNAME
 from docma.exceptions import DocmaDataProviderError
 from docma.jinja import DocmaRenderContext
 from docma.lib.db import get_paramstyle_from_conn
+from docma.lib.lazy import lazy_import
 from docma.lib.misc import env_config, str2bool
 from docma.lib.path import relative_path
 from docma.lib.query import DocmaQuerySpecification
-from .__common__ import DataSourceSpec, data_provider
+from .__common__ import DataSourceSpec, data_provider, data_stream_provider
+
+boto3 = lazy_import('boto3')
+pg8000 = lazy_import('pg8000')
 
 try:
     import duckdb
@@ -42,6 +46,51 @@ LOG = getLogger(LOGNAME)
 DUCKDB_READONLY = True
 
 
+# ------------------------------------------------------------------------------
+def check_query_src(data_src: DataSourceSpec, src_type: str, kwargs: dict[str, Any]) -> None:
+    """
+    Check the data source specification for a query based data source.
+
+    :param data_src:    Data source specification.
+    :param src_type:    Data source type for error messages.
+    :param kwargs:      Keyword arguments passed to the data provider. Should be empty.
+    """
+
+    if not data_src.query:
+        raise DocmaDataProviderError(f'Query is required for "{src_type}" data source type')
+
+    if kwargs:
+        raise DocmaDataProviderError(
+            f'Parameters not allowed for "{src_type}" data source type:'
+            f' {", ".join(kwargs.keys())}'
+        )
+
+
+# ------------------------------------------------------------------------------
+def check_duckdb_src(data_src: DataSourceSpec, kwargs: dict[str, Any]) -> None:
+    """
+    Check that DuckDB is available and the data source specification is valid.
+
+    :param data_src:    Data source specification.
+    :param kwargs:      Keyword arguments passed to the data provider. Should be empty.
+    """
+
+    if not duckdb:
+        raise DocmaDataProviderError(
+            'duckdb is required for "duckdb" data source type - try "pip install duckdb"'
+        )
+
+    check_query_src(data_src, 'duckdb', kwargs)
+
+    dbpath = Path(data_src.location)
+    try:
+        relative_path(Path('.'), dbpath)
+    except ValueError:
+        raise DocmaDataProviderError(
+            f'DuckDB location not relative to current directory: {data_src.location}'
+        )
+
+
 # ------------------------------------------------------------------------------
 # TODO: This is Postgres specific because of the way ssl field is handled.
 class ConnectionInfo(BaseModel):
@@ -144,13 +193,7 @@ def postgres_loader(
 
     """
 
-    if not data_src.query:
-        raise DocmaDataProviderError('Query is required for "postgres" data source type')
-
-    if kwargs:
-        raise DocmaDataProviderError(
-            f'Parameters not allowed for "postgres" data source type: {", ".join(kwargs.keys())}'
-        )
+    check_query_src(data_src, 'postgres', kwargs)
 
     try:
         query_spec = DocmaQuerySpecification(
@@ -177,6 +220,99 @@ def postgres_loader(
         raise DocmaDataProviderError(f'{data_src.query}: {e}') from e
 
 
+# ------------------------------------------------------------------------------
+class PostgresNamedCursor:
+    """
+    Minimal DBAPI 2.0 style cursor over a Postgres server side (named) cursor.
+
+    pg8000 reads the entire result set of a query into memory on execution. This
+    declares a server side cursor for the query instead and fetches rows from it
+    on demand. This must be used within a transaction, which pg8000 provides by
+    default.
+
+    :param conn:    A pg8000 connection.
+    :param query:   Query text.
+    :param params:  Query parameters.
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(self, conn: pg8000.Connection, query: str, params: Any = None):
+        """Declare the server side cursor."""
+        self.name = f'docma_{uuid4().hex}'
+        self.cursor = conn.cursor()
+        query = query.strip().rstrip(';')
+        self.cursor.execute(f'DECLARE {self.name} NO SCROLL CURSOR FOR {query}', params)
+        self.description = None
+
+    # --------------------------------------------------------------------------
+    def fetchmany(self, size: int) -> list[tuple]:
+        """Fetch the next `size` rows."""
+        self.cursor.execute(f'FETCH FORWARD {size} FROM {self.name}')
+        self.description = self.cursor.description
+        return self.cursor.fetchall()
+
+    # --------------------------------------------------------------------------
+    def close(self) -> None:
+        """Close the server side cursor and the underlying client cursor."""
+        try:
+            self.cursor.execute(f'CLOSE {self.name}')
+        finally:
+            self.cursor.close()
+
+
+# ------------------------------------------------------------------------------
+@data_stream_provider('postgres')
+def postgres_streamer(
+    data_src: DataSourceSpec, context: DocmaRenderContext, params: dict[str, Any] = None, **kwargs
+) -> Iterator[dict[str, Any]]:
+    """
+    Load data from a Postgres database one row at a time.
+
+    This is the same as `postgres_loader()` except that rows are fetched from a
+    server side cursor in batches, as required. The database connection is held
+    by the caller until the iterator is exhausted or closed, at which point the
+    cursor is closed and the transaction it lives in is ended.
+
+    :param data_src:    Data source specification.
+    :param context:     Docma rendering context.
+    :param params:      Additional rendering parameters when preparing the query.
+    :param kwargs:      Keyword argument sponge. Should be empty.
+
+    :return:            An iterator over data rows (as dicts).
+    """
+
+    check_query_src(data_src, 'postgres', kwargs)
+
+    try:
+        query_spec = DocmaQuerySpecification(
+            name=data_src.query, **yaml.safe_load(context.tpkg.read_text(data_src.query))
+        )
+        query_txt, query_params = query_spec.prepare_query(
+            context, params=params, paramstyle=pg8000.paramstyle
+        )
+    except Exception as e:
+        raise DocmaDataProviderError(f'{data_src.query}: {e}') from e
+
+    conn_info = ConnectionInfo(**env_config('DOCMA', data_src.location.upper()))
+    conn = postgress_connect(conn_info)
+    try:
+        cursor = PostgresNamedCursor(conn, query_txt, query_params)
+        try:
+            yield from query_spec.iter_cursor(cursor)
+        finally:
+            # Also needed if the caller abandons the iterator early.
+            with suppress(Exception):
+                cursor.close()
+    except Exception as e:
+        raise DocmaDataProviderError(f'{data_src.query}: {e}') from e
+    finally:
+        # The query only reads so a rollback is all that's needed to end the
+        # transaction, whether or not the stream succeeded. Otherwise the
+        # cached connection is left idle in transaction.
+        with suppress(Exception):
+            conn.rollback()
+
+
 # ------------------------------------------------------------------------------
 @data_provider('duckdb')
 def duckdb_loader(
@@ -201,26 +337,44 @@ def duckdb_loader(
 
     """
 
-    if not duckdb:
-        raise DocmaDataProviderError(
-            'duckdb is required for "duckdb" data source type - try "pip install duckdb"'
+    check_duckdb_src(data_src, kwargs)
+
+    try:
+        query_spec = DocmaQuerySpecification(
+            name=data_src.query, **yaml.safe_load(context.tpkg.read_text(data_src.query))
+        )
+        query_txt, query_params = query_spec.prepare_query(
+            context, params=params, paramstyle=duckdb.paramstyle
         )
+        with duckdb.connect(data_src.location, read_only=DUCKDB_READONLY) as conn:
+            LOG.info('Connected to DuckDB @ %s', data_src.location)
+            conn.execute(query_txt, query_params)
+            # Duckdb conn obeys cursor protocol.
+            return query_spec.fetch_from_cursor(conn)
+    except Exception as e:
+        raise DocmaDataProviderError(f'{data_src.query}: {e}') from e
 
-    if not data_src.query:
-        raise DocmaDataProviderError('Query is required for "duckdb" data source type')
 
-    if kwargs:
-        raise DocmaDataProviderError(
-            f'Parameters not allowed for "duckdb" data source type: {", ".join(kwargs.keys())}'
-        )
+# ------------------------------------------------------------------------------
+@data_stream_provider('duckdb')
+def duckdb_streamer(
+    data_src: DataSourceSpec, context: DocmaRenderContext, params: dict[str, Any] = None, **kwargs
+) -> Iterator[dict[str, Any]]:
+    """
+    Load data from a DuckDB database one row at a time.
 
-    dbpath = Path(data_src.location)
-    try:
-        relative_path(Path('.'), dbpath)
-    except ValueError:
-        raise DocmaDataProviderError(
-            f'DuckDB location not relative to current directory: {data_src.location}'
-        )
+    This is the same as `duckdb_loader()` except that rows are fetched from the
+    query result in batches, as required.
+
+    :param data_src:    Data source specification.
+    :param context:     Docma rendering context.
+    :param params:      Additional rendering parameters when preparing the query.
+    :param kwargs:      Keyword argument sponge. Should be empty.
+
+    :return:            An iterator over data rows (as dicts).
+    """
+
+    check_duckdb_src(data_src, kwargs)
 
     try:
         query_spec = DocmaQuerySpecification(
@@ -232,8 +386,7 @@ def duckdb_loader(
         with duckdb.connect(data_src.location, read_only=DUCKDB_READONLY) as conn:
             LOG.info('Connected to DuckDB @ %s', data_src.location)
             conn.execute(query_txt, query_params)
-            # Duckdb conn obeys cursor protocol.
-            return query_spec.fetch_from_cursor(conn)
+            yield from query_spec.iter_cursor(conn)
     except Exception as e:
         raise DocmaDataProviderError(f'{data_src.query}: {e}') from e
 
@@ -286,14 +439,59 @@ def lava_loader(
             'jinlava is required for "lava" data source type - try "pip install jinlava"'
         )
 
-    if not data_src.query:
-        raise DocmaDataProviderError('Query is required for "lava" data source type')
+    check_query_src(data_src, 'lava', kwargs)
 
-    if kwargs:
+    try:
+        realm = os.environ['LAVA_REALM']
+    except KeyError:
+        raise DocmaDataProviderError('Realm must be set for "lava" data source type')
+
+    conn = get_lava_db_conn(conn_id=data_src.location, realm=realm)
+
+    try:
+        query_spec = DocmaQuerySpecification(
+            name=data_src.query, **yaml.safe_load(context.tpkg.read_text(data_src.query))
+        )
+        query_txt, query_params = query_spec.prepare_query(
+            context, params=params, paramstyle=get_paramstyle_from_conn(conn)
+        )
+        cursor = conn.cursor()
+        cursor.execute(query_txt, query_params)
+        return query_spec.fetch_from_cursor(cursor)
+    except Exception as e:
+        # Attempt a rollback (Mostly required for coverage tests)
+        with suppress(Exception):
+            conn.rollback()
+        raise DocmaDataProviderError(f'{data_src.query}: {e}') from e
+
+
+# ------------------------------------------------------------------------------
+@data_stream_provider('lava')
+def lava_streamer(
+    data_src: DataSourceSpec, context: DocmaRenderContext, params: dict[str, Any] = None, **kwargs
+) -> Iterator[dict[str, Any]]:
+    """
+    Load data via a lava connector one row at a time.
+
+    This is the same as `lava_loader()` except that rows are fetched from the
+    cursor in batches, as required. Whether that avoids holding the entire
+    result set in memory depends on the underlying database driver.
+
+    :param data_src:    Data source specification.
+    :param context:     Docma rendering context.
+    :param params:      Additional rendering parameters when preparing the query.
+    :param kwargs:      Keyword argument sponge. Should be empty.
+
+    :return:            An iterator over data rows (as dicts).
+    """
+
+    if not get_pysql_connection:
         raise DocmaDataProviderError(
-            f'Parameters not allowed for "lava" data source type: {", ".join(kwargs.keys())}'
+            'jinlava is required for "lava" data source type - try "pip install jinlava"'
         )
 
+    check_query_src(data_src, 'lava', kwargs)
+
     try:
         realm = os.environ['LAVA_REALM']
     except KeyError:
@@ -310,9 +508,26 @@ def lava_loader(
         )
         cursor = conn.cursor()
         cursor.execute(query_txt, query_params)
-        return query_spec.fetch_from_cursor(cursor)
+        yield from query_spec.iter_cursor(cursor)
     except Exception as e:
         # Attempt a rollback (Mostly required for coverage tests)
         with suppress(Exception):
             conn.rollback()
         raise DocmaDataProviderError(f'{data_src.query}: {e}') from e
+
+
+# ------------------------------------------------------------------------------
+def _forget_connections() -> None:
+    """
+    Forget cached database connections in a forked child process.
+
+    The child would otherwise share the parent's connection sockets. The
+    connections are not closed as that would close them for the parent too.
+    """
+
+    postgress_connect.cache_clear()
+    get_lava_db_conn.cache_clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_connections)
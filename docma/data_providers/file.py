@@ -16,28 +16,28 @@ Note there is no data_query for this source type.
 from __future__ import annotations
 
 import json
+from collections.abc import Iterator
 from csv import DictReader
-from io import StringIO
 from pathlib import Path
 from typing import Any
 
 from docma.exceptions import DocmaDataProviderError
 from docma.jinja import DocmaRenderContext
-from .__common__ import DataSourceSpec, data_provider
+from .__common__ import DataSourceSpec, data_provider, data_stream_provider
 
 READERS = {
-    '.csv': lambda f: list(DictReader(f)),
-    '.jsonl': lambda f: [json.loads(line) for line in f],
+    '.csv': DictReader,
+    '.jsonl': lambda f: (json.loads(line) for line in f),
 }
 
 
 # ------------------------------------------------------------------------------
 # noinspection PyUnusedLocal
-@data_provider('file')
-def file_loader(
+@data_stream_provider('file')
+def file_streamer(
     data_src: DataSourceSpec, context: DocmaRenderContext, **kwargs
-) -> list[dict[str, Any]]:
-    """Load data from a file in the document template package."""
+) -> Iterator[dict[str, Any]]:
+    """Load data from a file in the document template package one row at a time."""
 
     if data_src.query:
         raise DocmaDataProviderError('Query not allowed for "file" data source type')
@@ -46,5 +46,16 @@ def file_loader(
     if (suffix := path.suffix) not in READERS:
         raise DocmaDataProviderError(f'Unknown file type "{suffix} for "file" data source')
 
-    buf = StringIO(context.tpkg.read_text(path))
-    return READERS[suffix](buf)
+    with context.tpkg.open_text(path) as fp:
+        yield from READERS[suffix](fp)
+
+
+# ------------------------------------------------------------------------------
+# noinspection PyUnusedLocal
+@data_provider('file')
+def file_loader(
+    data_src: DataSourceSpec, context: DocmaRenderContext, **kwargs
+) -> list[dict[str, Any]]:
+    """Load data from a file in the document template package."""
+
+    return list(file_streamer(data_src, context, **kwargs))
@@ -16,58 +16,97 @@ from __future__ import annotations
 
 import os
 import re
+import shutil
 import warnings
 from base64 import b64encode
-from collections.abc import Sequence
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import suppress
+from dataclasses import replace
 from datetime import datetime, timezone
-from functools import partial
+from functools import cache, cached_property, partial
 from io import BytesIO
 from logging import getLogger
 from pathlib import Path
-from typing import Any, Callable, NoReturn
+from threading import get_ident
+from typing import TYPE_CHECKING, Any, Callable, NoReturn
 from urllib.parse import urlparse, urlunparse
 
-import altair as alt
-import jsonschema
-import weasyprint
 import yaml
-from bs4 import BeautifulSoup, Tag  # noqa
-from jinja2 import Template
-from pypdf import PdfReader, PdfWriter
-from pypdf.generic import RectangleObject
-from weasyprint.text.fonts import FontConfiguration
+from jinja2 import Template, nodes
 
 from docma.compilers import compiler_for_file
 from docma.config import (
+    DOC_CACHE_DIR_ENV,
+    DOC_CACHE_DISK_MAX_SIZE,
+    DOC_CACHE_SCHEMES,
+    DOC_CACHE_SIZE,
     EMBED_IMG_MAX_SIZE,
     EMBED_IMG_MIN_SIZE,
     IMPORT_MAX_SIZE,
     LOGNAME,
+    OVERLAY_CACHE_SIZE,
+    PRERENDER_DIR,
+    PRERENDER_SCHEMES,
     RECTANGLE_FUZZ_PDF_UNITS,
+    STATIC_PDF_CACHE_SIZE,
+    URL_PREFETCH_SCHEMES,
+    URL_PREFETCH_THREADS,
     WEASYPRINT_OPTIONS,
+    WEASYPRINT_RESOURCE_CACHE_SCHEMES,
+    WEASYPRINT_RESOURCE_CACHE_SIZE,
 )
 from docma.data_providers import DataSourceSpec, load_data
 from docma.exceptions import DocmaPackageError, DocmaUrlFetchError
 from docma.importers import import_content
-from docma.jinja import DOCMA_JINJA_EXTRAS, DocmaJinjaEnvironment, DocmaRenderContext
-from docma.lib.html import html_append
-from docma.lib.jsonschema import FORMAT_CHECKER
+from docma.jinja import (
+    DOCMA_JINJA_EXTRAS,
+    DocmaJinjaEnvironment,
+    DocmaRenderContext,
+    PackageBytecodeCache,
+)
+from docma.lib.cache import (
+    DiskCache,
+    StatsCache,
+    TieredCache,
+    WeasyResourceCache,
+    content_key,
+)
+from docma.lib.html import html_append, normalise_url, resource_urls
+from docma.lib.lazy import lazy_import
 from docma.lib.metadata import DocumentMetadata
 from docma.lib.misc import (
     chunks,
     datetime_pdf_format,
-    deep_update_dict,
+    documents_to_pdf,
     dot_dict_set,
-    html_to_pdf,
+    html_to_document,
+    is_transient_error,
     path_matches,
     str2bool,
 )
 from docma.lib.packager import PackageReader, PackageWriter
+from docma.lib.scope import ParamScope
 from docma.url_fetchers import get_url_fetcher_for_scheme
 from docma.validators import validate_content
 from docma.version import __version__
 
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, Tag
+    from pypdf import PageObject, PdfReader, PdfWriter
+    from pypdf.generic import IndirectObject, RectangleObject
+    from weasyprint.document import Document
+    from weasyprint.text.fonts import FontConfiguration
+
+alt = lazy_import('altair')
+babel_localedata = lazy_import('babel.localedata')
+bs4 = lazy_import('bs4')
+jsonschema = lazy_import('jsonschema')
+pypdf = lazy_import('pypdf')
+weasyprint = lazy_import('weasyprint')
+weasyprint_fonts = lazy_import('weasyprint.text.fonts')
+docma_jsonschema = lazy_import('docma.lib.jsonschema')
+
 __author__ = 'Murray Andrews'
 
 # Tend to see this on Amazon Linux 2023 with crappy fonts.
@@ -75,6 +114,9 @@ warnings.filterwarnings('ignore', message="'instantiateVariableFont' is deprecat
 
 LOG = getLogger(LOGNAME)
 
+# Parsed static PDF documents from template packages
+_PACKAGE_PDFS = StatsCache(STATIC_PDF_CACHE_SIZE)
+
 PKG_CONFIG_FILE = 'config.yaml'
 PKG_INFO_FILE = '.docma.yaml'
 DOCMA_FORMAT_VERSION = int(__version__.split('.')[0])
@@ -82,24 +124,6 @@ PKG_IGNORE_FILES = ('.*',)  # Glob patterns for source files to exclude from tem
 
 SAFE_PATH_SYMBOLS = r'-_+=;:@%\w'  # Chars allowed in a path component
 SAFE_PATH_COMPONENT_RE = re.compile(fr'^[{SAFE_PATH_SYMBOLS}][{SAFE_PATH_SYMBOLS}.]*$')
-DOC_CREATOR = {
-    'html': ' '.join(
-        [
-            f'docma {__version__}',
-            f'Altair {alt.__version__}',
-            f'Vega-lite {alt.SCHEMA_VERSION.replace("v", "")}',
-        ]
-    ),
-    'pdf': ' '.join(
-        [
-            f'docma {__version__}',
-            f'WeasyPrint {weasyprint.__version__}',
-            f'Altair {alt.__version__}',
-            f'Vega-lite {alt.SCHEMA_VERSION.replace("v", "")}',
-        ]
-    ),
-}
-
 # This is used when embedding an image as Base64 data in HTML.
 IMG_SRC_TEMPLATE = Template(
     """data:{{ img_type }};base64,
@@ -110,6 +134,30 @@ IMG_SRC_TEMPLATE = Template(
 )
 
 
+# ------------------------------------------------------------------------------
+@cache
+def doc_creator(doc_format: str) -> str:
+    """
+    Get the creator string for generated documents.
+
+    This is done on demand rather than at import time because it requires
+    importing some very slow to load packages.
+
+    :param doc_format:  Either `html` or `pdf`.
+    """
+
+    creator = [f'docma {__version__}']
+    if doc_format == 'pdf':
+        creator.append(f'WeasyPrint {weasyprint.__version__}')
+    creator.extend(
+        [
+            f'Altair {alt.__version__}',
+            f'Vega-lite {alt.SCHEMA_VERSION.replace("v", "")}',
+        ]
+    )
+    return ' '.join(creator)
+
+
 # ------------------------------------------------------------------------------
 def write_template_version_info(tpkg: PackageWriter) -> None:
     """Write version information into a magic file in a compiled template package."""
@@ -214,6 +262,79 @@ class DocSpec:
         return getattr(self._purl, attr)
 
 
+# ------------------------------------------------------------------------------
+@cache
+def _bytecode_env() -> DocmaJinjaEnvironment:
+    """
+    Get the Jinja environment used to precompile templates.
+
+    This must be configured the same way as the rendering environment in
+    `DocmaRenderContext` and `TemplateSession`, apart from the loader.
+    """
+    return DocmaJinjaEnvironment(autoescape=True, template_cache_size=0)
+
+
+# ------------------------------------------------------------------------------
+def write_template_bytecode(content: str | bytes, dst: Path, tpkg: PackageWriter) -> None:
+    """
+    Precompile a HTML file in a template package to Jinja bytecode.
+
+    The bytecode is stored in the package and used at render time to avoid
+    compiling the template again. This is purely an optimisation so failure
+    is not fatal.
+
+    :param content:     The content of the HTML file.
+    :param dst:         Path within the package of the HTML file.
+    :param tpkg:        The document template package.
+    """
+
+    if dst.suffix.lower() not in ('.html', '.htm'):
+        return
+
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    LOG.debug('Precompiling %s', dst)
+    try:
+        PackageBytecodeCache(tpkg).compile(_bytecode_env(), dst.as_posix(), content)
+    except Exception as e:
+        LOG.warning('Cannot precompile %s: %s', dst, e)
+
+
+# ------------------------------------------------------------------------------
+def is_static_html(html: str) -> bool:
+    """
+    Check if a HTML document can be rendered to PDF when the template is compiled.
+
+    This is the case if it contains no Jinja constructs and only references
+    resources within the template package.
+
+    :param html:        The HTML document source.
+    :return:            True if the document is static.
+    """
+
+    try:
+        if any(kind != 'data' for _, kind, _ in _bytecode_env().lex(html)):
+            return False
+    except Exception:
+        return False
+    return all(urlparse(url).scheme.lower() in PRERENDER_SCHEMES for url in resource_urls(html))
+
+
+# ------------------------------------------------------------------------------
+def prerendered_path(doc_path: str, html: str) -> str:
+    """
+    Get the location in a template package of a pre-rendered document.
+
+    The location includes a digest of the document source so a pre-rendered
+    PDF is never used in place of a document that has since changed.
+
+    :param doc_path:    The document path in the template package.
+    :param html:        The document source.
+    :return:            The path of the pre-rendered PDF.
+    """
+    return f'{PRERENDER_DIR}/{doc_path}.{content_key(html)}.pdf'
+
+
 # ------------------------------------------------------------------------------
 def copy_file_to_template(src: Path, dst: Path, tpkg: PackageWriter) -> Path:
     """
@@ -238,14 +359,17 @@ def copy_file_to_template(src: Path, dst: Path, tpkg: PackageWriter) -> Path:
         compiler = compiler_for_file(src)
     except KeyError:
         # No compilation required
+        write_template_bytecode(raw_content, dst, tpkg)
         return dst
 
     dst_compiled = dst.with_suffix('.html')
     LOG.info(f'Compiling {src} to {dst_compiled}')
     try:
-        tpkg.write_string(compiler(raw_content), dst_compiled)
+        compiled_content = compiler(raw_content)
+        tpkg.write_string(compiled_content, dst_compiled)
     except Exception as e:
         raise DocmaPackageError(f'Error compiling {src}: {e}')
+    write_template_bytecode(compiled_content, dst_compiled, tpkg)
     return dst_compiled
 
 
@@ -274,14 +398,17 @@ def import_file_to_template(src: str, dst: Path, tpkg: PackageWriter) -> Path:
         compiler = compiler_for_file(Path(src))
     except KeyError:
         # No compilation required
+        write_template_bytecode(imported_content, dst, tpkg)
         return dst
 
     dst_compiled = dst.with_suffix('.html')
     LOG.info(f'Compiling {dst} to {dst_compiled}')
     try:
-        tpkg.write_string(compiler(imported_content), dst_compiled)
+        compiled_content = compiler(imported_content)
+        tpkg.write_string(compiled_content, dst_compiled)
     except Exception as e:
         raise DocmaPackageError(f'Error compiling {src}: {e}')
+    write_template_bytecode(compiled_content, dst_compiled, tpkg)
     return dst_compiled
 
 
@@ -310,6 +437,10 @@ def compile_template(src_dir: str, tpkg: str) -> None:
         Path(dd.path) for dd in (DocSpec(d) for d in config.get('documents', [])) if not dd.scheme
     }
 
+    # Directory packages are not cleared before compiling so stale pre-rendered
+    # documents from an earlier compile must be removed.
+    shutil.rmtree(Path(tpkg) / PRERENDER_DIR, ignore_errors=True)
+
     with PackageWriter.new(tpkg) as pkg:
         # Process local files from the source dir first.
         for root, _dirs, files in os.walk(src_dir):
@@ -343,6 +474,14 @@ def compile_template(src_dir: str, tpkg: str) -> None:
         # Add metadata about the compiled template.
         write_template_version_info(pkg)
 
+    # Pre-render static documents. This needs the complete package.
+    with TemplateSession(tpkg) as session:
+        prerendered = session.prerender()
+    if prerendered:
+        with PackageWriter.new(tpkg, append=True) as pkg:
+            for path, content in prerendered.items():
+                pkg.write_bytes(content, path)
+
 
 # ------------------------------------------------------------------------------
 def docma_url_fetcher(url: str, context: DocmaRenderContext, *args, **kwargs) -> dict[str, Any]:
@@ -375,6 +514,56 @@ def docma_url_fetcher(url: str, context: DocmaRenderContext, *args, **kwargs) ->
         raise DocmaUrlFetchError(f'{url}: {e}') from e
 
 
+# ------------------------------------------------------------------------------
+def prefetch_url_fetcher(
+    html: str,
+    url_fetcher: Callable[..., dict],
+    task_url_fetcher: Callable[[], Callable[..., dict]] = None,
+) -> Callable[..., dict]:
+    """
+    Fetch the resources referenced in a HTML document concurrently.
+
+    WeasyPrint fetches resources one at a time during layout, so a document
+    with several remote resources or generated charts would wait for each in
+    turn. Instead, the HTML is scanned for resource URLs which are fetched in a
+    thread pool before layout. Only URL schemes with fetchers that are safe to
+    run concurrently are prefetched (see `URL_PREFETCH_SCHEMES`). Others are
+    fetched by WeasyPrint during layout as usual.
+
+    :param html:        The rendered HTML document.
+    :param url_fetcher: The URL fetcher to use.
+    :param task_url_fetcher: If specified, this is called to get a separate URL
+                        fetcher for each prefetch task, so that tasks don't
+                        share state (e.g. the rendering context). Otherwise,
+                        `url_fetcher` is used for all of them.
+    :return:            A URL fetcher that returns the prefetched results. Any
+                        URLs that were not prefetched are passed through to the
+                        original fetcher. Prefetch failures are raised when the
+                        URL is requested.
+    """
+
+    urls = resource_urls(html, URL_PREFETCH_SCHEMES)
+    if URL_PREFETCH_THREADS < 1 or len(urls) < 2:
+        return url_fetcher
+
+    def fetch(url: str) -> dict[str, Any]:
+        """Fetch a URL in a prefetch task."""
+        return (task_url_fetcher() if task_url_fetcher else url_fetcher)(url)
+
+    LOG.debug('Prefetching %d URLs', len(urls))
+    with ThreadPoolExecutor(max_workers=min(len(urls), URL_PREFETCH_THREADS)) as executor:
+        prefetched = {url: executor.submit(fetch, url) for url in urls}
+
+    def fetcher(url: str, *args, **kwargs) -> dict[str, Any]:
+        """Get prefetched URL content."""
+        try:
+            return prefetched[normalise_url(url)].result()
+        except KeyError:
+            return url_fetcher(url, *args, **kwargs)
+
+    return fetcher
+
+
 # ------------------------------------------------------------------------------
 def get_template_info(tpkg: PackageReader) -> dict[str, Any]:
     """Get information about a document template package."""
@@ -486,7 +675,7 @@ def embed_images(
     :return:            HTML with embedded images.
     """
 
-    parsed_html = BeautifulSoup(html, 'html.parser')
+    parsed_html = bs4.BeautifulSoup(html, 'html.parser')
     image_tags = parsed_html.find_all('img')
     if not image_tags:
         LOG.debug('No image tags found.')
@@ -521,7 +710,7 @@ def safe_render_path(path: str, context: DocmaRenderContext, *args: dict[str, An
     """
 
     rendered_path = []
-    params = deep_update_dict({}, context.params, *args)
+    params = ParamScope(context.params, *args)
     for path_component in path.split('/'):
         s = context.env.from_string(path_component).render(**params)
         if s and not SAFE_PATH_COMPONENT_RE.match(s):
@@ -570,11 +759,141 @@ def get_document_content(doc_name: str, context: DocmaRenderContext) -> bytes:
         raise DocmaPackageError(f'Document {doc_name}: {e}') from e
 
 
+# ------------------------------------------------------------------------------
+def package_pdf(tpkg: PackageReader, path: str) -> PdfReader:
+    """
+    Get a PDF document from a template package.
+
+    The parsed document is cached, keyed on the package, the path and a
+    fingerprint of the content, so each document is only parsed once per
+    process (and thread). Readers are shared so must not be modified.
+
+    The content is read into memory rather than memory mapped. A mapped file
+    that was changed in place while a cached reader was still using it would
+    crash the process. PDF readers are not thread safe, so each thread gets its
+    own.
+
+    :param tpkg:    The template package.
+    :param path:    Path of the PDF in the package.
+    :return:        A PDF reader.
+    """
+
+    key = content_key(str(tpkg.path.resolve()), path, tpkg.fingerprint(path), str(get_ident()))
+    return _PACKAGE_PDFS.get_or_create(key, lambda: pypdf.PdfReader(BytesIO(tpkg.read_bytes(path))))
+
+
+# ------------------------------------------------------------------------------
+def get_document_template(doc_name: str, context: DocmaRenderContext) -> Template:
+    """
+    Get the Jinja template for a HTML component document.
+
+    Documents that are part of the template package are loaded via the Jinja
+    environment's loader so that precompiled bytecode in the package is used.
+
+    :param doc_name:        Document name. This may be a local path (relative to
+                            the template root) or a URL handled by the content
+                            importer interface.
+    :param context:         Document rendering context.
+    :return:                The Jinja template for the document.
+    """
+
+    if urlparse(doc_name).scheme:
+        return context.env.from_string(get_document_content(doc_name, context).decode('utf-8'))
+
+    if not context.tpkg.exists(doc_name):
+        raise DocmaPackageError(f'Document {doc_name}: Not found')
+    return context.env.get_template(doc_name)
+
+
+# ------------------------------------------------------------------------------
+def render_document_html(doc_name: str, context: DocmaRenderContext) -> str:
+    """
+    Jinja render a HTML document.
+
+    :param doc_name:        Document name. This may be a filename relative to the
+                            template package or a URL.
+    :param context:         Document rendering context.
+    :return:                The rendered HTML.
+    """
+
+    template = get_document_template(doc_name, context)
+    try:
+        return template.render(**context.params)
+    except Exception as e:
+        raise Exception(f'Error rendering {doc_name}: {e}') from e
+
+
+# ------------------------------------------------------------------------------
+def document_to_weasy(
+    doc_name: str,
+    context: DocmaRenderContext,
+    font_config: FontConfiguration = None,
+    resource_cache: WeasyResourceCache = None,
+    html: str = None,
+) -> Document:
+    """
+    Render a single HTML document and lay it out with WeasyPrint.
+
+    If a resource cache is used, `resource_cache.images.end_render()` must be
+    called after the PDF has been written.
+
+    :param doc_name:        Document name. This may be a filename relative to the
+                            template package or a URL.
+    :param context:         Document rendering context.
+    :param font_config:     WeasyPrint font configuration for @font-face rules.
+    :param resource_cache:  Cache for URL content and images shared with other
+                            renders.
+    :param html:            The document HTML, if the document template has
+                            already been rendered.
+    :return:                A WeasyPrint document.
+    """
+
+    def context_url_fetcher(ctx: DocmaRenderContext) -> Callable[..., dict]:
+        """Get a URL fetcher for a rendering context."""
+        f = partial(docma_url_fetcher, context=ctx)
+        return resource_cache.url_fetcher(f) if resource_cache else f
+
+    if html is None:
+        html = render_document_html(doc_name, context)
+    # Each prefetch task gets its own rendering context, with a parameter scope
+    # over the document's parameters, in case a content generator updates them.
+    url_fetcher = prefetch_url_fetcher(
+        html,
+        context_url_fetcher(context),
+        lambda: context_url_fetcher(replace(context, params=ParamScope(context.params))),
+    )
+    transient_errors = []
+
+    def fetcher(url: str, *args, **kwargs) -> dict[str, Any]:
+        """Fetch a URL, keeping any transient errors that WeasyPrint would suppress."""
+        try:
+            return url_fetcher(url, *args, **kwargs)
+        except Exception as ex:
+            if is_transient_error(ex):
+                transient_errors.append(ex)
+            raise
+
+    try:
+        document = html_to_document(
+            html,
+            url_fetcher=fetcher,
+            font_config=font_config,
+            image_cache=resource_cache.images if resource_cache else None,
+        )
+        if transient_errors:
+            # Don't silently leave out content because of a transient failure.
+            raise transient_errors[0]
+        return document
+    except Exception as e:
+        raise Exception(f'Error rendering {doc_name}: {e}') from e
+
+
 # ------------------------------------------------------------------------------
 def document_to_pdf(
     doc_name: str,
     context: DocmaRenderContext,
     font_config: FontConfiguration = None,
+    resource_cache: WeasyResourceCache = None,
 ) -> PdfReader:
     """
     Render a single document to PDF.
@@ -583,47 +902,53 @@ def document_to_pdf(
                             template package or a URL.
     :param context:         Document rendering context.
     :param font_config:     WeasyPrint font configuration for @font-face rules.
+    :param resource_cache:  Cache for URL content and images shared with other
+                            renders.
     :return:                A PdfReader containing the document content.
     """
 
-    doc_content = get_document_content(doc_name, context)
-
     if doc_name.lower().endswith(('.html', '.htm')):
         # Render HTML docs
         try:
-            return html_to_pdf(
-                context.render(doc_content.decode('utf-8')),
-                url_fetcher=partial(docma_url_fetcher, context=context),
-                font_config=font_config,
+            return documents_to_pdf(
+                [document_to_weasy(doc_name, context, font_config, resource_cache)]
             )
-        except Exception as e:
-            raise Exception(f'Error rendering {doc_name}: {e}')
+        finally:
+            if resource_cache:
+                resource_cache.images.end_render()
 
     if doc_name.lower().endswith('.pdf'):
-        return PdfReader(BytesIO(doc_content))
+        if urlparse(doc_name).scheme:
+            return pypdf.PdfReader(BytesIO(get_document_content(doc_name, context)))
+        if not context.tpkg.exists(doc_name):
+            raise DocmaPackageError(f'Document {doc_name}: Not found')
+        return package_pdf(context.tpkg, doc_name)
 
     raise DocmaPackageError(f'Document {doc_name}: Unknown type')
 
 
 # ------------------------------------------------------------------------------
-def document_to_html(doc_name: str, context: DocmaRenderContext) -> BeautifulSoup:
+def document_to_html(
+    doc_name: str, context: DocmaRenderContext, resource_cache: WeasyResourceCache = None
+) -> BeautifulSoup:
     """
     Render a single document to HTML.
 
     :param doc_name:        Document name. This may be a filename relative to the
                             template package or a URL.
     :param context:         Document rendering context.
+    :param resource_cache:  Cache for URL content shared with other renders.
     :return:                A parsed HTML document.
     """
 
     if not doc_name.lower().endswith(('.html', '.htm')):
         raise DocmaPackageError(f'Document {doc_name}: Not a HTML file')
 
-    doc_content = get_document_content(doc_name, context)
-    html = context.render(doc_content.decode('utf-8'))
-    return BeautifulSoup(
-        embed_images(html, url_fetcher=partial(docma_url_fetcher, context=context)), 'html.parser'
-    )
+    url_fetcher = partial(docma_url_fetcher, context=context)
+    if resource_cache:
+        url_fetcher = resource_cache.url_fetcher(url_fetcher)
+    html = get_document_template(doc_name, context).render(**context.params)
+    return bs4.BeautifulSoup(embed_images(html, url_fetcher=url_fetcher), 'html.parser')
 
 
 # ------------------------------------------------------------------------------
@@ -642,6 +967,112 @@ def rectangles_approx_equal(
     return all(abs(v1 - v2) < tolerance for v1, v2 in zip(tuple(r1), tuple(r2)))
 
 
+# ------------------------------------------------------------------------------
+def geometry_key(rect: RectangleObject, tolerance: float = RECTANGLE_FUZZ_PDF_UNITS) -> tuple:
+    """
+    Quantise a rectangle so that rectangles of (about) the same size share a key.
+
+    :param rect:        A rectangle.
+    :param tolerance:   Quantisation step in PDF units (1/72 inch).
+    :return:            A hashable key for the rectangle geometry.
+    """
+
+    return tuple(round(float(v) / tolerance) for v in rect)
+
+
+# ------------------------------------------------------------------------------
+def render_overlay_page(
+    doc_name: str,
+    context: DocmaRenderContext,
+    font_config: FontConfiguration = None,
+    resource_cache: WeasyResourceCache = None,
+    overlay_cache: StatsCache = None,
+) -> PageObject | None:
+    """
+    Render the first page of an overlay document.
+
+    HTML overlays are cached by the content of the rendered HTML, so an overlay
+    that does not depend on per-document parameters is only laid out once.
+
+    :param doc_name:        Overlay document name.
+    :param context:         Document rendering context.
+    :param font_config:     WeasyPrint font configuration for @font-face rules.
+    :param resource_cache:  Cache for URL content and images shared with other
+                            renders.
+    :param overlay_cache:   Cache for rendered overlay pages.
+    :return:                The overlay page or None if the overlay is empty.
+    """
+
+    def render() -> PageObject | None:
+        """Render the overlay PDF."""
+        if html is None:
+            overlay_pdf = document_to_pdf(doc_name, context, font_config, resource_cache)
+        else:
+            try:
+                overlay_pdf = documents_to_pdf(
+                    [document_to_weasy(doc_name, context, font_config, resource_cache, html)]
+                )
+            finally:
+                if resource_cache:
+                    resource_cache.images.end_render()
+        return overlay_pdf.pages[0] if overlay_pdf.pages else None
+
+    html = None
+    if doc_name.lower().endswith(('.html', '.htm')):
+        html = render_document_html(doc_name, context)
+    if overlay_cache is None:
+        return render()
+    return overlay_cache.get_or_create(content_key(doc_name, html or ''), render)
+
+
+# ------------------------------------------------------------------------------
+def add_overlay_form(
+    pdf: PdfWriter, overlay_page: PageObject, over: bool
+) -> tuple[str, IndirectObject, IndirectObject, IndirectObject]:
+    """
+    Add an overlay page to a PDF as a Form XObject that pages can reference.
+
+    Pages draw the overlay by wrapping their content in a pair of content
+    streams: the first one does the drawing for a watermark, the second one for
+    a stamp. The streams are the same for every page, so they are only added
+    once.
+
+    :param pdf:             Target PDF.
+    :param overlay_page:    The overlay page.
+    :param over:            Whether the overlay goes on top (stamp) or
+                            underneath (watermark).
+    :return:                A tuple (XObject name, XObject, prefix content,
+                            suffix content).
+    """
+
+    generic = pypdf.generic
+    form = generic.DecodedStreamObject()
+    contents = overlay_page.get_contents()
+    form.set_data(b'' if contents is None else contents.get_data())
+    form.update(
+        {
+            generic.NameObject('/Type'): generic.NameObject('/XObject'),
+            generic.NameObject('/Subtype'): generic.NameObject('/Form'),
+            generic.NameObject('/BBox'): generic.ArrayObject(
+                generic.FloatObject(v) for v in overlay_page.mediabox
+            ),
+        }
+    )
+    if (resources := overlay_page.get('/Resources')) is not None:
+        form[generic.NameObject('/Resources')] = resources.get_object().clone(pdf)
+    # pypdf has no public method for adding an indirect object to a PdfWriter
+    xobject = pdf._add_object(form.flate_encode())  # noqa: SLF001
+
+    name = generic.NameObject(f'/DocmaOverlay{xobject.idnum}')
+    draw = f'q {name} Do Q\n'
+    wrappers = []
+    for content in ('q\n', f'Q\n{draw}') if over else (f'{draw}q\n', 'Q\n'):
+        stream = generic.DecodedStreamObject()
+        stream.set_data(content.encode('latin-1'))
+        wrappers.append(pdf._add_object(stream))  # noqa: SLF001
+    return name, xobject, *wrappers
+
+
 # ------------------------------------------------------------------------------
 def apply_overlay(
     pdf: PdfWriter,
@@ -650,10 +1081,16 @@ def apply_overlay(
     context: DocmaRenderContext,
     font_config: FontConfiguration = None,
     over=False,
+    resource_cache: WeasyResourceCache = None,
+    overlay_cache: StatsCache = None,
 ) -> None:
     """
     Find the first overlay in a document sequence that matches the sample geometry.
 
+    Each overlay page is added to the PDF once, as a Form XObject, which is then
+    drawn on every page with matching geometry. Annotations (e.g. links) in the
+    overlay are not copied.
+
     :param pdf:         Target PDF to which the overlay should be applied.
                         find a matching overlay.
     :param overlay_id:  Overlay ID within config file.
@@ -662,6 +1099,10 @@ def apply_overlay(
     :param font_config: WeasyPrint font configuration for @font-face rules.
     :param over:        Whether to apply the overlay on top (stamp) or underneath
                         (watermark).
+    :param resource_cache: Cache for URL content and images shared with other
+                        renders.
+    :param overlay_cache: Cache for rendered overlay pages shared with other
+                        renders.
     :raise Exception:   If no overlay with matching geometry is found.
     """
 
@@ -683,19 +1124,50 @@ def apply_overlay(
         LOG.debug('Rendering overlay %s', d)
         context.params['docma']['template']['overlay'] = d
         context.params['docma']['template']['overlay_path'] = Path(urlparse(d).path)
-        overlay_pdf = document_to_pdf(doc_name=d, context=context, font_config=font_config)
-        if not overlay_pdf.pages:
+        overlay_page = render_overlay_page(
+            d, context, font_config, resource_cache=resource_cache, overlay_cache=overlay_cache
+        )
+        if overlay_page is None:
             LOG.warning('Overlay %s is empty', d)
             continue
-        overlay_pages.append(overlay_pdf.pages[0])
+        overlay_pages.append(overlay_page)
+    # Reversed so the first overlay wins when more than one has the same key
+    overlay_by_geometry = {geometry_key(p.mediabox): p for p in reversed(overlay_pages)}
 
+    generic = pypdf.generic
+    overlay_forms = {}
     for page_num, page in enumerate(pdf.pages, 1):
-        for overlay_page in overlay_pages:
-            if rectangles_approx_equal(overlay_page.mediabox, page.mediabox):
-                page.merge_page(overlay_page, over=over)
-                break
-        else:
-            raise Exception(f'No overlay found for page {page_num} with geometry {page.mediabox}')
+        key = geometry_key(page.mediabox)
+        if (overlay_page := overlay_by_geometry.get(key)) is None:
+            # Sizes either side of a quantisation boundary won't share a key.
+            for p in overlay_pages:
+                if rectangles_approx_equal(p.mediabox, page.mediabox):
+                    overlay_page = overlay_by_geometry[key] = p
+                    break
+            else:
+                raise Exception(
+                    f'No overlay found for page {page_num} with geometry {page.mediabox}'
+                )
+        if (form := overlay_forms.get(id(overlay_page))) is None:
+            form = overlay_forms[id(overlay_page)] = add_overlay_form(pdf, overlay_page, over)
+        name, xobject, prefix, suffix = form
+
+        if '/Resources' not in page:
+            page[generic.NameObject('/Resources')] = generic.DictionaryObject()
+        resources = page['/Resources'].get_object()
+        if '/XObject' not in resources:
+            resources[generic.NameObject('/XObject')] = generic.DictionaryObject()
+        resources['/XObject'].get_object()[name] = xobject
+
+        contents = page.raw_get('/Contents') if '/Contents' in page else []
+        if isinstance(contents, generic.IndirectObject) and isinstance(
+            contents.get_object(), generic.ArrayObject
+        ):
+            contents = contents.get_object()
+        if not isinstance(contents, list):
+            contents = [contents]
+        page[generic.NameObject('/Contents')] = generic.ArrayObject([prefix, *contents, suffix])
+
     # Cleanup changes made to render params
     for k in ('overlay_id', 'overlay', 'overlay_path'):
         del context.params['docma']['template'][k]
@@ -709,13 +1181,18 @@ def set_metadata_pdf(pdf: PdfWriter, metadata: DocumentMetadata, context: DocmaR
 
 
 # ------------------------------------------------------------------------------
-def coalesce_docma_render_params(config, *d: dict[str, Any]) -> dict[str, Any]:
+def coalesce_docma_render_params(config, *d: dict[str, Any]) -> ParamScope:
     """
     Coalesce the template config parameter defaults with docma params and dynamic params.
 
+    The result is a layered `ParamScope` over the sources rather than a merged
+    copy of them. Changes made to it don't affect the config or the dynamic
+    params, which matters when the config is held across multiple renders in a
+    TemplateSession.
+
     :param config:  The docma template config.
     :param d:       Dynamic parameters.
-    :return:        A unified rendering parameter dictionary.
+    :return:        A unified rendering parameter mapping.
     """
 
     # noinspection PyUnusedLocal
@@ -723,8 +1200,7 @@ def coalesce_docma_render_params(config, *d: dict[str, Any]) -> dict[str, Any]:
         """Create a place holder for docma.data()."""
         raise DocmaPackageError('docma.data() cannot be used here')
 
-    return deep_update_dict(
-        {},
+    return ParamScope(
         config.get('parameters', {}).get('defaults', {}),
         *d,
         {'docma': DOCMA_JINJA_EXTRAS},
@@ -744,85 +1220,515 @@ def coalesce_docma_render_params(config, *d: dict[str, Any]) -> dict[str, Any]:
 
 
 # ------------------------------------------------------------------------------
-def render_template_to_pdf(
-    template_pkg_name: str,
-    render_params: dict[str, Any],
-    watermark: Sequence[str] = None,
-    stamp: Sequence[str] = None,
-    compression: int = 0,
-) -> PdfWriter:
-    """
-    Generate PDF output from a document template package.
+def set_metadata_html(html: BeautifulSoup, metadata: DocumentMetadata, context: DocmaRenderContext):
+    """Set the metadata in a HTML doc."""
 
-    :param template_pkg_name:   Name of the ZIP file / direectory containing the
-                                compiled template package.
-    :param render_params:       Rendering parameters.
-    :param watermark:           A sequence of IDs of overlay documents to apply
-                                under the PDF.
-    :param stamp:               A sequence of IDs of overlay documents to apply
-                                over the PDF.
-    :param compression:         Compression level for PDF output 0..9.
-    :return:                    PDF output file as a PyPDF PdfWriter instance.
+    if not html.head:
+        head = html.new_tag('head')
+        html.html.insert(0, head)
+
+    for k, v in metadata.as_dict('html').items():
+        for t in html.find_all('meta', attrs={'name': k}):
+            LOG.debug('Deleting existing tag %s', t)
+            t.decompose()
+
+        html.head.append(html.new_tag('meta', attrs={'name': k, 'content': context.render(v)}))
+        LOG.debug('Adding meta tag %s=%s', k, v)
+
+
+# ------------------------------------------------------------------------------
+class TemplateSession:
     """
+    A compiled document template package opened for (repeated) rendering.
 
-    # ----------------------------------------
-    def docma_data(
-        src_type: str, location: str, query: str = None, params: dict[str, Any] = None
-    ) -> list[dict[str, Any]]:
-        """Provide the Jinja renderer with access to the data providers subsystem."""
-        if not render_params:
-            raise DocmaPackageError('docma.data cannot be used here')
-        data_src = DataSourceSpec(src_type, location, query)
-        return load_data(data_src, context, params=params)
+    Everything that does not depend on the rendering parameters is loaded once,
+    when the session is created (or on first use), and reused for every
+    subsequent render. This includes the package reader, the template config,
+    the Jinja environment (and hence any templates it has compiled), parsed
+    WeasyPrint stylesheets, the WeasyPrint font configuration and the content
+    of static resources, such as images, fetched by URL.
 
-    # ----------------------------------------
-    output_pdf = PdfWriter()
-    font_config = FontConfiguration()
+    This is the efficient way to render a template many times. e.g.
 
-    with PackageReader.new(template_pkg_name) as tpkg:
-        check_template_version_info(tpkg)
+    ```python
+    from docma import TemplateSession
 
-        # Load template config and prep our Jinja renderer
-        config = yaml.safe_load(tpkg.read_text(PKG_CONFIG_FILE))
-        render_params = coalesce_docma_render_params(config, render_params)
+    with TemplateSession('my-template.zip') as session:
+        for params in lots_of_params:
+            pdf = session.render_pdf(params)
+            ...
+    ```
+
+    :param template_pkg_name:   Name of the ZIP file / directory containing the
+                                compiled template package.
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(self, template_pkg_name: str):
+        """Open a template package for rendering."""
+
+        self.template_pkg_name = str(template_pkg_name)
+        self.tpkg = PackageReader.new(template_pkg_name)
+        try:
+            check_template_version_info(self.tpkg)
+            self.config = yaml.safe_load(self.tpkg.read_text(PKG_CONFIG_FILE))
+        except Exception:
+            self.close()
+            raise
+        self.env = DocmaJinjaEnvironment(
+            loader=self.tpkg, autoescape=True, bytecode_cache=PackageBytecodeCache(self.tpkg)
+        )
+        self.font_config = weasyprint_fonts.FontConfiguration()
+        self.resource_cache = WeasyResourceCache(
+            WEASYPRINT_RESOURCE_CACHE_SIZE, WEASYPRINT_RESOURCE_CACHE_SCHEMES
+        )
+        self.overlay_cache = StatsCache(OVERLAY_CACHE_SIZE)
+        doc_cache_dir = os.environ.get(DOC_CACHE_DIR_ENV)
+        self.doc_cache = TieredCache(
+            DOC_CACHE_SIZE,
+            DiskCache(doc_cache_dir, DOC_CACHE_DISK_MAX_SIZE) if doc_cache_dir else None,
+        )
+        # Location of pre-rendered documents in the package (or None), by path.
+        self._prerendered: dict[str, str | None] = {}
+        # Keys of rendered HTML documents seen but not (yet) in the doc cache.
+        self._doc_keys_seen = StatsCache(DOC_CACHE_SIZE * 10)
+        # Snapshot of weasyprint.DEFAULT_OPTIONS, including the parsed
+        # stylesheets, after the first PDF render.
+        self._weasy_options: dict[str, Any] | None = None
+        # Whether warm_up() has been done.
+        self._warm = False
+
+    # --------------------------------------------------------------------------
+    def __enter__(self):
+        """Enter session context."""
+        return self
+
+    # --------------------------------------------------------------------------
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Close the session."""
+        self.close()
+
+    # --------------------------------------------------------------------------
+    def close(self) -> None:
+        """Close the template package."""
+        self.tpkg.close()
+
+    # --------------------------------------------------------------------------
+    @property
+    def params_schema(self) -> dict[str, Any] | None:
+        """The JSONschema for rendering parameters from the template config (if any)."""
+        return self.config.get('parameters', {}).get('schema')
+
+    # --------------------------------------------------------------------------
+    def new_context(self, render_params: dict[str, Any], doc_format: str) -> DocmaRenderContext:
+        """
+        Create a fresh rendering context for a single render.
+
+        :param render_params:   Rendering parameters.
+        :param doc_format:      Output document format (`PDF` or `HTML`).
+        :return:                A rendering context sharing the session's
+                                package reader and Jinja environment.
+        """
+
+        # ----------------------------------------
+        def docma_data(
+            src_type: str, location: str, query: str = None, params: dict[str, Any] = None
+        ) -> list[dict[str, Any]]:
+            """Provide the Jinja renderer with access to the data providers subsystem."""
+            if not render_params:
+                raise DocmaPackageError('docma.data cannot be used here')
+            data_src = DataSourceSpec(src_type, location, query)
+            return load_data(data_src, context, params=params)
+
+        # ----------------------------------------
+        render_params = coalesce_docma_render_params(self.config, render_params)
         dot_dict_set(render_params, 'docma.data', docma_data)
-        dot_dict_set(render_params, 'docma.format', 'PDF')
+        dot_dict_set(render_params, 'docma.format', doc_format)
         LOG.debug('Render parameters: %s', render_params)
-        context = DocmaRenderContext(
-            tpkg=tpkg,
-            env=DocmaJinjaEnvironment(loader=tpkg, autoescape=True),
-            params=render_params,
-        )
+        context = DocmaRenderContext(tpkg=self.tpkg, env=self.env, params=render_params)
+        return context
+
+    # --------------------------------------------------------------------------
+    @cached_property
+    def params_validator(self) -> jsonschema.Validator | None:
+        """
+        The JSONschema validator for rendering parameters (if any).
+
+        The validator is created, and the schema checked, once per session
+        rather than for every render.
+        """
+
+        if not (params_schema := self.params_schema):
+            return None
+        validator_cls = jsonschema.validators.validator_for(params_schema)
+        validator_cls.check_schema(params_schema)
+        return validator_cls(params_schema, format_checker=docma_jsonschema.FORMAT_CHECKER)
+
+    # --------------------------------------------------------------------------
+    def _validate_params(self, context: DocmaRenderContext) -> None:
+        """If the config included a schema for params, use that to validate them."""
+
+        if validator := self.params_validator:
+            LOG.info('Validating parameters')
+            params = context.params
+            if isinstance(params, ParamScope):
+                params = params.to_dict()
+            # This is what jsonschema.validate() does, without creating a new
+            # validator each time.
+            if error := jsonschema.exceptions.best_match(validator.iter_errors(params)):
+                raise error
+
+    # --------------------------------------------------------------------------
+    def validate_params(self, render_params: dict[str, Any], doc_format: str = 'PDF') -> None:
+        """
+        Validate rendering parameters against the template parameter schema.
+
+        This does the same validation as the render methods, without rendering.
+
+        :param render_params:   Rendering parameters.
+        :param doc_format:      Output document format (`PDF` or `HTML`).
+
+        :raise jsonschema.ValidationError: If the parameters are not valid.
+        """
+
+        self._validate_params(self.new_context(render_params, doc_format))
+
+    # --------------------------------------------------------------------------
+    def _set_weasy_options(self, context: DocmaRenderContext) -> None:
+        """
+        Set the WeasyPrint options for this template.
+
+        Stylesheets are parsed on the first call and the resulting options are
+        reinstated on later calls. As the parsed stylesheets are shared by all
+        renders, they are parsed with a context of their own rather than that of
+        the first render. Stylesheets that reference `docma:` URLs, which can
+        depend on the rendering parameters, are parsed for each render instead
+        (see `_dynamic_stylesheets`).
+        """
+
+        if self._dynamic_stylesheets:
+            set_weasy_options(
+                self.config.get('options'),
+                self.tpkg,
+                url_fetcher=partial(docma_url_fetcher, context=context),
+                font_config=self.font_config,
+            )
+            return
+
+        if self._weasy_options is None:
+            set_weasy_options(
+                self.config.get('options'),
+                self.tpkg,
+                url_fetcher=partial(docma_url_fetcher, context=self.new_context({}, 'PDF')),
+                font_config=self.font_config,
+            )
+            self._weasy_options = dict(weasyprint.DEFAULT_OPTIONS)
+        else:
+            weasyprint.DEFAULT_OPTIONS.update(self._weasy_options)
 
-        set_weasy_options(
-            config.get('options'),
-            tpkg,
-            url_fetcher=partial(docma_url_fetcher, context=context),
-            font_config=font_config,
-        )
+    # --------------------------------------------------------------------------
+    @cached_property
+    def _dynamic_stylesheets(self) -> bool:
+        """
+        Check if any of the template stylesheets reference `docma:` URLs.
 
-        # If the config included a schema for params, use that to validate them.
-        if params_schema := config.get('parameters', {}).get('schema'):
-            LOG.info('Validating parameters')
-            jsonschema.validate(context.params, params_schema, format_checker=FORMAT_CHECKER)
+        This is a simple text search so it can give false positives (e.g. in
+        comments). The only cost of those is that the stylesheets are parsed
+        for every render and static documents are not pre-rendered or cached.
+        """
 
-        # Process the document files
-        doc_no = 0
-        for doc in (DocSpec(d) for d in config['documents']):
+        options = self.config.get('options') or {}
+        return any('docma:' in self.tpkg.read_text(s) for s in options.get('stylesheets', []))
+
+    # --------------------------------------------------------------------------
+    def selected_documents(self, context: DocmaRenderContext) -> Iterator[DocSpec]:
+        """
+        Generate the documents selected for rendering by their `if` conditions.
+
+        :param context:     Document rendering context.
+        :return:            An iterator of the selected document specs.
+        """
+
+        for doc in (DocSpec(d) for d in self.config['documents']):
             # Check if this doc gets included
             if doc.if_condition and not str2bool(context.render(doc.if_condition)):
                 LOG.info('Skipping %s', doc)
                 continue
+            yield doc
+
+    # --------------------------------------------------------------------------
+    def prerender(self) -> dict[str, bytes]:
+        """
+        Render the static HTML documents in the template to PDF.
+
+        Static documents contain no Jinja and only reference resources within
+        the template package (see `is_static_html()`). This is purely an
+        optimisation so documents that can't be rendered are skipped.
 
+        :return:    A dictionary of PDF content keyed on the location of the
+                    pre-rendered document in the package (see `prerendered_path()`).
+        """
+
+        pdfs = {}
+        if self._dynamic_stylesheets:
+            LOG.info('Not pre-rendering documents: stylesheets reference docma: URLs')
+            return pdfs
+        try:
+            context = self.new_context({}, 'PDF')
+            self._set_weasy_options(context)
+        except Exception as e:
+            LOG.warning('Cannot pre-render documents: %s', e)
+            return pdfs
+
+        for doc in (DocSpec(d) for d in self.config.get('documents', [])):
+            if doc.scheme or not doc.path.lower().endswith(('.html', '.htm')):
+                continue
+            try:
+                html = self.tpkg.read_text(doc.path)
+                if (path := prerendered_path(doc.path, html)) in pdfs or not is_static_html(html):
+                    continue
+                LOG.info('Pre-rendering %s', doc.path)
+                try:
+                    pdfs[path] = document_to_weasy(
+                        doc.src,
+                        context,
+                        font_config=self.font_config,
+                        resource_cache=self.resource_cache,
+                        html=html,
+                    ).write_pdf()
+                finally:
+                    self.resource_cache.images.end_render()
+            except Exception as e:
+                LOG.warning('Cannot pre-render %s: %s', doc.path, e)
+        return pdfs
+
+    # --------------------------------------------------------------------------
+    def warm_up(self, render_params: dict[str, Any] = None, doc_format: str = 'PDF') -> None:
+        """
+        Pay the first-use costs of rendering up front.
+
+        Many of the components used in rendering do expensive initialisation
+        the first time they are used. This does as much of that as possible
+        before the first real render, which is useful for batch rendering
+        workers. This includes:
+
+        -   Compiling the HTML templates in the package.
+        -   Resolving the Jinja filters and tests the templates use (which
+            imports the plugins that provide them).
+        -   Loading the locale data for `parameters.defaults.locale`.
+        -   Setting up WeasyPrint, including parsing the stylesheets and
+            initialising fonts and text layout (PDF only).
+        -   Optionally, rendering (and discarding) a complete document, which
+            gets everything else.
+
+        Only the throwaway render is repeated if this is called again (e.g. in
+        a worker process forked from a parent that has already warmed up the
+        session).
+
+        :param render_params:   If not None, render a throwaway document with
+                                these rendering parameters. Failure to render
+                                the document is logged but is not an error as
+                                it may require parameters that are only
+                                available for real renders.
+        :param doc_format:      Output document format (`PDF` or `HTML`).
+        """
+
+        if not self._warm:
+            filters, tests = set(), set()
+            for name in self.tpkg.namelist():
+                if name.suffix.lower() not in ('.html', '.htm'):
+                    continue
+                self.env.get_template(str(name))
+                ast = self.env.parse(self.tpkg.read_text(name))
+                filters.update(n.name for n in ast.find_all(nodes.Filter))
+                tests.update(n.name for n in ast.find_all(nodes.Test))
+            for name in filters:
+                self.env.filters.get(name)
+            for name in tests:
+                self.env.tests.get(name)
+            LOG.debug('Resolved filters: %s, tests: %s', sorted(filters), sorted(tests))
+
+            if locale := self.config.get('parameters', {}).get('defaults', {}).get('locale'):
+                babel_localedata.load(locale)
+            self._warm = True
+
+        if doc_format == 'PDF' and self._weasy_options is None:
+            if not self._dynamic_stylesheets:
+                self._set_weasy_options(self.new_context({}, doc_format))
+            weasyprint.HTML(string='<p>docma</p>').render(font_config=self.font_config)
+
+        if render_params is None:
+            return
+        try:
+            if doc_format == 'PDF':
+                self.render_pdf(render_params)
+            else:
+                self.render_html(render_params)
+        except Exception as e:
+            LOG.warning('Warm-up render failed: %s', e)
+
+    # --------------------------------------------------------------------------
+    def _prerendered_pdf(self, doc: DocSpec) -> PdfReader | None:
+        """
+        Get the pre-rendered PDF for a document, if there is one.
+
+        The pre-rendered PDF is only used if it was rendered from the current
+        document source.
+        """
+
+        if doc.scheme or not doc.path.lower().endswith(('.html', '.htm')):
+            return None
+        if doc.path not in self._prerendered:
+            path = None
+            with suppress(Exception):
+                path = prerendered_path(doc.path, self.tpkg.read_text(doc.path))
+            self._prerendered[doc.path] = path if path and self.tpkg.exists(path) else None
+        return package_pdf(self.tpkg, path) if (path := self._prerendered[doc.path]) else None
+
+    # --------------------------------------------------------------------------
+    @cached_property
+    def _style_key(self) -> str:
+        """
+        Get a cache key component for the template package and WeasyPrint options.
+
+        The package digest covers resources the documents and stylesheets
+        reference in the package (images, fonts etc.).
+        """
+
+        options = self.config.get('options') or {}
+        return content_key(
+            __version__,
+            weasyprint.__version__,
+            self.tpkg.digest(),
+            yaml.safe_dump(options, sort_keys=True),
+            *(self.tpkg.read_text(s) for s in options.get('stylesheets', [])),
+        )
+
+    # --------------------------------------------------------------------------
+    def _cached_doc_pdf(
+        self, doc_name: str, html: str, context: DocmaRenderContext
+    ) -> PdfReader | None:
+        """
+        Get the PDF for a static HTML document from the doc cache.
+
+        A document is static if it only references resources in the template
+        package (see `DOC_CACHE_SCHEMES`). It is rendered to PDF on its own, and
+        cached, the second time the same HTML is seen. Until then, None is
+        returned so that documents that are not repeated don't pay for a
+        separate PDF write.
+
+        :param doc_name:    Document name.
+        :param html:        The rendered document HTML.
+        :param context:     Document rendering context.
+        :return:            The document PDF or None if it's not cached.
+        """
+
+        if self._dynamic_stylesheets:
+            return None
+        urls = resource_urls(html)
+        if any(urlparse(url).scheme.lower() not in DOC_CACHE_SCHEMES for url in urls):
+            return None
+
+        key = content_key(self._style_key, doc_name, html)
+        if (content := self.doc_cache.get(key)) is None:
+            if self._doc_keys_seen.get(key) is None:
+                self._doc_keys_seen.put(key, True)
+                return None
+            try:
+                content = document_to_weasy(
+                    doc_name,
+                    context,
+                    font_config=self.font_config,
+                    resource_cache=self.resource_cache,
+                    html=html,
+                ).write_pdf()
+            finally:
+                self.resource_cache.images.end_render()
+            self.doc_cache.put(key, content)
+        return pypdf.PdfReader(BytesIO(content))
+
+    # --------------------------------------------------------------------------
+    def _append_weasy_docs(self, output_pdf: PdfWriter, weasy_docs: list[Document]) -> None:
+        """Write WeasyPrint documents as a single PDF, append it and clear the list."""
+
+        if not weasy_docs:
+            return
+        try:
+            output_pdf.append_pages_from_reader(documents_to_pdf(weasy_docs))
+        finally:
+            weasy_docs.clear()
+            self.resource_cache.images.end_render()
+
+    # --------------------------------------------------------------------------
+    def render_pdf(
+        self,
+        render_params: dict[str, Any],
+        watermark: Sequence[str] = None,
+        stamp: Sequence[str] = None,
+        compression: int = 0,
+        deduplicate: bool = False,
+    ) -> PdfWriter:
+        """
+        Generate PDF output from the document template package.
+
+        :param render_params:       Rendering parameters.
+        :param watermark:           A sequence of IDs of overlay documents to apply
+                                    under the PDF.
+        :param stamp:               A sequence of IDs of overlay documents to apply
+                                    over the PDF.
+        :param compression:         Compression level for PDF output 0..9.
+        :param deduplicate:         If True, merge identical objects (fonts, images
+                                    etc.) in the PDF that come from different
+                                    component documents and overlays.
+        :return:                    PDF output file as a PyPDF PdfWriter instance.
+        """
+
+        output_pdf = pypdf.PdfWriter()
+        context = self.new_context(render_params, 'PDF')
+        self._set_weasy_options(context)
+        self._validate_params(context)
+
+        # Process the document files. Consecutive HTML documents are laid out
+        # by WeasyPrint and then written as a single PDF, rather than writing
+        # and re-reading a PDF for each one. Static HTML documents come from
+        # the package (if pre-rendered when compiled) or the doc cache instead.
+        doc_no = 0
+        page_count = 0
+        weasy_docs = []
+        for doc in self.selected_documents(context):
             doc_no += 1
             LOG.info(f'Processing {doc}')
             context.params['docma']['template']['document'] = doc.src
             context.params['docma']['template']['document_path'] = Path(doc.path)
-            context.params['docma']['template']['page'] = len(output_pdf.pages) + 1
+            context.params['docma']['template']['page'] = page_count + 1
             context.params['docma']['template']['doc_no'] = doc_no
-            output_pdf.append_pages_from_reader(
-                document_to_pdf(doc.src, context, font_config=font_config)
-            )
+            if (doc_pdf := self._prerendered_pdf(doc)) is not None:
+                pass
+            elif doc.src.lower().endswith(('.html', '.htm')):
+                html = render_document_html(doc.src, context)
+                if (doc_pdf := self._cached_doc_pdf(doc.src, html, context)) is None:
+                    weasy_docs.append(
+                        document_to_weasy(
+                            doc.src,
+                            context,
+                            font_config=self.font_config,
+                            resource_cache=self.resource_cache,
+                            html=html,
+                        )
+                    )
+                    page_count += len(weasy_docs[-1].pages)
+                    continue
+            else:
+                doc_pdf = document_to_pdf(
+                    doc.src,
+                    context,
+                    font_config=self.font_config,
+                    resource_cache=self.resource_cache,
+                )
+            self._append_weasy_docs(output_pdf, weasy_docs)
+            output_pdf.append_pages_from_reader(doc_pdf)
+            page_count += len(doc_pdf.pages)
+        self._append_weasy_docs(output_pdf, weasy_docs)
 
         if not doc_no:
             # No documents were selected!
@@ -838,122 +1744,144 @@ def render_template_to_pdf(
         # Process watermarks / stamps
         for overlay_id in watermark or []:
             LOG.info(f'Applying watermark {overlay_id}')
-            apply_overlay(output_pdf, overlay_id, config, context, font_config=font_config)
+            apply_overlay(
+                output_pdf,
+                overlay_id,
+                self.config,
+                context,
+                font_config=self.font_config,
+                resource_cache=self.resource_cache,
+                overlay_cache=self.overlay_cache,
+            )
 
         for overlay_id in stamp or []:
             LOG.info(f'Applying stamp {overlay_id}')
             apply_overlay(
-                output_pdf, overlay_id, config, context, font_config=font_config, over=True
+                output_pdf,
+                overlay_id,
+                self.config,
+                context,
+                font_config=self.font_config,
+                over=True,
+                resource_cache=self.resource_cache,
+                overlay_cache=self.overlay_cache,
             )
 
-    if compression:
-        LOG.debug('Compressing PDF')
-        for page in output_pdf.pages:
-            page.compress_content_streams(compression)
-
-    # Add metadata
-    metadata = DocumentMetadata(**config.get('metadata', {}))
-    # TODO: The Metadata class should handle this formatting weirdness
-    metadata['creation_date'] = datetime_pdf_format()
-    metadata['creator'] = (
-        f'{Path(template_pkg_name).stem} {config["version"]} ({DOC_CREATOR["pdf"]})'
-    )
-    set_metadata_pdf(output_pdf, metadata, context)
-
-    return output_pdf
+        if compression:
+            LOG.debug('Compressing PDF')
+            for page in output_pdf.pages:
+                page.compress_content_streams(compression)
 
+        if deduplicate:
+            LOG.debug('Deduplicating PDF objects')
+            output_pdf.compress_identical_objects()
 
-# ------------------------------------------------------------------------------
-def set_metadata_html(html: BeautifulSoup, metadata: DocumentMetadata, context: DocmaRenderContext):
-    """Set the metadata in a HTML doc."""
-
-    if not html.head:
-        head = html.new_tag('head')
-        html.html.insert(0, head)
-
-    for k, v in metadata.as_dict('html').items():
-        for t in html.find_all('meta', attrs={'name': k}):
-            LOG.debug('Deleting existing tag %s', t)
-            t.decompose()
-
-        html.head.append(html.new_tag('meta', attrs={'name': k, 'content': context.render(v)}))
-        LOG.debug('Adding meta tag %s=%s', k, v)
-
-
-# ------------------------------------------------------------------------------
-def render_template_to_html(
-    template_pkg_name: str,
-    render_params: dict[str, Any],
-) -> BeautifulSoup:
-    """
-    Render a template to self contained HTML.
+        # Add metadata
+        metadata = DocumentMetadata(**self.config.get('metadata', {}))
+        # TODO: The Metadata class should handle this formatting weirdness
+        metadata['creation_date'] = datetime_pdf_format()
+        metadata['creator'] = (
+            f'{Path(self.template_pkg_name).stem} {self.config["version"]} ({doc_creator("pdf")})'
+        )
+        set_metadata_pdf(output_pdf, metadata, context)
 
-    :param template_pkg_name:   Name of the ZIP file / direectory containing the
-                                compiled template package.
-    :param render_params:       Rendering parameters.
-    :return:                    A BeautifulSoup HTML structure.
-    """
+        return output_pdf
 
-    # ----------------------------------------
-    def docma_data(
-        src_type: str, location: str, query: str = None, params: dict[str, Any] = None
-    ) -> list[dict[str, Any]]:
-        """Provide the Jinja renderer with access to the data providers subsystem."""
-        if not render_params:
-            raise DocmaPackageError('docma.data cannot be used here')
-        data_src = DataSourceSpec(src_type, location, query)
-        return load_data(data_src, context, params=params)
+    # --------------------------------------------------------------------------
+    def render_html(self, render_params: dict[str, Any]) -> BeautifulSoup:
+        """
+        Render the document template to self contained HTML.
 
-    # ----------------------------------------
-    with PackageReader.new(template_pkg_name) as tpkg:
-        check_template_version_info(tpkg)
+        :param render_params:       Rendering parameters.
+        :return:                    A BeautifulSoup HTML structure.
+        """
 
-        # Load template config and prep our Jinja renderer
-        config = yaml.safe_load(tpkg.read_text(PKG_CONFIG_FILE))
-        render_params = coalesce_docma_render_params(config, render_params)
-        dot_dict_set(render_params, 'docma.data', docma_data)
-        dot_dict_set(render_params, 'docma.format', 'HTML')
-        LOG.debug('Render parameters: %s', render_params)
-        context = DocmaRenderContext(
-            tpkg=tpkg,
-            env=DocmaJinjaEnvironment(loader=tpkg, autoescape=True),
-            params=render_params,
-        )
-
-        # If the config included a schema for params, use that to validate them.
-        if params_schema := config.get('parameters', {}).get('schema'):
-            LOG.info('Validating parameters')
-            jsonschema.validate(context.params, params_schema, format_checker=FORMAT_CHECKER)
+        context = self.new_context(render_params, 'HTML')
+        self._validate_params(context)
 
         # Process the document files
         doc_no = 0
         html_soup = None
-        for doc in (DocSpec(d) for d in config['documents']):
-            # Check if this doc gets included
-            if doc.if_condition and not str2bool(context.render(doc.if_condition)):
-                LOG.info('Skipping %s', doc)
-                continue
-
+        for doc in self.selected_documents(context):
             doc_no += 1
             LOG.info(f'Processing {doc}')
             context.params['docma']['template']['document'] = doc.src
             context.params['docma']['template']['document_path'] = Path(doc.path)
             context.params['docma']['template']['doc_no'] = doc_no
+            doc_html = document_to_html(doc.src, context, resource_cache=self.resource_cache)
             if not html_soup:
-                html_soup = document_to_html(doc.src, context)
+                html_soup = doc_html
             else:
-                html_append(html_soup, document_to_html(doc.src, context))
+                html_append(html_soup, doc_html)
 
         if not doc_no:
             # No documents were selected!
             raise DocmaPackageError('No documents were selected')
 
         # Add metadata
-        metadata = DocumentMetadata(**config.get('metadata', {}))
+        metadata = DocumentMetadata(**self.config.get('metadata', {}))
         metadata['creation_date'] = datetime.now(timezone.utc).isoformat()
         metadata['creator'] = (
-            f'{Path(template_pkg_name).stem} {config["version"]} ({DOC_CREATOR["html"]})'
+            f'{Path(self.template_pkg_name).stem} {self.config["version"]} ({doc_creator("html")})'
         )
         set_metadata_html(html_soup, metadata, context)
 
         return html_soup
+
+
+# ------------------------------------------------------------------------------
+def render_template_to_pdf(
+    template_pkg_name: str,
+    render_params: dict[str, Any],
+    watermark: Sequence[str] = None,
+    stamp: Sequence[str] = None,
+    compression: int = 0,
+    deduplicate: bool = False,
+) -> PdfWriter:
+    """
+    Generate PDF output from a document template package.
+
+    Use a `TemplateSession` instead when rendering the same template repeatedly.
+
+    :param template_pkg_name:   Name of the ZIP file / direectory containing the
+                                compiled template package.
+    :param render_params:       Rendering parameters.
+    :param watermark:           A sequence of IDs of overlay documents to apply
+                                under the PDF.
+    :param stamp:               A sequence of IDs of overlay documents to apply
+                                over the PDF.
+    :param compression:         Compression level for PDF output 0..9.
+    :param deduplicate:         If True, merge identical objects (fonts, images
+                                etc.) in the PDF that come from different
+                                component documents and overlays.
+    :return:                    PDF output file as a PyPDF PdfWriter instance.
+    """
+
+    with TemplateSession(template_pkg_name) as session:
+        return session.render_pdf(
+            render_params,
+            watermark=watermark,
+            stamp=stamp,
+            compression=compression,
+            deduplicate=deduplicate,
+        )
+
+
+# ------------------------------------------------------------------------------
+def render_template_to_html(
+    template_pkg_name: str,
+    render_params: dict[str, Any],
+) -> BeautifulSoup:
+    """
+    Render a template to self contained HTML.
+
+    Use a `TemplateSession` instead when rendering the same template repeatedly.
+
+    :param template_pkg_name:   Name of the ZIP file / direectory containing the
+                                compiled template package.
+    :param render_params:       Rendering parameters.
+    :return:                    A BeautifulSoup HTML structure.
+    """
+
+    with TemplateSession(template_pkg_name) as session:
+        return session.render_html(render_params)
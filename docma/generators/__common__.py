@@ -9,6 +9,7 @@ from pydantic import BaseModel
 
 from docma.exceptions import DocmaGeneratorError
 from docma.jinja import DocmaRenderContext
+from docma.lib.lazy import import_submodules
 
 _CONTENT_GENERATORS = {}
 
@@ -17,6 +18,7 @@ _CONTENT_GENERATORS = {}
 def content_generator_for_type(content_type: str) -> Callable:
     """Get the generator function for the specified content type."""
 
+    import_submodules(__package__)
     try:
         return _CONTENT_GENERATORS[content_type]
     except KeyError:
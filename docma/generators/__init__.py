@@ -49,18 +49,9 @@ on failure.
 Look at the `swatch` content generator as an example.
 """
 
-import pkgutil
-from importlib import import_module
-
 from .__common__ import (
     content_generator as content_generator,
     content_generator_for_type as content_generator_for_type,
 )
 
-# Auto import our generator functions
-for _, module_name, _ in pkgutil.iter_modules(__path__):
-    if module_name.startswith('_'):
-        continue
-    import_module(f'.{module_name}', package=__name__)
-
 __all__ = ['content_generator', 'content_generator_for_type']
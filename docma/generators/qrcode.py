@@ -5,12 +5,14 @@ from __future__ import annotations
 from io import BytesIO
 from typing import Any
 
-import qrcode
 from pydantic import BaseModel, ConfigDict, PositiveInt, conint
 
 from docma.jinja import DocmaRenderContext
+from docma.lib.lazy import lazy_import
 from .__common__ import content_generator
 
+qrcode = lazy_import('qrcode')
+
 
 # ------------------------------------------------------------------------------
 class QrCodeOptions(BaseModel):
@@ -5,13 +5,16 @@ from __future__ import annotations
 from io import BytesIO
 from typing import Any
 
-from PIL import Image, ImageDraw
 from pydantic import BaseModel, ConfigDict, PositiveInt
 
 from docma.jinja import DocmaRenderContext
+from docma.lib.lazy import lazy_import
 from docma.lib.misc import load_font
 from .__common__ import content_generator
 
+Image = lazy_import('PIL.Image')
+ImageDraw = lazy_import('PIL.ImageDraw')
+
 
 # ------------------------------------------------------------------------------
 class SwatchOptions(BaseModel):
@@ -3,22 +3,44 @@
 from __future__ import annotations
 
 import json
+import os
+from copy import deepcopy
+from datetime import date, time
+from decimal import Decimal
 from enum import Enum
-from io import BytesIO
-from tempfile import NamedTemporaryFile
+from functools import cache
+from importlib.metadata import version
+from logging import getLogger
 from typing import Any
 
-import altair as alt
 import yaml
 from pydantic import BaseModel, ConfigDict, Field, NonNegativeFloat, NonNegativeInt, field_validator
 
-from docma.config import VEGA_PPI
+from docma.config import (
+    LOGNAME,
+    VEGA_CACHE_DIR_ENV,
+    VEGA_CACHE_DISK_MAX_SIZE,
+    VEGA_CACHE_SIZE,
+    VEGA_PPI,
+)
 from docma.data_providers import DataSourceSpec, load_data
 from docma.exceptions import DocmaInternalError
 from docma.jinja import DocmaRenderContext
-from docma.lib.misc import dot_dict_set
+from docma.lib.cache import DiskCache, StatsCache, TieredCache, content_key
+from docma.lib.lazy import lazy_import
+from docma.lib.misc import deep_update_dict, dot_dict_set
 from .__common__ import content_generator
 
+LOG = getLogger(LOGNAME)
+
+alt = lazy_import('altair')
+vlc = lazy_import('vl_convert')
+
+_MIME_TYPES = {'svg': 'image/svg+xml', 'png': 'image/png'}
+
+# Keys of chart specs that have already been validated
+_VALIDATED_SPECS = StatsCache(VEGA_CACHE_SIZE)
+
 
 # ------------------------------------------------------------------------------
 class ChartFormatType(Enum):
@@ -61,6 +83,125 @@ class VegaOptions(BaseModel):
         return v if isinstance(v, list) else [v]
 
 
+# ------------------------------------------------------------------------------
+@cache
+def chart_cache() -> TieredCache:
+    """
+    Get the cache for rendered charts.
+
+    The disk tier is only used if the `DOCMA_VEGA_CACHE_DIR` environment
+    variable is set. Worker processes for batch rendering inherit this and
+    share the disk tier.
+    """
+
+    cache_dir = os.environ.get(VEGA_CACHE_DIR_ENV)
+    return TieredCache(
+        VEGA_CACHE_SIZE, DiskCache(cache_dir, VEGA_CACHE_DISK_MAX_SIZE) if cache_dir else None
+    )
+
+
+# ------------------------------------------------------------------------------
+@cache
+def _renderer_versions() -> str:
+    """Get the versions of the chart rendering components for use in cache keys."""
+    return ' '.join(f'{pkg}={version(pkg)}' for pkg in ('altair', 'vl-convert-python'))
+
+
+# ------------------------------------------------------------------------------
+def chart_key(spec: dict[str, Any], options: VegaOptions) -> str:
+    """
+    Get the cache key for a chart.
+
+    :param spec:    The final chart spec with data attached.
+    :param options: The chart options.
+    :return:        A key that is the same for identical chart renders.
+    """
+
+    return content_key(
+        json.dumps(spec, sort_keys=True, separators=(',', ':'), default=str),
+        options.format.value,
+        str(options.ppi),
+        str(options.scale),
+        _renderer_versions(),
+    )
+
+
+# ------------------------------------------------------------------------------
+def validate_chart_spec(spec: dict[str, Any], data_targets: list[str]) -> None:
+    """
+    Validate the structure of a chart spec against the Vega-Lite schema.
+
+    Validating a spec with the data attached is very slow for large datasets
+    and tells us nothing useful about the data. So validation is done before
+    the data is attached, using an empty list as a placeholder at each data
+    target. Each distinct spec is only validated once per process.
+
+    :param spec:        The chart spec without the data attached.
+    :param data_targets: Locations in the spec where data will be attached.
+    """
+
+    skeleton = deepcopy(spec)
+    for target in data_targets:
+        dot_dict_set(skeleton, target, [])
+    key = content_key(json.dumps(skeleton, sort_keys=True, default=str))
+    if _VALIDATED_SPECS.get(key):
+        return
+    alt.Chart.from_dict(skeleton)
+    _VALIDATED_SPECS.put(key, True)
+
+
+# ------------------------------------------------------------------------------
+@cache
+def _vl_version() -> str:
+    """Get the Vega-Lite version used by altair in the form required by vl-convert."""
+    return '_'.join(alt.SCHEMA_VERSION.split('.')[:2])
+
+
+# ------------------------------------------------------------------------------
+def _json_value(obj: Any) -> Any:
+    """
+    Convert values in chart data that JSON can't represent.
+
+    Data providers can return dates, times and decimals (e.g. for Postgres date
+    and numeric columns). Dates and times are converted to ISO 8601 strings,
+    which Vega-Lite parses as temporal values.
+    """
+
+    if isinstance(obj, (date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+# ------------------------------------------------------------------------------
+def render_chart(spec: dict[str, Any], options: VegaOptions) -> bytes:
+    """
+    Render a chart with vl-convert.
+
+    The spec is given directly to vl-convert, bypassing Altair chart objects,
+    as these are very slow to construct for large datasets. The active Altair
+    theme is applied, as Altair would do. vl-convert only accepts JSON types,
+    so other values in the chart data are converted (see `_json_value()`).
+
+    :param spec:    The final chart spec with data attached.
+    :param options: The chart options.
+    :return:        The rendered chart.
+    """
+
+    vl_spec = json.loads(json.dumps(deep_update_dict(alt.theme.get()(), spec), default=_json_value))
+
+    if options.format == ChartFormatType.svg:
+        return vlc.vegalite_to_svg(vl_spec, vl_version=_vl_version()).encode('utf-8')
+
+    if options.format == ChartFormatType.png:
+        return vlc.vegalite_to_png(
+            vl_spec, vl_version=_vl_version(), scale=options.scale, ppi=options.ppi
+        )
+
+    raise DocmaInternalError(f'Unsupported chart format: {options.format}')
+
+
 # ------------------------------------------------------------------------------
 @content_generator('vega', VegaOptions)
 def vega_chart(options: VegaOptions, context: DocmaRenderContext) -> dict[str, Any]:
@@ -80,24 +221,14 @@ def vega_chart(options: VegaOptions, context: DocmaRenderContext) -> dict[str, A
 
     spec = yaml.safe_load(context.render(context.tpkg.read_text(options.spec), options.params))
 
+    data_srcs = [DataSourceSpec.from_string(data_src_spec) for data_src_spec in options.data]
+    validate_chart_spec(spec, [data_src.target or 'data.values' for data_src in data_srcs])
+
     # Load our data and attach it into the chart spec
-    for data_src_spec in options.data:
-        data_src = DataSourceSpec.from_string(data_src_spec)
+    for data_src in data_srcs:
         target = data_src.target or 'data.values'
         dot_dict_set(spec, target, load_data(data_src, context, params=options.params))
-    chart = alt.Chart.from_dict(spec)
-
-    if options.format == ChartFormatType.svg:
-        # There is a bug in Altair writer for svg which forces it to be
-        # written to a file with a .svg suffix.
-        with NamedTemporaryFile('w+b', suffix='.svg') as tfp:
-            chart.save(tfp.name)
-            return {'string': tfp.read(), 'mime_type': 'image/svg+xml'}
-
-    if options.format == ChartFormatType.png:
-        buf = BytesIO()
-        chart.save(buf, format='png', ppi=options.ppi, scale_factor=options.scale)
-        buf.seek(0)
-        return {'string': buf.read(), 'mime_type': 'image/png'}
-
-    raise DocmaInternalError(f'Unsupported chart format: {options.format}')
+    key = chart_key(spec, options)
+    content = chart_cache().get_or_create(key, lambda: render_chart(spec, options))
+    LOG.debug('Vega chart %s: cache stats %s', options.spec, chart_cache().stats)
+    return {'string': content, 'mime_type': _MIME_TYPES[options.format.value]}
@@ -8,6 +8,7 @@ from urllib.parse import urlparse
 
 from docma.config import IMPORT_CACHE_SIZE
 from docma.exceptions import DocmaImportError
+from docma.lib.lazy import import_submodules
 
 _CONTENT_IMPORTERS = {}
 
@@ -47,6 +48,7 @@ def import_content(url: str, max_size: int = 0) -> bytes:
                         (no limit).
     """
 
+    import_submodules(__package__)
     try:
         import_handler = _CONTENT_IMPORTERS[urlparse(url).scheme]
     except KeyError:
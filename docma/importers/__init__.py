@@ -27,19 +27,9 @@ on failure.
 
 """
 
-import pkgutil
-from importlib import import_module
-
 from .__common__ import (
     content_importer as content_importer,
     import_content as import_content,
 )
 
-# Auto import our generator functions
-for _, module_name, _ in pkgutil.iter_modules(__path__):
-    if module_name.startswith('_'):
-        continue
-    import_module(f'.{module_name}', package=__name__)
-
-
 __all__ = ['content_importer', 'import_content']
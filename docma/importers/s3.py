@@ -4,11 +4,13 @@ from __future__ import annotations
 
 from functools import lru_cache
 
-import boto3
 
 from docma.exceptions import DocmaImportError
+from docma.lib.lazy import lazy_import
 from .__common__ import content_importer
 
+boto3 = lazy_import('boto3')
+
 
 # ------------------------------------------------------------------------------
 @lru_cache(maxsize=1)
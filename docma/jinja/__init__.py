@@ -2,6 +2,7 @@
 
 __author__ = 'Murray Andrews'
 
+from .bytecode import PackageBytecodeCache as PackageBytecodeCache
 from .core import (
     DOCMA_JINJA_EXTRAS as DOCMA_JINJA_EXTRAS,
     DocmaJinjaEnvironment as DocmaJinjaEnvironment,
@@ -22,4 +23,5 @@ __all__ = [  # noqa: RUF022
     'jext',
     'jfunc',
     'NoLoader',
+    'PackageBytecodeCache',
 ]
@@ -0,0 +1,96 @@
+"""Jinja bytecode cache stored in docma template packages."""
+
+from __future__ import annotations
+
+import sys
+from hashlib import sha1
+
+import jinja2
+from jinja2.bccache import Bucket
+
+from docma.config import JINJA_BYTECODE_DIR
+from docma.lib.packager import PackageReader, PackageWriter
+from docma.version import __version__
+
+__author__ = 'Murray Andrews'
+
+# Bytecode is only valid for the exact versions that produced it. Jinja also
+# checks this itself but we don't even want to look at stale bytecode.
+BYTECODE_TAG = (
+    f'docma-{__version__}'
+    f'_jinja-{jinja2.__version__}'
+    f'_py{sys.version_info.major}.{sys.version_info.minor}'
+)
+
+
+# ------------------------------------------------------------------------------
+class PackageBytecodeCache(jinja2.BytecodeCache):
+    """
+    Jinja bytecode cache that lives inside a docma template package.
+
+    When backed by a `PackageWriter`, bytecode is written into the package (at
+    template compile time). When backed by a `PackageReader`, bytecode is loaded
+    from the package (at render time) and nothing is ever written. Jinja checks
+    a checksum of the template source before using the bytecode so stale
+    entries are simply ignored.
+
+    :param tpkg:    The template package.
+    """
+
+    def __init__(self, tpkg: PackageReader | PackageWriter):
+        """Create a package bytecode cache."""
+        self.tpkg = tpkg
+        self.hits = 0
+        self.misses = 0
+
+    # --------------------------------------------------------------------------
+    def get_cache_key(self, name: str, filename: str | None = None) -> str:
+        """
+        Get the cache key for a template.
+
+        Unlike the Jinja default, this does not include the filename because
+        that is the location of the package, which can change after compilation.
+        """
+        return sha1(name.encode('utf-8')).hexdigest()  # noqa: S324
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def bytecode_path(key: str) -> str:
+        """Get the location in the package of the bytecode for the given key."""
+        return f'{JINJA_BYTECODE_DIR}/{BYTECODE_TAG}/{key}'
+
+    # --------------------------------------------------------------------------
+    def load_bytecode(self, bucket: Bucket) -> None:
+        """Load bytecode from the package into the bucket, if available."""
+
+        if isinstance(self.tpkg, PackageReader):
+            path = self.bytecode_path(bucket.key)
+            if self.tpkg.exists(path):
+                bucket.bytecode_from_string(self.tpkg.read_bytes(path))
+        if bucket.code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    # --------------------------------------------------------------------------
+    def dump_bytecode(self, bucket: Bucket) -> None:
+        """Write bytecode into the package. Compiled packages are read-only."""
+
+        if isinstance(self.tpkg, PackageWriter):
+            self.tpkg.write_bytes(bucket.bytecode_to_string(), self.bytecode_path(bucket.key))
+
+    # --------------------------------------------------------------------------
+    def compile(self, env: jinja2.Environment, name: str, source: str) -> None:
+        """
+        Compile a template and store the bytecode in the package.
+
+        :param env:     The Jinja environment to compile with. This must be
+                        configured the same as the rendering environment.
+        :param name:    The template name, relative to the package root, as
+                        used when loading it at render time.
+        :param source:  The template source.
+        """
+
+        bucket = self.get_bucket(env, name, None, source)
+        bucket.code = env.compile(source, name, None)
+        self.set_bucket(bucket)
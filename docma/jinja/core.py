@@ -4,22 +4,25 @@ from __future__ import annotations
 
 import calendar
 import datetime
-from collections.abc import Iterable
+from collections.abc import Iterable, Mapping
 from dataclasses import dataclass, field
 from functools import singledispatchmethod
 from typing import Any
 
 import jinja2
 
-from docma.lib.misc import deep_update_dict
+from docma.config import JINJA_TEMPLATE_CACHE_SIZE
+from docma.lib.cache import StatsCache, content_key
 from docma.lib.packager import PackageReader
 from docma.lib.plugin import (
+    IndexedPackageResolver,
     MappingResolver,
     PLUGIN_JINJA_FILTER,
     PLUGIN_JINJA_TEST,
-    PackageResolver,
     PluginRouter,
 )
+from docma.lib.scope import ParamScope
+from .bytecode import PackageBytecodeCache
 from .extensions import custom_extensions
 from .resolvers import CurrencyFilterResolver, DateFormatResolver
 
@@ -59,13 +62,32 @@ def _abort(message: str):
     raise Exception(message)
 
 
+# ------------------------------------------------------------------------------
+def _json_default(obj: Any) -> Any:
+    """Convert parameter scopes to dicts for JSON serialisation."""
+
+    if isinstance(obj, ParamScope):
+        return obj.to_dict()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
 # ------------------------------------------------------------------------------
 class DocmaJinjaEnvironment(jinja2.Environment):
-    """Jinja2 environment with some docma add-ons."""
+    """
+    Jinja2 environment with some docma add-ons.
 
-    def __init__(self, *args, **kwargs):
+    Templates created with `from_string()` are cached, keyed on a hash of the
+    template source. This avoids repeatedly compiling the same strings (document
+    bodies, conditions, metadata, queries, path components ...).
+
+    :param template_cache_size: Maximum number of compiled templates cached by
+                        `from_string()`. 0 disables the cache.
+    """
+
+    def __init__(self, *args, template_cache_size: int = JINJA_TEMPLATE_CACHE_SIZE, **kwargs):
         """Prep a Jinja2 environment for use in docma."""
 
+        self.template_cache = StatsCache(template_cache_size)
         super().__init__(
             *args,
             extensions=['jinja2.ext.debug', 'jinja2.ext.loopcontrols', *custom_extensions],
@@ -75,18 +97,45 @@ class DocmaJinjaEnvironment(jinja2.Environment):
             [
                 MappingResolver(self.filters),
                 CurrencyFilterResolver(),
-                PackageResolver('docma.plugins.jinja_filters', PLUGIN_JINJA_FILTER),
+                IndexedPackageResolver('docma.plugins.jinja_filters', PLUGIN_JINJA_FILTER),
             ]
         )
         self.tests = PluginRouter(
             [
                 MappingResolver(self.tests),
-                PackageResolver('docma.plugins.jinja_tests', PLUGIN_JINJA_FILTER),
+                IndexedPackageResolver('docma.plugins.jinja_tests', PLUGIN_JINJA_FILTER),
                 # Format checkers work as both JSONschema formats and Jinja teats.
                 DateFormatResolver(),
-                PackageResolver('docma.plugins.format_checkers', PLUGIN_JINJA_TEST),
+                IndexedPackageResolver('docma.plugins.format_checkers', PLUGIN_JINJA_TEST),
             ]
         )
+        # Rendering parameters are ParamScope mappings rather than dicts so the
+        # tojson filter needs some help with them.
+        self.policies['json.dumps_kwargs'] = {
+            **self.policies['json.dumps_kwargs'],
+            'default': _json_default,
+        }
+
+    # --------------------------------------------------------------------------
+    def from_string(
+        self,
+        source: str | jinja2.nodes.Template,
+        globals: dict[str, Any] | None = None,  # noqa: A002
+        template_class: type[jinja2.Template] | None = None,
+    ) -> jinja2.Template:
+        """
+        Load a template from a source string, using the compiled template cache.
+
+        Only plain string sources without template specific globals or a custom
+        template class are cached.
+        """
+
+        if globals or template_class or not isinstance(source, str):
+            return super().from_string(source, globals=globals, template_class=template_class)
+
+        return self.template_cache.get_or_create(
+            content_key(source), lambda: jinja2.Environment.from_string(self, source)
+        )
 
 
 # ------------------------------------------------------------------------------
@@ -100,17 +149,24 @@ class DocmaRenderContext:
     -   the package reader for the document template;
     -   the rendering parameters; and
     -   the Jinja environment
+
+    Additional parameters passed to `render()` are layered over the context
+    parameters in a `ParamScope` rather than merged into a copy of them.
     """
 
     tpkg: PackageReader
-    params: dict[str, Any] = field(default_factory=dict)
+    params: Mapping[str, Any] = field(default_factory=dict)
     env: DocmaJinjaEnvironment = None
 
     # --------------------------------------------------------------------------
     def __post_init__(self):
         """Create a default JinjaEnvironment if required."""
         if self.env is None:
-            self.env = DocmaJinjaEnvironment(loader=self.tpkg, autoescape=True)
+            self.env = DocmaJinjaEnvironment(
+                loader=self.tpkg,
+                autoescape=True,
+                bytecode_cache=PackageBytecodeCache(self.tpkg),
+            )
 
     # --------------------------------------------------------------------------
     @singledispatchmethod
@@ -128,9 +184,7 @@ class DocmaRenderContext:
         :param kwargs:  Additional keyword parameters for rendering.
         """
 
-        params = (
-            deep_update_dict({}, self.params, *args, kwargs) if any((args, kwargs)) else self.params
-        )
+        params = ParamScope(self.params, *args, kwargs) if any((args, kwargs)) else self.params
         return self.env.from_string(s).render(**params)
 
     @render.register
@@ -143,7 +197,5 @@ class DocmaRenderContext:
         :param kwargs:  Additional keyword parameters for rendering.
         """
 
-        params = (
-            deep_update_dict({}, self.params, *args, kwargs) if any((args, kwargs)) else self.params
-        )
+        params = ParamScope(self.params, *args, kwargs) if any((args, kwargs)) else self.params
         return [self.env.from_string(s).render(**params) for s in v]
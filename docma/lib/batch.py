@@ -0,0 +1,288 @@
+"""
+Batch job scheduling for process (or thread) pools.
+
+`Executor.map()` submits every item up front, one task per item. For a large
+batch, that means a future per item held in the parent and pickling / IPC
+overhead for each item. The scheduler here groups items into chunks and keeps
+a bounded number of chunks in flight, so parent memory doesn't depend on the
+batch size.
+
+A batch manifest records the rows that have been rendered so that an
+interrupted batch can be resumed without starting again. A batch error report
+records the rows that failed.
+"""
+
+from __future__ import annotations
+
+import json
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from datetime import datetime, timezone
+from itertools import islice
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Callable
+
+from docma.config import LOGNAME
+from .cache import content_key
+
+__author__ = 'Murray Andrews'
+
+LOG = getLogger(LOGNAME)
+
+
+# ------------------------------------------------------------------------------
+def run_chunk(fn: Callable, chunk: list[tuple]) -> list[Any]:
+    """
+    Run a function over a chunk of argument tuples in a worker.
+
+    :param fn:      The function.
+    :param chunk:   A list of positional argument tuples.
+    :return:        A list of the results.
+    """
+
+    return [fn(*args) for args in chunk]
+
+
+# ------------------------------------------------------------------------------
+def batch_map(
+    executor: Executor,
+    fn: Callable,
+    *iterables: Iterable,
+    chunksize: int = 1,
+    window: int = 2,
+    ordered: bool = True,
+) -> Iterator[Any]:
+    """
+    Map a function over iterables using an executor, a chunk at a time.
+
+    Like `Executor.map()`, except that the iterables are consumed lazily and
+    only `window` chunks are submitted to the executor at any one time. If a
+    call raises an exception, no more chunks are submitted, pending chunks are
+    cancelled and the exception is raised when its result would be yielded.
+
+    :param executor:    A process or thread pool executor.
+    :param fn:          The function to call. For process pools, this must be
+                        picklable.
+    :param iterables:   Iterables of arguments for `fn`, as for `map()`.
+    :param chunksize:   Number of calls to `fn` in each task submitted to the
+                        executor.
+    :param window:      Maximum number of chunks in flight. This should be at
+                        least the number of workers in the executor to keep
+                        them busy.
+    :param ordered:     If True, results are yielded in the order of the
+                        arguments. Otherwise, they are yielded in the order that
+                        chunks complete, which avoids slow chunks holding up
+                        the submission of new ones.
+    :return:            An iterator of the results.
+    """
+
+    if chunksize < 1:
+        raise ValueError('chunksize must be at least 1')
+    if window < 1:
+        raise ValueError('window must be at least 1')
+
+    args = zip(*iterables)
+    pending: deque[Future] = deque()
+
+    def submit() -> bool:
+        """Submit the next chunk, if there is one."""
+        if not (chunk := list(islice(args, chunksize))):
+            return False
+        pending.append(executor.submit(run_chunk, fn, chunk))
+        return True
+
+    try:
+        while len(pending) < window and submit():
+            pass
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = next(f for f in pending if f in done)
+                pending.remove(future)
+            results = future.result()
+            submit()
+            yield from results
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# ------------------------------------------------------------------------------
+class BatchManifest:
+    """
+    An append-only JSONL record of the rows rendered in a batch.
+
+    Each entry records the row number, the output file, the row status, a hash
+    of the rendering parameters for the row and a hash of the template package.
+    An entry is only written once the output file is complete.
+
+    When resuming a batch, rows are identified by their output file. A row is
+    skipped if the most recent entry for its output file shows it completed with
+    the same parameter and template hashes, and the file still exists.
+
+    :param path:            Path of the manifest file. It is created if it
+                            doesn't exist, otherwise it is appended to.
+    :param template_hash:   A hash of the template package.
+    :param common_params:   Anything, other than the row itself, that affects
+                            the rendered output (e.g. rendering parameters
+                            from the command line, rendering options). This
+                            must be JSON serialisable.
+    :param resume:          If True, load the existing manifest entries to
+                            allow completed rows to be skipped.
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(
+        self,
+        path: Path | str,
+        template_hash: str,
+        common_params: Any = None,
+        resume: bool = False,
+    ):
+        """Open a batch manifest."""
+
+        self.path = Path(path)
+        self.template_hash = template_hash
+        self._common_key = json.dumps(common_params, sort_keys=True, default=str)
+        self._completed = self._load() if resume else {}
+        self._pending: dict[int, dict[str, Any]] = {}  # Keyed on row number
+        self.skipped = 0
+        self._fp = self.path.open('a', encoding='utf-8')
+
+    # --------------------------------------------------------------------------
+    def __enter__(self):
+        """Enter context."""
+        return self
+
+    # --------------------------------------------------------------------------
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Close the manifest."""
+        self.close()
+
+    # --------------------------------------------------------------------------
+    def close(self) -> None:
+        """Close the manifest file."""
+        self._fp.close()
+
+    # --------------------------------------------------------------------------
+    def _load(self) -> dict[str, dict[str, Any]]:
+        """
+        Load the most recent entry for each output file from an existing manifest.
+
+        Malformed lines (e.g. a partial line written when a batch was killed) are
+        skipped.
+        """
+
+        entries = {}
+        if not self.path.exists():
+            return entries
+        with self.path.open(encoding='utf-8') as fp:
+            for line_num, line in enumerate(fp, start=1):
+                try:
+                    entry = json.loads(line)
+                    entries[entry['output']] = entry
+                except (ValueError, TypeError, KeyError):
+                    LOG.warning('%s: Ignoring bad manifest entry at line %d', self.path, line_num)
+        return entries
+
+    # --------------------------------------------------------------------------
+    def params_hash(self, row: dict[str, Any]) -> str:
+        """Get the hash of the rendering parameters for a row."""
+        return content_key(self._common_key, json.dumps(row, sort_keys=True, default=str))
+
+    # --------------------------------------------------------------------------
+    def start(self, row_num: int, row: dict[str, Any], output: str) -> bool:
+        """
+        Note that a row is about to be rendered, unless it's already done.
+
+        :param row_num:     Row number in the batch.
+        :param row:         Rendering parameters for the row.
+        :param output:      Output file name for the row.
+        :return:            True if the row needs to be rendered, False if it
+                            was completed previously and can be skipped.
+        """
+
+        params_hash = self.params_hash(row)
+        done = self._completed.get(output)
+        if (
+            done
+            and done.get('status') == 'ok'
+            and done.get('params_hash') == params_hash
+            and done.get('template_hash') == self.template_hash
+            and Path(output).exists()
+        ):
+            LOG.debug('Skipping row %d: %s already rendered', row_num, output)
+            self.skipped += 1
+            return False
+        self._pending[row_num] = {'row': row_num, 'output': output, 'params_hash': params_hash}
+        return True
+
+    # --------------------------------------------------------------------------
+    def record(self, row_num: int, status: str = 'ok', **kwargs: Any) -> None:
+        """
+        Record the outcome for a row previously passed to `start()`.
+
+        Rows are identified by row number rather than output file as more than
+        one row can render to the same file (the last one wins).
+
+        :param row_num:     Row number in the batch.
+        :param status:      Row status.
+        :param kwargs:      Additional items for the manifest entry.
+        """
+
+        entry = {
+            **self._pending.pop(row_num),
+            'status': status,
+            'template_hash': self.template_hash,
+            'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            **kwargs,
+        }
+        self._fp.write(json.dumps(entry, default=str) + '\n')
+        self._fp.flush()
+
+
+# ------------------------------------------------------------------------------
+class BatchErrorReport:
+    """
+    A JSONL report of the rows that failed in a batch.
+
+    :param path:    Path of the report file. Any existing file is replaced.
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(self, path: Path | str):
+        """Create a batch error report."""
+
+        self.path = Path(path)
+        self._fp = self.path.open('w', encoding='utf-8')
+
+    # --------------------------------------------------------------------------
+    def __enter__(self):
+        """Enter context."""
+        return self
+
+    # --------------------------------------------------------------------------
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Close the report."""
+        self.close()
+
+    # --------------------------------------------------------------------------
+    def close(self) -> None:
+        """Close the report file."""
+        self._fp.close()
+
+    # --------------------------------------------------------------------------
+    def record(self, **kwargs: Any) -> None:
+        """
+        Add an entry for a failed row.
+
+        :param kwargs:      Items for the report entry.
+        """
+
+        entry = {**kwargs, 'time': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+        self._fp.write(json.dumps(entry, default=str) + '\n')
+        self._fp.flush()
@@ -0,0 +1,540 @@
+"""Caching utilities."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from collections.abc import Iterator
+from contextlib import suppress
+from hashlib import md5, sha256
+from pathlib import Path
+from threading import RLock
+from typing import Any, Callable
+from urllib.parse import urlparse
+
+from cachetools import LRUCache
+
+__author__ = 'Murray Andrews'
+
+
+# ------------------------------------------------------------------------------
+def content_key(*parts: str | bytes) -> str:
+    """
+    Generate a cache key from content.
+
+    :param parts:   Strings or bytes that, together, identify the cached item.
+    :return:        A hex digest of the content.
+    """
+
+    h = sha256()
+    for part in parts:
+        h.update(part.encode('utf-8') if isinstance(part, str) else part)
+        # Separator so that ('ab', 'c') and ('a', 'bc') produce different keys.
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+# ------------------------------------------------------------------------------
+class StatsCache:
+    """
+    A bounded, thread safe LRU cache that keeps hit and miss counters.
+
+    :param maxsize:     Maximum number of items in the cache. If 0, nothing is
+                        cached but the counters are still maintained.
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(self, maxsize: int):
+        """Create a cache."""
+        self.maxsize = max(maxsize, 0)
+        self._cache = LRUCache(maxsize=self.maxsize) if self.maxsize else {}
+        self._lock = RLock()
+        self.hits = 0
+        self.misses = 0
+
+    # --------------------------------------------------------------------------
+    def __len__(self) -> int:
+        """Get the number of items in the cache."""
+        return len(self._cache)
+
+    # --------------------------------------------------------------------------
+    def __contains__(self, key: str) -> bool:
+        """Check if a key is in the cache. Does not affect the counters."""
+        return key in self._cache
+
+    # --------------------------------------------------------------------------
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get an item from the cache, updating the hit / miss counters."""
+
+        with self._lock:
+            try:
+                value = self._cache[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    # --------------------------------------------------------------------------
+    def peek(self, key: str, default: Any = None) -> Any:
+        """Get an item from the cache without updating the hit / miss counters."""
+
+        with self._lock:
+            return self._cache.get(key, default)
+
+    # --------------------------------------------------------------------------
+    def put(self, key: str, value: Any) -> None:
+        """Add an item to the cache."""
+
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._cache[key] = value
+
+    # --------------------------------------------------------------------------
+    def get_or_create(self, key: str, factory: Callable[[], Any]) -> Any:
+        """
+        Get an item from the cache, creating (and caching) it if required.
+
+        :param key:     The cache key.
+        :param factory: A callable to create the value on a cache miss.
+        :return:        The cached (or newly created) value.
+        """
+
+        _missing = object()
+        if (value := self.get(key, _missing)) is not _missing:
+            return value
+        # Don't hold the lock while creating the value. Worst case, concurrent
+        # misses on the same key create it more than once.
+        value = factory()
+        self.put(key, value)
+        return value
+
+    # --------------------------------------------------------------------------
+    def clear(self) -> None:
+        """Empty the cache and reset the counters."""
+
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
+
+    # --------------------------------------------------------------------------
+    @property
+    def stats(self) -> dict[str, int]:
+        """Get cache statistics."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._cache),
+            'maxsize': self.maxsize,
+        }
+
+
+# ------------------------------------------------------------------------------
+class DiskCache:
+    """
+    A size bounded cache of bytes values stored as files in a directory.
+
+    The cache directory can be shared between processes (e.g. the worker
+    processes for batch rendering). Entries are written atomically so readers
+    never see a partial entry. When the total size of the cache exceeds
+    `max_size`, the least recently used entries are removed. Each process keeps
+    a running estimate of the cache size so eviction is approximate when
+    several processes are writing to the cache.
+
+    :param path:        Cache directory. It is created if required.
+    :param max_size:    Maximum total size of the cache in bytes.
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(self, path: Path | str, max_size: int):
+        """Create a disk cache."""
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self._lock = RLock()
+        self._size = self._scan_size()
+        self.hits = 0
+        self.misses = 0
+
+    # --------------------------------------------------------------------------
+    def _entry_path(self, key: str) -> Path:
+        """Get the file path for a cache key."""
+        return self.path / key[:2] / key
+
+    # --------------------------------------------------------------------------
+    def _entries(self) -> list[os.DirEntry]:
+        """Get all the entries in the cache."""
+        entries = []
+        for subdir in os.scandir(self.path):
+            if subdir.is_dir():
+                entries.extend(e for e in os.scandir(subdir) if e.is_file() and e.name[0] != '.')
+        return entries
+
+    # --------------------------------------------------------------------------
+    def _scan_size(self) -> int:
+        """Get the total size of entries in the cache."""
+        return sum(e.stat().st_size for e in self._entries())
+
+    # --------------------------------------------------------------------------
+    def get(self, key: str) -> bytes | None:
+        """Get an item from the cache, updating the hit / miss counters."""
+
+        entry = self._entry_path(key)
+        try:
+            value = entry.read_bytes()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with suppress(OSError):
+            # Update the mtime so eviction is least recently used.
+            os.utime(entry)
+        with self._lock:
+            self.hits += 1
+        return value
+
+    # --------------------------------------------------------------------------
+    def put(self, key: str, value: bytes) -> None:
+        """Add an item to the cache, evicting old items if required."""
+
+        if len(value) > self.max_size:
+            return
+        entry = self._entry_path(key)
+        entry.parent.mkdir(exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=entry.parent, prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(value)
+            os.replace(tmp, entry)
+        except BaseException:
+            with suppress(OSError):
+                os.unlink(tmp)
+            raise
+        with self._lock:
+            self._size += len(value)
+            if self._size > self.max_size:
+                self._evict()
+
+    # --------------------------------------------------------------------------
+    def _evict(self) -> None:
+        """Remove least recently used entries until the cache is below 90% of max size."""
+
+        entries = []
+        for e in self._entries():
+            with suppress(OSError):
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_size * 0.9
+        for _, size, path in sorted(entries):
+            if self._size <= target:
+                break
+            with suppress(OSError):
+                os.unlink(path)
+                self._size -= size
+
+    # --------------------------------------------------------------------------
+    def clear(self) -> None:
+        """Empty the cache and reset the counters."""
+
+        with self._lock:
+            for e in self._entries():
+                with suppress(OSError):
+                    os.unlink(e.path)
+            self._size = 0
+            self.hits = self.misses = 0
+
+    # --------------------------------------------------------------------------
+    @property
+    def stats(self) -> dict[str, int]:
+        """Get cache statistics."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': self._size,
+            'maxsize': self.max_size,
+        }
+
+
+# ------------------------------------------------------------------------------
+class TieredCache:
+    """
+    A two tier cache with an in-memory LRU tier and an optional disk tier.
+
+    Values found in the disk tier are promoted into the memory tier.
+
+    :param maxsize:     Maximum number of items in the memory tier.
+    :param disk:        An optional disk cache for the second tier. Values must
+                        be bytes if this is used.
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(self, maxsize: int, disk: DiskCache | None = None):
+        """Create a tiered cache."""
+        self.memory = StatsCache(maxsize)
+        self.disk = disk
+
+    # --------------------------------------------------------------------------
+    def get_or_create(self, key: str, factory: Callable[[], bytes]) -> bytes:
+        """
+        Get an item from the cache, creating (and caching) it if required.
+
+        :param key:     The cache key.
+        :param factory: A callable to create the value on a cache miss.
+        :return:        The cached (or newly created) value.
+        """
+
+        if (value := self.get(key)) is not None:
+            return value
+        value = factory()
+        self.put(key, value)
+        return value
+
+    # --------------------------------------------------------------------------
+    def get(self, key: str) -> bytes | None:
+        """Get an item from the cache or None if it's not there."""
+
+        if (value := self.memory.get(key)) is not None:
+            return value
+        if self.disk and (value := self.disk.get(key)) is not None:
+            self.memory.put(key, value)
+            return value
+        return None
+
+    # --------------------------------------------------------------------------
+    def put(self, key: str, value: bytes) -> None:
+        """Add an item to the cache."""
+
+        self.memory.put(key, value)
+        if self.disk:
+            self.disk.put(key, value)
+
+    # --------------------------------------------------------------------------
+    def clear(self) -> None:
+        """Empty the cache and reset the counters."""
+        self.memory.clear()
+        if self.disk:
+            self.disk.clear()
+
+    # --------------------------------------------------------------------------
+    @property
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Get cache statistics for each tier."""
+        stats = {'memory': self.memory.stats}
+        if self.disk:
+            stats['disk'] = self.disk.stats
+        return stats
+
+
+# ------------------------------------------------------------------------------
+class WeasyImageCache(dict):
+    """
+    An image cache for WeasyPrint that can be shared across renders.
+
+    WeasyPrint's `cache` option is a mapping that holds decoded images keyed by
+    URL, as well as image data keyed by an image ID (an MD5 hash of the URL)
+    and a "slot" name. By default, a new one is used for each render.
+
+    This cache keeps images with the specified URL schemes, and their image data,
+    across renders, up to `maxsize` images. These should be schemes for which
+    the content doesn't vary between renders (e.g. files in the template
+    package). Everything else is discarded by `end_render()`.
+
+    Images that are kept across renders are keyed by URL and, if available, a
+    digest of the URL content. An image is then only reused if it was decoded
+    from the same content that would be fetched for the URL now.
+
+    This is a dict subclass because WeasyPrint treats anything else as the path
+    of a disk cache. The dict itself is not used for storage.
+
+    :param maxsize:     Maximum number of images kept across renders.
+    :param schemes:     URL schemes for images that are kept across renders.
+    :param digest:      A callable that returns a digest of the current content
+                        for a URL, or None if it is not known.
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(
+        self,
+        maxsize: int,
+        schemes: tuple[str, ...],
+        digest: Callable[[str], str | None] = None,
+    ):
+        """Create an image cache."""
+        super().__init__()
+        self.maxsize = max(maxsize, 0)
+        self.schemes = schemes
+        self.digest = digest or (lambda url: None)
+        self._images = LRUCache(maxsize=self.maxsize) if self.maxsize else {}
+        self._data = {}
+        self._shared_ids = {}  # Image ID --> key for images kept across renders
+        self._render_ids = set()  # Image IDs for images only kept for one render
+        self.hits = 0
+        self.misses = 0
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def _image_id(url: str) -> str:
+        """Get the WeasyPrint image ID for a URL."""
+        return md5(url.encode(), usedforsecurity=False).hexdigest()
+
+    # --------------------------------------------------------------------------
+    def _shared(self, key: str) -> bool:
+        """Check if a key is for an image that is kept across renders."""
+        return bool(self.maxsize) and urlparse(key).scheme.lower() in self.schemes
+
+    # --------------------------------------------------------------------------
+    def _image_key(self, url: str) -> tuple[str, str | None]:
+        """Get the key for an image that is kept across renders."""
+        return url, self.digest(url)
+
+    # --------------------------------------------------------------------------
+    def __contains__(self, key: object) -> bool:
+        """Check if a key is in the cache, updating the hit / miss counters."""
+        if not (isinstance(key, str) and self._shared(key)):
+            return key in self._data
+        if self._image_key(key) in self._images:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    # --------------------------------------------------------------------------
+    def __getitem__(self, key: str) -> Any:
+        """Get an item from the cache."""
+        return self._images[self._image_key(key)] if self._shared(key) else self._data[key]
+
+    # --------------------------------------------------------------------------
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get an item from the cache."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    # --------------------------------------------------------------------------
+    def __setitem__(self, key: str, value: Any) -> None:
+        """Add an item to the cache."""
+        if self._shared(key):
+            image_key = self._image_key(key)
+            self._images[image_key] = value
+            self._shared_ids[self._image_id(key)] = image_key
+            return
+        if urlparse(key).scheme:
+            self._render_ids.add(self._image_id(key))
+        self._data[key] = value
+
+    # --------------------------------------------------------------------------
+    def __delitem__(self, key: str) -> None:
+        """Remove an item from the cache."""
+        if self._shared(key):
+            del self._images[self._image_key(key)]
+        else:
+            del self._data[key]
+
+    # --------------------------------------------------------------------------
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the keys in the cache."""
+        yield from (url for url, _ in list(self._images))
+        yield from list(self._data)
+
+    # --------------------------------------------------------------------------
+    def __len__(self) -> int:
+        """Get the number of items in the cache."""
+        return len(self._images) + len(self._data)
+
+    # --------------------------------------------------------------------------
+    def end_render(self) -> None:
+        """
+        Discard everything that is not kept across renders.
+
+        This includes the image data for images that have been evicted. Image
+        data that can't be attributed to an image is kept, to be safe.
+        """
+
+        live_ids = {i for i, key in self._shared_ids.items() if key in self._images}
+        dead_ids = self._render_ids | (self._shared_ids.keys() - live_ids)
+        self._data = {
+            k: v
+            for k, v in self._data.items()
+            if not urlparse(k).scheme and k.split('-', 1)[0] not in dead_ids
+        }
+        self._shared_ids = {i: key for i, key in self._shared_ids.items() if i in live_ids}
+        self._render_ids = set()
+
+    # --------------------------------------------------------------------------
+    @property
+    def stats(self) -> dict[str, int]:
+        """Get cache statistics for images kept across renders."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._images),
+            'maxsize': self.maxsize,
+        }
+
+
+# ------------------------------------------------------------------------------
+class WeasyResourceCache:
+    """
+    Resources shared by the WeasyPrint renders in a session.
+
+    This holds fetched URL content and decoded images for URLs with schemes for
+    which the content doesn't vary between renders. Content for other URLs (e.g.
+    `docma:` URLs for charts, which depend on the rendering parameters) is only
+    kept for a single render.
+
+    Fetched content is necessarily keyed by URL alone, as the content isn't
+    known until it is fetched. Decoded images are keyed by URL and a digest of
+    the cached content for the URL, so an image is never reused for different
+    content fetched from the same URL (e.g. after the content was evicted and
+    fetched again).
+
+    :param maxsize:     Maximum number of URL payloads, and separately, images
+                        kept across renders.
+    :param schemes:     URL schemes for content that is kept across renders.
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(self, maxsize: int, schemes: tuple[str, ...]):
+        """Create a resource cache."""
+        self.schemes = schemes
+        self.payloads = StatsCache(maxsize)  # URL --> (content digest, fetch result)
+        self.images = WeasyImageCache(maxsize, schemes, digest=self.digest)
+
+    # --------------------------------------------------------------------------
+    def digest(self, url: str) -> str | None:
+        """Get a digest of the cached content for a URL, if there is any."""
+        return entry[0] if (entry := self.payloads.peek(url)) else None
+
+    # --------------------------------------------------------------------------
+    def url_fetcher(self, fetcher: Callable[..., dict]) -> Callable[..., dict]:
+        """
+        Wrap a URL fetcher so that fetched content is cached.
+
+        Only results containing the content as a `string` are cached. Results
+        containing a file object can only be read once.
+
+        :param fetcher:     The URL fetcher to wrap.
+        :return:            A caching URL fetcher.
+        """
+
+        def cached_fetcher(url: str, *args, **kwargs) -> dict[str, Any]:
+            """Fetch URL content, using the cache if possible."""
+            if urlparse(url).scheme.lower() not in self.schemes:
+                return fetcher(url, *args, **kwargs)
+            if (entry := self.payloads.get(url)) is not None:
+                return entry[1]
+            result = fetcher(url, *args, **kwargs)
+            if 'string' in result:
+                self.payloads.put(url, (content_key(result['string']), result))
+            return result
+
+        return cached_fetcher
+
+    # --------------------------------------------------------------------------
+    @property
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Get cache statistics."""
+        return {'payloads': self.payloads.stats, 'images': self.images.stats}
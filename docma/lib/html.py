@@ -2,9 +2,26 @@
 
 from __future__ import annotations
 
+import re
 from copy import deepcopy
+from html import unescape
+from typing import TYPE_CHECKING
+from urllib.parse import quote, urlparse
 
-from bs4 import BeautifulSoup
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+# Finds URLs for resources that a HTML renderer will fetch. This is a scan, not
+# a parse, so it can find things that aren't really resource references. It
+# doesn't need to be perfect.
+RESOURCE_URL_RE = re.compile(
+    r"""
+    \bsrc\s*=\s*(?P<q1>["'])(?P<src>.*?)(?P=q1)  # src="..." attribute
+    | <link\b[^>]*?\bhref\s*=\s*(?P<q2>["'])(?P<href>.*?)(?P=q2)  # <link href="...">
+    | \burl\(\s*(?P<q3>["']?)(?P<url>[^"')]*?)(?P=q3)\s*\)  # CSS url(...)
+    """,
+    re.VERBOSE | re.IGNORECASE | re.DOTALL,
+)
 
 
 # ------------------------------------------------------------------------------
@@ -41,3 +58,34 @@ def html_append(html1: BeautifulSoup, html2: BeautifulSoup) -> None:
         for item in html2.html.children:
             if item.name != 'head':
                 html1.append(deepcopy(item))
+
+
+# ------------------------------------------------------------------------------
+def normalise_url(url: str) -> str:
+    """
+    Normalise a URL the way WeasyPrint does before fetching it.
+
+    Characters that are not allowed in URIs are %-encoded. This is idempotent.
+    """
+
+    return quote(url, safe="/:?#[]@!$&'()*+,;=~%")
+
+
+# ------------------------------------------------------------------------------
+def resource_urls(html: str, schemes: tuple[str, ...] = None) -> list[str]:
+    """
+    Find the URLs of resources (images, stylesheets etc.) referenced in HTML.
+
+    :param html:    The HTML source.
+    :param schemes: Only URLs with these schemes are included. If None, all
+                    URLs are included, including relative URLs.
+    :return:        A list of unique, normalised URLs in order of first appearance.
+    """
+
+    urls = {}
+    for m in RESOURCE_URL_RE.finditer(html):
+        url = m['url'] if m['url'] is not None else unescape(m['src'] or m['href'] or '')
+        url = url.strip()
+        if schemes is None or urlparse(url).scheme.lower() in schemes:
+            urls[normalise_url(url)] = True
+    return list(urls)
@@ -2,10 +2,13 @@
 
 from __future__ import annotations
 
-import requests
 from cachetools import LRUCache, cached
 from cachetools.keys import hashkey
 
+from .lazy import lazy_import
+
+requests = lazy_import('requests')
+
 HTTP_CACHE_SIZE = 128
 HTTP_TIMEOUT = 20  # seconds
 
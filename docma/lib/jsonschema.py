@@ -10,9 +10,9 @@ from jsonschema.exceptions import FormatError
 
 from docma.jinja.resolvers import DateFormatResolver
 from .plugin import (
+    IndexedPackageResolver,
     PLUGIN_JINJA_TEST,
     PLUGIN_JSONSCHEMA_FORMAT,
-    PackageResolver,
     Plugin,
     PluginResolver,
     PluginRouter,
@@ -120,6 +120,6 @@ FORMAT_CHECKER = PluginFormatChecker(
     resolvers=[
         JsonSchemaBuiltinsResolver(),
         DateFormatResolver(),
-        PackageResolver('docma.plugins.format_checkers', PLUGIN_JSONSCHEMA_FORMAT),
+        IndexedPackageResolver('docma.plugins.format_checkers', PLUGIN_JSONSCHEMA_FORMAT),
     ]
 )
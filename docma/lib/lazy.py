@@ -0,0 +1,121 @@
+"""
+Lazy module imports.
+
+Some of the packages docma depends on are very slow to import (altair,
+jsonschema, weasyprint, boto3 ...) and many docma operations don't need them
+at all. Instead of:
+
+```python
+import weasyprint
+```
+
+modules can do this:
+
+```python
+weasyprint = lazy_import('weasyprint')
+```
+
+The real import happens the first time an attribute of the module is accessed.
+If that fails, the same error is raised on every later access. Use a
+`TYPE_CHECKING` import for names that are only needed in type annotations.
+"""
+
+from __future__ import annotations
+
+import importlib
+import pkgutil
+import sys
+from functools import cache
+from types import ModuleType
+from typing import Any
+
+__author__ = 'Murray Andrews'
+
+
+# ------------------------------------------------------------------------------
+class LazyModule(ModuleType):
+    """
+    Stand-in for a module that imports the real module on first attribute access.
+
+    :param name:    The fully qualified name of the module. This can be a
+                    submodule (e.g. `weasyprint.text.fonts`).
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(self, name: str):
+        """Create a lazy module."""
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_error'] = None
+
+    # --------------------------------------------------------------------------
+    def _lazy_load(self) -> ModuleType:
+        """
+        Import the real module if not already done.
+
+        If the import fails, the original error (e.g. an `OSError` for a missing
+        shared library) is kept and raised again on later attempts. Retrying a
+        failed import can produce unrelated, confusing errors.
+        """
+
+        if (module := self.__dict__['_lazy_module']) is not None:
+            return module
+        if (error := self.__dict__['_lazy_error']) is not None:
+            raise error
+        try:
+            module = self.__dict__['_lazy_module'] = importlib.import_module(self.__name__)
+        except Exception as e:
+            self.__dict__['_lazy_error'] = e
+            raise
+        return module
+
+    # --------------------------------------------------------------------------
+    def __getattr__(self, attr: str) -> Any:
+        """Get an attribute from the real module, importing it if required."""
+        return getattr(self._lazy_load(), attr)
+
+    # --------------------------------------------------------------------------
+    def __setattr__(self, attr: str, value: Any) -> None:
+        """Set an attribute on the real module (e.g. when monkeypatching)."""
+        setattr(self._lazy_load(), attr, value)
+
+    # --------------------------------------------------------------------------
+    def __dir__(self) -> list[str]:
+        """List the attributes of the real module."""
+        return dir(self._lazy_load())
+
+
+# ------------------------------------------------------------------------------
+def lazy_import(name: str) -> ModuleType:
+    """
+    Get a module that will be imported when first used.
+
+    If the module has already been imported, it is returned directly.
+
+    :param name:    The fully qualified name of the module.
+    :return:        The module or a lazy stand-in for it.
+    """
+
+    try:
+        return sys.modules[name]
+    except KeyError:
+        return LazyModule(name)
+
+
+# ------------------------------------------------------------------------------
+@cache
+def import_submodules(package: str) -> None:
+    """
+    Import all the modules in a package, once.
+
+    This is used by packages that contain self-registering handlers (data
+    providers, URL fetchers etc.) to defer importing the handlers until the
+    first time one is needed. Modules with names starting with `_` are skipped.
+
+    :param package:     The fully qualified name of the package.
+    """
+
+    pkg = importlib.import_module(package)
+    for _, module_name, _ in pkgutil.iter_modules(pkg.__path__):
+        if not module_name.startswith('_'):
+            importlib.import_module(f'.{module_name}', package=package)
@@ -10,14 +10,25 @@ from datetime import datetime, timezone
 from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Callable
+from typing import TYPE_CHECKING, Any, Callable
 
 import colorama
-import weasyprint
-from PIL import ImageFont
 from dotenv import dotenv_values
-from pypdf import PdfReader
-from weasyprint.text.fonts import FontConfiguration
+
+from docma.config import TRANSIENT_ERRORS
+
+from .lazy import lazy_import
+
+if TYPE_CHECKING:
+    from pypdf import PdfReader
+    from weasyprint.document import Document
+    from weasyprint.text.fonts import FontConfiguration
+
+    from .cache import WeasyImageCache
+
+ImageFont = lazy_import('PIL.ImageFont')
+pypdf = lazy_import('pypdf')
+weasyprint = lazy_import('weasyprint')
 
 colorama.init()
 
@@ -137,9 +148,59 @@ def datetime_pdf_format(dt: datetime = None) -> str:
     return f"{dt.strftime('D:%Y%m%d%H%M%S')}{tz_hh}'{tz_mm}'"
 
 
+# ------------------------------------------------------------------------------
+def html_to_document(
+    html_src: str,
+    url_fetcher: Callable = None,
+    font_config: FontConfiguration = None,
+    image_cache: WeasyImageCache = None,
+) -> Document:
+    """
+    Lay out HTML source with WeasyPrint without generating a PDF.
+
+    If an image cache is used, `image_cache.end_render()` must not be called
+    until after the PDF has been written, as WeasyPrint reads image data from
+    the cache at that point.
+
+    :param html_src:    HTML source to lay out (actual HTML -- not a file name).
+    :param url_fetcher: Custom URL fetcher for WeasyPrint.
+    :param font_config: WeasyPrint font configuration for @font-face rules.
+    :param image_cache: WeasyPrint image cache shared with other renders.
+
+    :return:            A WeasyPrint document.
+    """
+
+    options = {} if image_cache is None else {'cache': image_cache}
+    return weasyprint.HTML(string=html_src, url_fetcher=url_fetcher).render(
+        font_config=font_config, **options
+    )
+
+
+# ------------------------------------------------------------------------------
+def documents_to_pdf(documents: list[Document]) -> PdfReader:
+    """
+    Write the pages of one or more WeasyPrint documents as a single PDF.
+
+    This is much cheaper than writing each document as a separate PDF and then
+    combining them with pypdf. Fonts are only embedded (and subset) once.
+
+    :param documents:   WeasyPrint documents. The metadata comes from the first.
+
+    :return:            PyPDF PDF reader.
+    """
+
+    buf = BytesIO()
+    documents[0].copy([page for doc in documents for page in doc.pages]).write_pdf(buf)
+    buf.seek(0)
+    return pypdf.PdfReader(buf)
+
+
 # ------------------------------------------------------------------------------
 def html_to_pdf(
-    html_src: str, url_fetcher: Callable = None, font_config: FontConfiguration = None
+    html_src: str,
+    url_fetcher: Callable = None,
+    font_config: FontConfiguration = None,
+    image_cache: WeasyImageCache = None,
 ) -> PdfReader:
     """
     Convert HTML source to PDF.
@@ -154,15 +215,18 @@ def html_to_pdf(
     :param html_src:    HTML source to convert (actual HTML -- not a file name).
     :param url_fetcher: Custom URL fetcher for WeasyPrint.
     :param font_config: WeasyPrint font configuration for @font-face rules.
+    :param image_cache: WeasyPrint image cache shared with other renders.
 
     :return:            PyPDF PDF reader.
     """
 
-    buf = BytesIO()
-    parsed_html = weasyprint.HTML(string=html_src, url_fetcher=url_fetcher)
-    parsed_html.write_pdf(buf, font_config=font_config)
-    buf.seek(0)
-    return PdfReader(buf)
+    try:
+        return documents_to_pdf(
+            [html_to_document(html_src, url_fetcher, font_config, image_cache=image_cache)]
+        )
+    finally:
+        if image_cache is not None:
+            image_cache.end_render()
 
 
 # ------------------------------------------------------------------------------
@@ -208,6 +272,31 @@ def str2bool(s: str | bool) -> bool:
     raise ValueError(f'Cannot convert string to bool: {s}')
 
 
+# ------------------------------------------------------------------------------
+def is_transient_error(e: BaseException) -> bool:
+    """
+    Check if an error was caused by a transient (connection or timeout) failure.
+
+    Docma often wraps errors in its own exceptions so the whole exception chain
+    is checked (see `TRANSIENT_ERRORS`).
+
+    :param e:       An exception.
+    :return:        True if the exception, or any exception in its chain, is
+                    transient.
+    """
+
+    seen = set()
+    pending = [e]
+    while pending:
+        if (e := pending.pop()) is None or id(e) in seen:
+            continue
+        seen.add(id(e))
+        if any(cls.__name__ in TRANSIENT_ERRORS for cls in type(e).__mro__):
+            return True
+        pending.extend((e.__cause__, e.__context__))
+    return False
+
+
 # ------------------------------------------------------------------------------
 def css_id(s: str) -> str:
     """Convert a string to a valid CSS identifier (e.g. for clases or IDs)."""
@@ -2,16 +2,21 @@
 
 from __future__ import annotations
 
+import io
+import os
 import zipfile
 from abc import ABC, abstractmethod
 from collections.abc import Iterator
 from pathlib import Path
 from shutil import copy2
+from typing import TextIO
+from weakref import WeakSet
 from zipfile import ZipFile
 
 from jinja2 import BaseLoader, TemplateNotFound
 
 from docma.exceptions import DocmaPackageError
+from .cache import content_key
 from .path import relative_path, walkpath
 
 __author__ = 'Murray Andrews'
@@ -39,12 +44,19 @@ class PackageWriter(ABC):
         pass
 
     @staticmethod
-    def new(path: Path | str) -> PackageWriter:
-        """Create a new package writer."""
+    def new(path: Path | str, append: bool = False) -> PackageWriter:
+        """
+        Create a new package writer.
+
+        :param path:        Package location. Packages ending in `.zip` are
+                            zip files, otherwise they are directories.
+        :param append:      If True, add to an existing package instead of
+                            creating a new one.
+        """
         if isinstance(path, str):
             path = Path(path)
         if path.suffix.lower() == '.zip':
-            return ZipPackageWriter(path)
+            return ZipPackageWriter(path, append=append)
         return DirPackageWriter(path)
 
     @abstractmethod
@@ -131,10 +143,11 @@ class DirPackageWriter(PackageWriter):
 class ZipPackageWriter(PackageWriter):
     """Package files into zip file."""
 
-    def __init__(self, path: Path) -> None:
+    def __init__(self, path: Path, append: bool = False) -> None:
         """Create a zip packager."""
         super().__init__(path)
-        self._zip = ZipFile(self.path, 'w', allowZip64=True)
+        self.append = append
+        self._zip = ZipFile(self.path, 'a' if append else 'w', allowZip64=True)
 
     def write_string(self, content: str, file: Path | str) -> Path:
         """Create a new file in the ZIP file with the specified content."""
@@ -169,7 +182,7 @@ class ZipPackageWriter(PackageWriter):
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Close the zip file."""
         self.close()
-        if exc_type:
+        if exc_type and not self.append:
             self.path.unlink(missing_ok=True)
 
 
@@ -198,6 +211,10 @@ class PackageReader(ABC, BaseLoader):
         """Close the package."""
         pass
 
+    def close(self):  # noqa: B027
+        """Close the package."""
+        pass
+
     @staticmethod
     def new(path: Path | str) -> PackageReader:
         """Create a new package reader."""
@@ -230,6 +247,38 @@ class PackageReader(ABC, BaseLoader):
         """
         raise NotImplementedError('read_bytes')
 
+    def open_text(self, file: Path | str) -> TextIO:
+        """
+        Open a text file in the package for reading.
+
+        Unlike `read_text()`, this may avoid reading the whole file into memory.
+        The caller is responsible for closing the returned file object.
+
+        :param file:    The path of the file to be read, relative to the package root.
+        :return:        A text file object.
+        """
+        return io.StringIO(self.read_text(file))
+
+    @abstractmethod
+    def fingerprint(self, file: Path | str) -> str:
+        """
+        Get a value that changes whenever the content of a file in the package changes.
+
+        This is cheap to obtain as it does not read the file.
+
+        :param file:    The path of the file, relative to the package root.
+        :return:        The file fingerprint.
+        """
+        raise NotImplementedError('fingerprint')
+
+    def digest(self) -> str:
+        """
+        Get a value that changes whenever the content of any file in the package changes.
+
+        This is derived from the file fingerprints, so it does not read the files.
+        """
+        return content_key(*(f'{p}:{self.fingerprint(p)}' for p in sorted(self.namelist())))
+
     @abstractmethod
     def namelist(self, base: Path | str = None) -> Iterator[Path]:
         """Get an iterator over file names under the specified base directory."""
@@ -275,6 +324,16 @@ class DirPackageReader(PackageReader):
         src_path = self.path / relative_path(self.path, file)
         return src_path.read_bytes()
 
+    def open_text(self, file: Path | str) -> TextIO:
+        """Open a text file in the package for reading."""
+        src_path = self.path / relative_path(self.path, file)
+        return src_path.open()
+
+    def fingerprint(self, file: Path | str) -> str:
+        """Get a fingerprint for a file from its size and modification time."""
+        st = (self.path / relative_path(self.path, file)).stat()
+        return f'{st.st_size}:{st.st_mtime_ns}:{st.st_ino}'
+
     def namelist(self, base: Path | str = None) -> Iterator[Path]:
         """Get an iterator over file names under the specified base directory."""
         root = self.path / relative_path(self.path, base) if base else self.path
@@ -296,10 +355,26 @@ class DirPackageReader(PackageReader):
 class ZipPackageReader(PackageReader):
     """Create a ZIP package reader."""
 
+    # Open readers. A forked child process shares the file offset of each open
+    # file with its parent, so these are reopened in the child.
+    _open_readers: WeakSet[ZipPackageReader] = WeakSet()
+
     def __init__(self, path: Path) -> None:
         """Create a ZIP package reader."""
         super().__init__(path)
         self._zip = ZipFile(self.path, 'r')
+        self._open_readers.add(self)
+
+    def reopen(self) -> None:
+        """Reopen the zip file."""
+        self._zip.close()
+        self._zip = ZipFile(self.path, 'r')
+
+    @classmethod
+    def _reopen_all(cls) -> None:
+        """Reopen all open readers (in a forked child process)."""
+        for reader in list(cls._open_readers):
+            reader.reopen()
 
     def read_text(self, file: Path | str) -> str:
         """Read a text file from the package."""
@@ -310,6 +385,15 @@ class ZipPackageReader(PackageReader):
 
         return self._zip.read(str(file))
 
+    def open_text(self, file: Path | str) -> TextIO:
+        """Open a text file in the package for reading."""
+        return io.TextIOWrapper(self._zip.open(str(file)), encoding='utf-8')
+
+    def fingerprint(self, file: Path | str) -> str:
+        """Get a fingerprint for a file from its size and CRC."""
+        info = self._zip.getinfo(str(file))
+        return f'{info.file_size}:{info.CRC:08x}'
+
     def namelist(self, base: Path | str = None) -> Iterator[Path]:
         """Get an iterator over file names under the specified base directory."""
         base_path = zipfile.Path(self._zip, str(base or '').rstrip('/') + '/')
@@ -334,6 +418,7 @@ class ZipPackageReader(PackageReader):
 
     def close(self):
         """Close the zip file."""
+        self._open_readers.discard(self)
         self._zip.close()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -344,3 +429,7 @@ class ZipPackageReader(PackageReader):
 # ..............................................................................
 # endregion PackageReader
 # ..............................................................................
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=ZipPackageReader._reopen_all)  # noqa: SLF001
@@ -16,6 +16,16 @@ all resolvers.
 
 Resolvers don't have to worry about cacheing. PluginRouter does that.
 
+Plugins in a package hierarchy can be resolved in two ways:
+
+*   `PackageResolver` scans the package itself, per resolver instance.
+
+*   `IndexedPackageResolver` uses a process wide `PluginIndex` for the package
+    which is shared by all resolvers. If the package contains a `_plugin_index`
+    module (generated at build time by `etc/plugin-index`), the index just maps
+    names to modules and nothing is imported until a plugin is actually used.
+    Otherwise, the package is scanned once per process on first use.
+
 In the case of JInja filters, this gets used like so ...
 
 ```python
@@ -39,7 +49,8 @@ import importlib
 import inspect
 import pkgutil
 from abc import ABC, abstractmethod
-from collections.abc import Iterable, Mapping, MutableMapping, Sequence
+from collections.abc import Iterable, Iterator, Mapping, MutableMapping, Sequence
+from threading import RLock
 from types import ModuleType
 from typing import Any, Callable
 from warnings import warn
@@ -55,6 +66,10 @@ PLUGIN_JINJA_FILTER = 'jinja-filter'
 PLUGIN_JINJA_TEST = 'jinja-test'
 PLUGIN_JSONSCHEMA_FORMAT = 'jsonschema-format-checker'
 
+# Name of the optional module in a plugin package containing a static map of
+# plugin names to module names. See etc/plugin-index.
+PLUGIN_INDEX_MODULE = '_plugin_index'
+
 
 # ------------------------------------------------------------------------------
 def jfilter(*args, **kwargs) -> PluginType:
@@ -412,14 +427,218 @@ class PackageResolver(PluginResolver):
 
         The module filename (last component) is not included in the prefix.
         """
-        base_parts = self._package.split('.')
-        module_parts = module_name.split('.')
+        return plugin_prefix(self._package, module_name)
+
+
+# ------------------------------------------------------------------------------
+def plugin_prefix(package: str, module_name: str) -> str:
+    """
+    Return the namespace prefix for plugins in a module based on its name.
+
+    For example:
+    - Base package: 'docma.plugins.filters'
+    - Module name: 'docma.plugins.filters.au.tax.tax'
+    - Result: 'au.tax'
+
+    The module filename (last component) is not included in the prefix.
+
+    :param package:     The base plugin package name.
+    :param module_name: The name of a module within the package hierarchy.
+    """
+
+    base_parts = package.split('.')
+    module_parts = module_name.split('.')
+
+    # Everything between the base package and the module name itself forms the prefix
+    if len(module_parts) <= len(base_parts):
+        return ''
+
+    # Get the package path (exclude the base and the module filename)
+    # For 'docma.plugins.filters.au.tax.tax', we want 'au.tax'
+    prefix_parts = module_parts[len(base_parts) : -1]
+    return '.'.join(prefix_parts)
+
+
+# ------------------------------------------------------------------------------
+def module_plugins(package: str, module: ModuleType) -> Iterator[tuple[str, PluginType]]:
+    """
+    Find the plugin callables in a module.
+
+    :param package:     The base plugin package name.
+    :param module:      A module within the package hierarchy.
+    :return:            An iterator of (fully qualified plugin name, plugin) tuples.
+    """
+
+    prefix = plugin_prefix(package, module.__name__)
+    for _, obj in inspect.getmembers(module, callable):
+        for member in getattr(obj, '_plugin_names', None) or ():
+            yield f'{prefix}.{member}' if prefix else member, obj
+
+
+# ------------------------------------------------------------------------------
+def scan_plugin_package(package: str) -> dict[str, str]:
+    """
+    Import everything in a plugin package hierarchy and map plugin names to modules.
+
+    This finds the same plugins as `PackageResolver` (for all plugin types). It
+    is used to generate the static plugin index for a package at build time and
+    as a fallback when there is no static index.
+
+    :param package:     A Python package name (e.g. `jinja.filters`).
+    :return:            A dict mapping fully qualified plugin names to the name
+                        of the module containing them.
+    """
+
+    pkg = importlib.import_module(package)
+    search_path = getattr(pkg, '__path__', None)
+    if search_path is None:
+        return {}
+
+    index = {}
+    for _, modname, _ in pkgutil.walk_packages(search_path, package + '.'):
+        if modname == f'{package}.{PLUGIN_INDEX_MODULE}':
+            continue
+        for fqname, _ in module_plugins(package, importlib.import_module(modname)):
+            index[fqname] = modname
+    return index
+
+
+# ------------------------------------------------------------------------------
+class PluginIndex:
+    """
+    Process wide, lazily populated index of the plugins in a package hierarchy.
+
+    Use `PluginIndex.for_package()` to get the shared index for a package rather
+    than creating instances directly.
+
+    The index starts as a map of plugin names to module names. This comes from
+    the static `_plugin_index` module in the package if there is one, otherwise
+    the package is scanned (once). Plugin modules are imported on demand when a
+    plugin they contain is first resolved.
+
+    A static index may be out of date (e.g. a plugin module was added after the
+    index was generated), so the first time a name is not found in a static
+    index, the package is scanned and the index updated.
+
+    :param package:     A Python package name (e.g. `jinja.filters`).
+    """
+
+    _indexes: dict[str, PluginIndex] = {}
+    _lock = RLock()
+
+    # --------------------------------------------------------------------------
+    def __init__(self, package: str) -> None:
+        """Create a PluginIndex instance."""
+
+        self.package = package
+        self._modules: dict[str, str] | None = None
+        self._scanned = False
+        self._loaded: set[str] = set()
+        self._plugins: dict[str, list[PluginType]] = {}
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def for_package(cls, package: str) -> PluginIndex:
+        """Get the shared index for the specified package."""
+
+        with cls._lock:
+            if package not in cls._indexes:
+                cls._indexes[package] = cls(package)
+            return cls._indexes[package]
+
+    # --------------------------------------------------------------------------
+    @property
+    def modules(self) -> dict[str, str]:
+        """Get the map of plugin names to module names."""
+
+        with self._lock:
+            if self._modules is None:
+                try:
+                    self._modules = dict(
+                        importlib.import_module(f'{self.package}.{PLUGIN_INDEX_MODULE}').PLUGINS
+                    )
+                except ModuleNotFoundError:
+                    self._modules = scan_plugin_package(self.package)
+                    self._scanned = True
+            return self._modules
+
+    # --------------------------------------------------------------------------
+    def _rescan(self, name: str) -> str | None:
+        """
+        Scan the package for a plugin not in the static index (once only).
+
+        :param name:    Fully qualified plugin name (lower case).
+        :return:        The name of the module containing the plugin or None.
+        """
+
+        if self._scanned:
+            return None
+        self._scanned = True
+        modules = scan_plugin_package(self.package)
+        if stale := sorted(set(modules) - set(self.modules)):
+            warn(
+                f'Plugin index for {self.package} is out of date (missing {", ".join(stale)})'
+                ' - rerun etc/plugin-index',
+                stacklevel=2,
+            )
+        self.modules.update(modules)
+        return modules.get(name)
+
+    # --------------------------------------------------------------------------
+    def resolve(self, name: str, plugin_types: set[str]) -> PluginType | None:
+        """
+        Resolve a plugin name into a callable or return None.
+
+        :param name:            Fully qualified plugin name (lower case).
+        :param plugin_types:    Only return a plugin that has one of these types.
+        """
 
-        # Everything between the base package and the module name itself forms the prefix
-        if len(module_parts) <= len(base_parts):
-            return ''
+        with self._lock:
+            if name not in self._plugins:
+                if (modname := self.modules.get(name) or self._rescan(name)) is None:
+                    return None
+                self._load_module(modname)
+            for plugin in self._plugins.get(name, ()):
+                if getattr(plugin, '_plugin_types', set()) & plugin_types:
+                    return plugin
+        return None
 
-        # Get the package path (exclude the base and the module filename)
-        # For 'docma.plugins.filters.au.tax.tax', we want 'au.tax'
-        prefix_parts = module_parts[len(base_parts) : -1]
-        return '.'.join(prefix_parts)
+    # --------------------------------------------------------------------------
+    def _load_module(self, modname: str) -> None:
+        """Import a module and add all its plugins to the index."""
+
+        if modname in self._loaded:
+            return
+        for fqname, plugin in module_plugins(self.package, importlib.import_module(modname)):
+            plugins = self._plugins.setdefault(fqname, [])
+            if not any(p is plugin for p in plugins):
+                plugins.append(plugin)
+        self._loaded.add(modname)
+
+
+# ------------------------------------------------------------------------------
+class IndexedPackageResolver(PluginResolver):
+    """
+    Resolve plugins from a Python package hierarchy using a shared `PluginIndex`.
+
+    This finds the same plugins as `PackageResolver` but construction is
+    essentially free and each plugin is only resolved once per process, no
+    matter how many resolvers there are.
+
+    :param package:     A Python package name (e.g. `jinja.filters`).
+    :param plugin_types: A set of strings indicating the type of plugins to load.
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(self, package: str, plugin_types: str | set[str]) -> None:
+        """Create an IndexedPackageResolver instance."""
+
+        self._index = PluginIndex.for_package(package)
+        self._plugin_types: set[str] = (
+            {plugin_types} if isinstance(plugin_types, str) else plugin_types
+        )
+
+    # --------------------------------------------------------------------------
+    def resolve(self, name: str) -> PluginType | None:
+        """Resolve a plugin name into a callable or return None."""
+        return self._index.resolve(name, self._plugin_types)
@@ -2,20 +2,25 @@
 
 from __future__ import annotations
 
+from collections.abc import Iterator
 from decimal import Decimal
 from enum import Enum
 from functools import cached_property
 from typing import Any, Callable
 
-import jsonschema
 from pydantic import BaseModel, ConfigDict, Field, constr, field_validator
-from referencing.jsonschema import EMPTY_REGISTRY
 
+from docma.config import DATA_STREAM_FETCH_SIZE
 from docma.exceptions import DocmaDataProviderError
 from docma.jinja import DocmaRenderContext
-from docma.lib.jsonschema import FORMAT_CHECKER
+from docma.lib.lazy import lazy_import
 from docma.lib.misc import str2bool
 
+jsonschema = lazy_import('jsonschema')
+referencing_jsonschema = lazy_import('referencing.jsonschema')
+docma_jsonschema = lazy_import('docma.lib.jsonschema')
+
+
 # ------------------------------------------------------------------------------
 NameTypeString = constr(pattern='^[a-zA-Z][a-zA-Z0-9_]*$')
 
@@ -95,7 +100,9 @@ class DocmaQuerySpecification(BaseModel):
         """Row validator for data coming from the database."""
         return (
             jsonschema.validators.validator_for(self.row_schema)(
-                schema=self.row_schema, registry=EMPTY_REGISTRY, format_checker=FORMAT_CHECKER
+                schema=self.row_schema,
+                registry=referencing_jsonschema.EMPTY_REGISTRY,
+                format_checker=docma_jsonschema.FORMAT_CHECKER,
             )
             if self.row_schema
             else None
@@ -154,26 +161,41 @@ class DocmaQuerySpecification(BaseModel):
                         executed.
         """
 
-        data = []
-        columns = [f[0] for f in cursor.description]
-        if self.options.fold_headers:
-            columns = [f.lower() for f in columns]
+        return list(self.iter_cursor(cursor))
+
+    # --------------------------------------------------------------------------
+    def iter_cursor(
+        self, cursor, fetch_size: int = DATA_STREAM_FETCH_SIZE
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Iterate over the data from a cursor on which a query has been executed.
+
+        Rows are fetched from the cursor `fetch_size` at a time, so whether the
+        whole result set is held in memory depends on the cursor.
+
+        :param cursor:      DBAPI 2.0 cursor. The query must have already been
+                            executed. The cursor description is not read until
+                            after the first fetch.
+        :param fetch_size:  Number of rows to fetch from the cursor at a time.
+        """
 
+        columns = None
         row_count = 0
-        while True:
-            row = cursor.fetchone()
-            if not row:
-                break
-            row_count += 1
-            if self.options.row_limit and row_count > self.options.row_limit:
-                raise DocmaDataProviderError(
-                    f'{self.name}: Row limit ({self.options.row_limit}) reached.'
-                )
-
-            r = dict(zip(columns, row))
-            try:
-                self.check_row(r)
-            except Exception as e:
-                raise DocmaDataProviderError(f'{self.name}: Bad data {r}: {e}') from e
-            data.append(r)
-        return data
+        while rows := cursor.fetchmany(fetch_size):
+            if columns is None:
+                columns = [f[0] for f in cursor.description]
+                if self.options.fold_headers:
+                    columns = [f.lower() for f in columns]
+            for row in rows:
+                row_count += 1
+                if self.options.row_limit and row_count > self.options.row_limit:
+                    raise DocmaDataProviderError(
+                        f'{self.name}: Row limit ({self.options.row_limit}) reached.'
+                    )
+
+                r = dict(zip(columns, row))
+                try:
+                    self.check_row(r)
+                except Exception as e:
+                    raise DocmaDataProviderError(f'{self.name}: Bad data {r}: {e}') from e
+                yield r
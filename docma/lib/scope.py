@@ -0,0 +1,152 @@
+"""
+Layered rendering parameter scopes.
+
+Rendering parameters are assembled from several layers (template defaults,
+command line parameters, batch row data, docma extras ...) and individual
+render calls often add a few more (e.g. when rendering query parameters).
+Merging these with `deep_update_dict()` means copying the entire parameter tree
+each time. A `ParamScope` provides the same merged view by reading through the
+layers on access, without copying any of them.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping, MutableMapping
+from typing import Any
+
+__author__ = 'Murray Andrews'
+
+# Marks a key deleted from a scope that is still present in an underlying layer.
+_DELETED = object()
+
+
+# ------------------------------------------------------------------------------
+class ParamScope(MutableMapping):
+    """
+    A read-through, deep-merged view of a stack of parameter mappings.
+
+    Lookups behave as if the layers had been merged with `deep_update_dict()`,
+    with later layers taking precedence over earlier ones. Where a key holds a
+    mapping in more than one layer, the value is itself a `ParamScope` over
+    those mappings. Other values are returned as is from the layer that holds
+    them (i.e. they are not copied).
+
+    Assignments and deletions are held in the scope itself and never modify the
+    underlying layers, so layers can be safely shared across scopes (e.g. the
+    template parameter defaults in a `TemplateSession`).
+
+    :param layers:  Parameter mappings, lowest precedence first. Empty or
+                    None layers are ignored.
+    """
+
+    __slots__ = ('_layers', '_local', '_scopes')
+
+    # --------------------------------------------------------------------------
+    def __init__(self, *layers: Mapping[str, Any] | None):
+        """Create a parameter scope."""
+
+        self._layers = tuple(reversed([layer for layer in layers if layer]))
+        self._local = {}
+        self._scopes = {}
+
+    # --------------------------------------------------------------------------
+    def _lookup(self, key: str) -> list:
+        """
+        Find the values for a key that contribute to the merged value.
+
+        :param key:     The key.
+        :return:        Contributing values, highest precedence first. Either
+                        a single non-mapping value or one or more mappings.
+        """
+
+        values = []
+        for layer in (self._local, *self._layers):
+            if key not in layer:
+                continue
+            value = layer[key]
+            if value is _DELETED:
+                break
+            if not isinstance(value, Mapping):
+                # A non-mapping value replaces anything below it and is itself
+                # replaced by any mappings above it.
+                if not values:
+                    values.append(value)
+                break
+            values.append(value)
+        return values
+
+    # --------------------------------------------------------------------------
+    def __getitem__(self, key: str) -> Any:
+        """Get the merged value for a key."""
+
+        if key in self._scopes:
+            return self._scopes[key]
+        if not (values := self._lookup(key)):
+            raise KeyError(key)
+        if len(values) == 1 and (key in self._local or not isinstance(values[0], Mapping)):
+            return values[0]
+        # Wrap even a single mapping from a layer so that changes made via the
+        # returned value are kept in this scope and not written to the layer.
+        scope = self._scopes[key] = ParamScope(*reversed(values))
+        return scope
+
+    # --------------------------------------------------------------------------
+    def __setitem__(self, key: str, value: Any) -> None:
+        """Set a value in this scope."""
+
+        self._local[key] = value
+        self._scopes.pop(key, None)
+
+    # --------------------------------------------------------------------------
+    def __delitem__(self, key: str) -> None:
+        """Delete a key from this scope, masking it in the underlying layers."""
+
+        if key not in self:
+            raise KeyError(key)
+        self._scopes.pop(key, None)
+        if any(key in layer for layer in self._layers):
+            self._local[key] = _DELETED
+        else:
+            del self._local[key]
+
+    # --------------------------------------------------------------------------
+    def __contains__(self, key: object) -> bool:
+        """Check if a key is present in the scope."""
+        return bool(self._lookup(key))
+
+    # --------------------------------------------------------------------------
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the keys, in the order they would be in a merged dict."""
+
+        seen = set()
+        for layer in (*reversed(self._layers), self._local):
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    if key in self:
+                        yield key
+
+    # --------------------------------------------------------------------------
+    def __len__(self) -> int:
+        """Get the number of keys."""
+        return sum(1 for _ in self)
+
+    # --------------------------------------------------------------------------
+    def __repr__(self) -> str:
+        """Show the merged parameters."""
+        return repr(self.to_dict())
+
+    # --------------------------------------------------------------------------
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Merge the scope into a dict.
+
+        This is only needed where a real dict is required (e.g. for JSON schema
+        validation). Nested mappings are converted to dicts but other values are
+        not copied.
+        """
+
+        return {
+            k: v.to_dict() if isinstance(v, ParamScope) else v.copy() if isinstance(v, dict) else v
+            for k, v in self.items()
+        }
@@ -0,0 +1,23 @@
+"""
+Static plugin index for docma.plugins.format_checkers.
+
+Generated by etc/plugin-index. DO NOT EDIT.
+"""
+
+# fmt: off
+PLUGINS = {
+    '_dmy': 'docma.plugins.format_checkers.deprecated',
+    'abn': 'docma.plugins.format_checkers.deprecated',
+    'acn': 'docma.plugins.format_checkers.deprecated',
+    'au.abn': 'docma.plugins.format_checkers.au.company_ids',
+    'au.acn': 'docma.plugins.format_checkers.au.company_ids',
+    'au.mirn': 'docma.plugins.format_checkers.au.industry_formats',
+    'au.nmi': 'docma.plugins.format_checkers.au.industry_formats',
+    'dd/mm/yyyy': 'docma.plugins.format_checkers.deprecated',
+    'energy_unit': 'docma.plugins.format_checkers.utility',
+    'locale': 'docma.plugins.format_checkers.utility',
+    'mirn': 'docma.plugins.format_checkers.deprecated',
+    'nmi': 'docma.plugins.format_checkers.deprecated',
+    'power_unit': 'docma.plugins.format_checkers.utility',
+    'semantic_version': 'docma.plugins.format_checkers.utility',
+}
@@ -0,0 +1,27 @@
+"""
+Static plugin index for docma.plugins.jinja_filters.
+
+Generated by etc/plugin-index. DO NOT EDIT.
+"""
+
+# fmt: off
+PLUGINS = {
+    'abn': 'docma.plugins.jinja_filters.deprecated',
+    'acn': 'docma.plugins.jinja_filters.deprecated',
+    'au.abn': 'docma.plugins.jinja_filters.au.company_ids',
+    'au.acn': 'docma.plugins.jinja_filters.au.company_ids',
+    'compact_decimal': 'docma.plugins.jinja_filters.number',
+    'css_id': 'docma.plugins.jinja_filters.utility',
+    'date': 'docma.plugins.jinja_filters.datetime',
+    'datetime': 'docma.plugins.jinja_filters.datetime',
+    'decimal': 'docma.plugins.jinja_filters.number',
+    'dollars': 'docma.plugins.jinja_filters.dollars',
+    'parse_date': 'docma.plugins.jinja_filters.datetime',
+    'parse_time': 'docma.plugins.jinja_filters.datetime',
+    'percent': 'docma.plugins.jinja_filters.number',
+    'phone': 'docma.plugins.jinja_filters.phone',
+    'require': 'docma.plugins.jinja_filters.utility',
+    'sql_safe': 'docma.plugins.jinja_filters.utility',
+    'time': 'docma.plugins.jinja_filters.datetime',
+    'timedelta': 'docma.plugins.jinja_filters.datetime',
+}
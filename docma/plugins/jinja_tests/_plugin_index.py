@@ -0,0 +1,9 @@
+"""
+Static plugin index for docma.plugins.jinja_tests.
+
+Generated by etc/plugin-index. DO NOT EDIT.
+"""
+
+# fmt: off
+PLUGINS = {
+}
@@ -4,6 +4,8 @@ from __future__ import annotations
 
 from typing import Callable
 
+from docma.lib.lazy import import_submodules
+
 _URL_FETCHERS = {}
 
 
@@ -24,4 +26,5 @@ def url_fetcher(*schemes: str) -> Callable:
 def get_url_fetcher_for_scheme(scheme: str) -> Callable:
     """Get URL fetcher for the specified URL scheme."""
 
+    import_submodules(__package__)
     return _URL_FETCHERS[scheme]
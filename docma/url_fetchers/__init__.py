@@ -37,19 +37,9 @@ on failure.
 
 """
 
-import pkgutil
-from importlib import import_module
-
 from .__common__ import (
     get_url_fetcher_for_scheme as get_url_fetcher_for_scheme,
     url_fetcher as url_fetcher,
 )
 
-# Auto import our URL fetcher functions
-for _, module_name, _ in pkgutil.iter_modules(__path__):
-    if module_name.startswith('_'):
-        continue
-    import_module(f'.{module_name}', package=__name__)
-
-
 __all__ = ['get_url_fetcher_for_scheme', 'url_fetcher']
@@ -7,13 +7,15 @@ from mimetypes import guess_type
 from typing import Any
 from urllib.parse import ParseResult
 
-import boto3
 
 from docma.config import IMPORT_MAX_SIZE
 from docma.exceptions import DocmaUrlFetchError
 from docma.jinja import DocmaRenderContext
+from docma.lib.lazy import lazy_import
 from docma.url_fetchers import url_fetcher
 
+boto3 = lazy_import('boto3')
+
 
 # ------------------------------------------------------------------------------
 @lru_cache(maxsize=1)
@@ -15,8 +15,6 @@ from logging import getLogger
 from pathlib import Path
 from typing import Callable
 
-import altair as alt
-import jsonschema
 import yaml
 
 import docma.resources
@@ -24,14 +22,19 @@ from docma.config import LOGNAME
 from docma.exceptions import DocmaInternalError, DocmaPackageError
 from docma.jinja import DocmaJinjaEnvironment
 from docma.lib.http import get_url
-from docma.lib.jsonschema import FORMAT_CHECKER
+from docma.lib.lazy import lazy_import
 from docma.lib.query import DocmaQuerySpecification
 
+alt = lazy_import('altair')
+jsonschema = lazy_import('jsonschema')
+docma_jsonschema = lazy_import('docma.lib.jsonschema')
+
 LOG = getLogger(LOGNAME)
 
 _validators = []
 
-_jinja_env = DocmaJinjaEnvironment(autoescape=True)
+# This only checks that content parses so there's no point caching templates.
+_jinja_env = DocmaJinjaEnvironment(autoescape=True, template_cache_size=0)
 
 
 # ------------------------------------------------------------------------------
@@ -61,7 +64,7 @@ def _config(content: bytes):
         raise DocmaInternalError(f'Error reading config-schema.yaml: {e}')
 
     LOG.debug('Validating config against schema')
-    jsonschema.validate(config, config_schema, format_checker=FORMAT_CHECKER)
+    jsonschema.validate(config, config_schema, format_checker=docma_jsonschema.FORMAT_CHECKER)
 
     # If there is a schema for parameters provided, validate that
     params_schema = config.get('parameters', {}).get('schema')
@@ -104,3 +104,22 @@ def test_docma_cli_normal_invocation():
 
     result = check_output([sys.executable, '-m', 'docma.cli.docma', '--version'])
     assert result.decode('utf-8').strip() == __version__
+
+
+# ------------------------------------------------------------------------------
+def test_docma_cli_lazy_imports() -> None:
+    """Check that CLI startup doesn't drag in the heavyweight dependencies."""
+
+    script = """
+import sys
+from docma.cli import docma
+sys.argv = ['docma', '--version']
+try:
+    docma.main()
+except SystemExit:
+    pass
+print(' '.join(sys.modules))
+"""
+    heavy = {'altair', 'boto3', 'bs4', 'jsonschema', 'pg8000', 'pypdf', 'tqdm', 'weasyprint'}
+    loaded = set(check_output([sys.executable, '-c', script], text=True).split())
+    assert not heavy & loaded
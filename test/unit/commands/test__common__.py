@@ -1,13 +1,38 @@
 """Test __common__.py."""
 
+import json
+import logging
 import sys
 from argparse import Namespace
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from io import StringIO
+from unittest.mock import Mock
 
+import duckdb
 import pytest  # noqa
 
+from docma import compile_template
 from docma.commands import CliCommand
-from docma.commands.__common__ import marshal_rendering_params
+from docma.commands.__common__ import (
+    batch_jobs,
+    batch_mp_context,
+    batch_prevalidate,
+    batch_results,
+    batch_row_count,
+    batch_row_params,
+    batch_run_row,
+    batch_template_session,
+    batch_worker_init,
+    marshal_rendering_params,
+)
+from docma.config import LOGNAME
+from docma.data_providers import DataSourceSpec
+from docma.exceptions import DocmaDataProviderError, DocmaError
+from docma.jinja import DocmaRenderContext
+from docma.lib.batch import BatchErrorReport, BatchManifest, batch_map
+from docma.lib.packager import PackageReader
 
 
 # ------------------------------------------------------------------------------
@@ -97,3 +122,290 @@ def test_marshal_rendering_params(args, expected, tmp_path, monkeypatch):
 
     monkeypatch.setattr(sys, 'stdin', StringIO(stdin))
     assert marshal_rendering_params(args) == expected
+
+
+# ------------------------------------------------------------------------------
+def test_batch_row_count(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with duckdb.connect('test.db') as conn:
+        conn.execute('CREATE TABLE t AS SELECT range AS n FROM range(5)')
+    (tmp_path / 'count.yaml').write_text('description: c\nquery: SELECT count(*) FROM t\n')
+    (tmp_path / 'none.yaml').write_text('description: c\nquery: SELECT n FROM t WHERE n > 9\n')
+    data_src = DataSourceSpec(src_type='duckdb', location='test.db', query='rows.yaml')
+    context = DocmaRenderContext(PackageReader.new(tmp_path))
+
+    assert batch_row_count(data_src, None, context) is None
+    assert batch_row_count(data_src, 'count.yaml', context) == 5
+    with pytest.raises(DocmaDataProviderError, match='must return a number'):
+        batch_row_count(data_src, 'none.yaml', context)
+
+
+# ------------------------------------------------------------------------------
+def test_batch_worker_init_warm_up_fail(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr('docma.commands.__common__.setup_logging', lambda *a, **k: None)
+    batch_template_session.cache_clear()
+    with caplog.at_level(logging.INFO, logger=LOGNAME):
+        batch_worker_init(str(tmp_path / 'no-such-template'), 'PDF', 'info')
+    assert 'Warm-up failed' in caplog.text
+    assert 'Warm-up took' in caplog.text
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('start_method', ['fork', 'forkserver'])
+def test_batch_mp_context(start_method, tmp_path, monkeypatch):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: mpc\ndescription: mpc\nowner: me\nversion: "1.0.0"\ndocuments:\n  - content/a.html\n'
+    )
+    (src_dir / 'content' / 'a.html').write_text('<html><body>{{ n }}</body></html>')
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+    preloads = []
+    monkeypatch.setattr(
+        'multiprocessing.context.ForkServerContext.set_forkserver_preload',
+        lambda self, modules: preloads.append(modules),
+    )
+    batch_template_session.cache_clear()
+
+    mp_context = batch_mp_context(start_method, ['json'], str(tmp_path / 'pkg'), 'HTML')
+    assert mp_context.get_start_method() == start_method
+    if start_method == 'fork':
+        # Template session is opened and warmed up before forking
+        assert batch_template_session.cache_info().currsize == 1
+        assert batch_template_session(str(tmp_path / 'pkg'))._warm  # noqa: SLF001
+        assert not preloads
+    else:
+        assert batch_template_session.cache_info().currsize == 0
+        assert preloads == [['json']]
+    batch_template_session.cache_clear()
+
+
+# ------------------------------------------------------------------------------
+def test_batch_row_params(tmp_path, monkeypatch):
+    monkeypatch.setattr('docma.commands.__common__.setup_logging', lambda *a, **k: None)
+    monkeypatch.setattr('docma.commands.__common__.batch_template_session', lambda name: Mock())
+    common = {'a': {'x': 1, 'y': {'z': 2}}, 'table': {'k': 'v'}}
+    batch_worker_init('whatever', 'PDF', 'info', common_params=common)
+
+    params = batch_row_params({'a': {'y': {'w': 3}}, 'b': 4})
+    assert params == {'a': {'x': 1, 'y': {'z': 2, 'w': 3}}, 'table': {'k': 'v'}, 'b': 4}
+    # Common params are not modified
+    assert batch_row_params({}) == common == {'a': {'x': 1, 'y': {'z': 2}}, 'table': {'k': 'v'}}
+
+
+# ------------------------------------------------------------------------------
+def test_batch_prevalidate(tmp_path, monkeypatch, caplog):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: pval\ndescription: pv\nowner: me\nversion: "1.0.0"\n'
+        'parameters:\n  schema:\n    type: object\n'
+        '    properties:\n      n: {type: integer, maximum: 5}\n'
+        'documents:\n  - content/a.html\n'
+    )
+    (src_dir / 'content' / 'a.html').write_text('<html><body>{{ n }}</body></html>')
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+    monkeypatch.setattr('docma.commands.__common__.setup_logging', lambda *a, **k: None)
+    batch_template_session.cache_clear()
+    pkg = str(tmp_path / 'pkg')
+
+    # Threads will do as the worker state is per process.
+    with ThreadPoolExecutor(
+        max_workers=2, initializer=batch_worker_init, initargs=(pkg, 'HTML', 'info')
+    ) as executor:
+        batch_prevalidate(executor, [{'n': n} for n in range(6)], pkg, 'HTML', window=2)
+        with caplog.at_level(logging.ERROR, logger=LOGNAME):
+            with pytest.raises(ValueError, match='3 of 9 batch rows failed validation'):
+                batch_prevalidate(
+                    executor, [{'n': n} for n in range(8)] + [{'n': 'x'}], pkg, 'HTML', window=2
+                )
+    assert 'Batch row 7: $.n: 6 is greater than the maximum of 5' in caplog.text
+    assert "Batch row 9: $.n: 'x' is not of type 'integer'" in caplog.text
+    batch_template_session.cache_clear()
+
+
+# ------------------------------------------------------------------------------
+def test_batch_jobs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    context = DocmaRenderContext(PackageReader.new(tmp_path), {'ext': 'pdf'})
+    rows = [{'n': n} for n in range(5)]
+
+    row_nums, batch_data, output_files = batch_jobs(iter(rows), 'out/{{ n }}.{{ ext }}', context)
+    assert list(zip(row_nums, batch_data, output_files)) == [
+        (r['n'] + 1, r, f'out/{r["n"]}.pdf') for r in rows
+    ]
+
+    (tmp_path / 'out').mkdir()
+    with BatchManifest('manifest.jsonl', 'x') as manifest:
+        row_nums, _, output_files = batch_jobs(rows[:3], 'out/{{ n }}.pdf', context, manifest)
+        for row_num, output_file in zip(row_nums, output_files):
+            (tmp_path / output_file).write_text('x')
+            manifest.record(row_num)
+    with BatchManifest('manifest.jsonl', 'x', resume=True) as manifest:
+        row_nums, batch_data, output_files = batch_jobs(rows, 'out/{{ n }}.pdf', context, manifest)
+        assert list(row_nums) == [4, 5]
+        assert list(batch_data) == rows[3:]
+        assert list(output_files) == ['out/3.pdf', 'out/4.pdf']
+        assert manifest.skipped == 3
+
+
+# ------------------------------------------------------------------------------
+def flaky_renderer(batch_params, output_file):
+    """Raise the exceptions listed in the batch params, one per call, then succeed."""
+    if failures := batch_params.get('failures'):
+        raise failures.pop(0)
+    batch_params['done'] = output_file
+
+
+# ------------------------------------------------------------------------------
+def chained(*errors: Exception) -> Exception:
+    """Chain exceptions as if each was raised while handling the next."""
+    for outer, inner in zip(errors, errors[1:]):
+        outer.__cause__ = inner
+    return errors[0]
+
+
+# ------------------------------------------------------------------------------
+def test_batch_run_row(monkeypatch):
+    monkeypatch.setattr('docma.commands.__common__.BATCH_RETRY_DELAY', 0)
+
+    # Transient errors are retried, even when wrapped in other exceptions.
+    row = {
+        'failures': [
+            chained(
+                Exception('Error rendering x.html'),
+                DocmaDataProviderError('Postgres connection error'),
+                ConnectionRefusedError('refused'),
+            ),
+            TimeoutError('y'),
+        ]
+    }
+    result = batch_run_row(1, row, 'a.pdf', flaky_renderer, retries=2)
+    assert result.status == 'ok'
+    assert (result.row, result.output, result.attempts) == (1, 'a.pdf', 3)
+    assert row['done'] == 'a.pdf'
+
+    row = {'failures': [ConnectionError('x'), chained(DocmaDataProviderError('z'), TimeoutError())]}
+    result = batch_run_row(2, row, 'b.pdf', flaky_renderer, retries=1)
+    assert result.status == 'error'
+    assert (result.attempts, result.error, result.error_type) == (2, 'z', 'DocmaDataProviderError')
+
+    # Other errors are not retried
+    for error in (
+        ValueError('bad'),
+        chained(
+            Exception('Error rendering x.html'),
+            DocmaDataProviderError('query.yaml: syntax error at or near "SELEC"'),
+        ),
+    ):
+        row = {'failures': [error]}
+        result = batch_run_row(3, row, 'c.pdf', flaky_renderer, retries=2)
+        assert (result.status, result.attempts) == ('error', 1)
+        assert result.error_type == type(error).__name__
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('continue_on_error', [True, False])
+def test_batch_results_output_name_errors(continue_on_error, tmp_path, monkeypatch, caplog):
+    """Rows whose output file name can't be rendered go down the row error path."""
+
+    monkeypatch.chdir(tmp_path)
+    context = DocmaRenderContext(PackageReader.new(tmp_path), {})
+    rows = [{'n': n, 'name': f'f{n}'} for n in range(4)]
+    rows[1]['name'] = '../escape'
+    job_errors = deque()
+    with (
+        ThreadPoolExecutor(max_workers=1) as executor,
+        BatchManifest('manifest.jsonl', 'x') as manifest,
+        BatchErrorReport('errors.jsonl') as error_report,
+    ):
+        results = batch_map(
+            executor,
+            partial(batch_run_row, renderer=flaky_renderer),
+            *batch_jobs(rows, '{{ name }}.pdf', context, manifest, job_errors),
+            window=1,
+        )
+        match = '1 batch rows failed' if continue_on_error else 'Batch row 2: '
+        with caplog.at_level(logging.ERROR, logger=LOGNAME):
+            with pytest.raises(DocmaError, match=match):
+                batch_results(
+                    results,
+                    manifest=manifest,
+                    error_report=error_report,
+                    continue_on_error=continue_on_error,
+                    job_errors=job_errors,
+                )
+
+    manifest_entries = [json.loads(s) for s in (tmp_path / 'manifest.jsonl').open()]
+    errors = [json.loads(s) for s in (tmp_path / 'errors.jsonl').open()]
+    assert [e['row'] for e in errors] == [2]
+    if continue_on_error:
+        assert [(e['row'], e['status']) for e in manifest_entries] == [
+            (1, 'ok'),
+            (3, 'ok'),
+            (4, 'ok'),
+        ]
+        assert [r.get('done') for r in rows] == ['f0.pdf', None, 'f2.pdf', 'f3.pdf']
+    else:
+        # No more rows are started after the failure
+        assert rows[3].get('done') is None
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('continue_on_error', [True, False])
+def test_batch_results(continue_on_error, tmp_path, caplog):
+    rows = [{'n': n} for n in range(8)]
+    for n in (2, 5):
+        rows[n]['failures'] = [ValueError(f'bad {n}')]
+    outputs = [str(tmp_path / f'{n}.pdf') for n in range(8)]
+    with (
+        ThreadPoolExecutor(max_workers=1) as executor,
+        BatchManifest(tmp_path / 'manifest.jsonl', 'x') as manifest,
+        BatchErrorReport(tmp_path / 'errors.jsonl') as error_report,
+    ):
+        for n, row in enumerate(rows, start=1):
+            manifest.start(n, row, outputs[n - 1])
+        results = batch_map(
+            executor,
+            partial(batch_run_row, renderer=flaky_renderer),
+            range(1, 9),
+            rows,
+            outputs,
+            window=1,
+        )
+        match = '2 batch rows failed' if continue_on_error else 'Batch row 3: .*: bad 2'
+        with caplog.at_level(logging.ERROR, logger=LOGNAME):
+            with pytest.raises(DocmaError, match=match):
+                batch_results(
+                    results,
+                    manifest=manifest,
+                    error_report=error_report,
+                    continue_on_error=continue_on_error,
+                )
+
+    manifest_entries = [json.loads(s) for s in (tmp_path / 'manifest.jsonl').open()]
+    errors = [json.loads(s) for s in (tmp_path / 'errors.jsonl').open()]
+    if continue_on_error:
+        assert [r.get('done') for r in rows] == [
+            o if n not in (2, 5) else None for n, o in enumerate(outputs)
+        ]
+        assert [e['status'] for e in manifest_entries] == [
+            'ok',
+            'ok',
+            'error',
+            'ok',
+            'ok',
+            'error',
+            'ok',
+            'ok',
+        ]
+        assert [(e['row'], e['error'], e['error_type']) for e in errors] == [
+            (3, 'bad 2', 'ValueError'),
+            (6, 'bad 5', 'ValueError'),
+        ]
+        assert 'Batch row 6:' in caplog.text
+    else:
+        # No more rows are started after the failure
+        assert 'done' not in rows[-1]
+        assert [e['status'] for e in manifest_entries][-1] == 'error'
+        assert [e['row'] for e in errors] == [3]
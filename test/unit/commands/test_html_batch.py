@@ -66,3 +66,14 @@ def test_cmd_html_render_batch_ok(
             '{GivenName} {FamilyName} likes {FavouriteCustard}'.format(**base_data[html_path.stem])
             in html.body.text
         )
+
+
+# ------------------------------------------------------------------------------
+def test_cmd_html_batch_bad_chunk_size_fail(monkeypatch):
+    monkeypatch.setattr(
+        sys,
+        'argv',
+        ['*', 'html-batch', '--template', '*', '-d', '*', '--output', '*', '--chunk-size', '0'],
+    )
+    with pytest.raises(SystemExit):
+        docma.main()
@@ -80,3 +80,14 @@ def test_cmd_pdf_batch_bad_compression_fail(dirs, monkeypatch, tmp_path, capsys)
         docma.main()
 
     assert 'compression must be between 0 and 9' in capsys.readouterr().err
+
+
+# ------------------------------------------------------------------------------
+def test_cmd_pdf_batch_bad_chunk_size_fail(monkeypatch):
+    monkeypatch.setattr(
+        sys,
+        'argv',
+        ['*', 'pdf-batch', '--template', '*', '-d', '*', '--output', '*', '--chunk-size', '0'],
+    )
+    with pytest.raises(SystemExit):
+        docma.main()
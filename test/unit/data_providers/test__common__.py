@@ -3,11 +3,14 @@
 from __future__ import annotations
 
 import json
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import sleep
 
 import pytest  # noqa
 
-from docma.data_providers import load_data
-from docma.data_providers.__common__ import data_provider_for_src_type
+from docma.data_providers import load_data, stream_data
+from docma.data_providers.__common__ import _DATA_SOURCE_TYPE, data_provider_for_src_type
 from docma.data_providers.db import *
 from docma.exceptions import DocmaDataProviderError
 from docma.jinja import DocmaRenderContext
@@ -76,3 +79,58 @@ def test_data_loader_bad_content_fail(td, tmp_path) -> None:
             DataSourceSpec(src_type='file', location='bad-data.jsonl'),
             DocmaRenderContext(PackageReader.new(tmp_path)),
         )
+
+
+# ------------------------------------------------------------------------------
+def test_stream_data_ok(td) -> None:
+    context = DocmaRenderContext(PackageReader.new(td), params={'rows': [{'a': 1}, {'a': 2}]})
+
+    # File data sources have a streaming data provider
+    rows = stream_data(DataSourceSpec(src_type='file', location='custard100.jsonl'), context)
+    assert isinstance(next(rows), dict)
+    assert sum(1 for _ in rows) == 99
+
+    # Params data sources don't so the list from the normal data provider is used
+    rows = stream_data(DataSourceSpec(src_type='params', location='rows'), context)
+    assert list(rows) == [{'a': 1}, {'a': 2}]
+
+
+# ------------------------------------------------------------------------------
+def test_stream_data_bad_content_fail(tmp_path) -> None:
+
+    data_file = tmp_path / 'bad-data.jsonl'
+    data_file.write_text('{"a": 1}\n"Bad data - expecting a dict"\n')
+
+    rows = stream_data(
+        DataSourceSpec(src_type='file', location='bad-data.jsonl'),
+        DocmaRenderContext(PackageReader.new(tmp_path)),
+    )
+    assert next(rows) == {'a': 1}
+    with pytest.raises(DocmaDataProviderError, match='Bad data - must be a list of dicts'):
+        next(rows)
+
+
+# ------------------------------------------------------------------------------
+def test_load_data_serialised(monkeypatch):
+    """Concurrent loads don't run data providers at the same time."""
+
+    in_provider = Lock()
+
+    def provider(data_src, context, **kwargs):
+        assert in_provider.acquire(blocking=False), 'Concurrent data provider calls'
+        try:
+            sleep(0.05)
+            return [{'location': data_src.location}]
+        finally:
+            in_provider.release()
+
+    data_provider_for_src_type('file')  # Register the built in providers first
+    monkeypatch.setitem(_DATA_SOURCE_TYPE, 'slow', provider)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(
+            executor.map(
+                lambda n: load_data(DataSourceSpec(src_type='slow', location=str(n)), None),
+                range(4),
+            )
+        )
+    assert results == [[{'location': str(n)}] for n in range(4)]
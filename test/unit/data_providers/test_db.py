@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import builtins
 import importlib
+from unittest.mock import Mock
 
 import pytest  # noqa
 from moto import mock_aws  # noqa
@@ -281,6 +282,22 @@ def test_duckdb_loader_absolute_path_fail(tc, td, dirs):
         duckdb_loader(ds, context)
 
 
+# ------------------------------------------------------------------------------
+def test_duckdb_streamer_ok(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with duckdb.connect('test.db') as conn:
+        conn.execute('CREATE TABLE t AS SELECT range AS n FROM range(5)')
+    (tmp_path / 'q.yaml').write_text('description: t\nquery: SELECT n FROM t ORDER BY n\n')
+    ds = DataSourceSpec(src_type='duckdb', location='test.db', query='q.yaml')
+
+    rows = duckdb_streamer(ds, DocmaRenderContext(tpkg=PackageReader.new(tmp_path)))
+    assert next(rows) == {'n': 0}
+    assert list(rows) == [{'n': n} for n in range(1, 5)]
+
+    with pytest.raises(DocmaDataProviderError, match='Query is required'):
+        next(duckdb_streamer(DataSourceSpec(src_type='duckdb', location='test.db'), None))
+
+
 # ------------------------------------------------------------------------------
 def make_mock_lava_get_pysql_connection(env):
     """Factory method to create mock lava get-pysql connection maker."""
@@ -474,3 +491,46 @@ def test_importerror_paths(target, expected_attr, loader_fn, message, monkeypatc
     # Try to run the data loader that is now crippled
     with pytest.raises(DocmaDataProviderError, match=message):
         loader_fn(None, None)  # noqa
+
+
+# ------------------------------------------------------------------------------
+def test_forget_connections(monkeypatch):
+    # Other tests may reload the module so don't use the names imported above.
+    from docma.data_providers import db
+
+    monkeypatch.setattr('pg8000.connect', lambda **kwargs: Mock())
+    db.postgress_connect.cache_clear()
+    conn_info = db.ConnectionInfo(host='h', port=1, user='u', password='p', database='d')
+    conn = db.postgress_connect(conn_info)
+    assert db.postgress_connect(conn_info) is conn
+
+    # This is what happens in a forked child process
+    db._forget_connections()  # noqa: SLF001
+    assert db.postgress_connect(conn_info) is not conn
+    db.postgress_connect.cache_clear()
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('exhaust', [True, False])
+def test_postgres_streamer_ends_transaction(exhaust, tmp_path, monkeypatch):
+    """The cursor is closed and the transaction ended when streaming stops."""
+
+    (tmp_path / 'q.yaml').write_text('description: t\nquery: SELECT n FROM t\n')
+    conn = Mock()
+    client_cursor = conn.cursor.return_value
+    client_cursor.description = [('n',)]
+    client_cursor.fetchall.side_effect = [[(n,) for n in range(5)], []]
+    monkeypatch.setattr('docma.data_providers.db.postgress_connect', lambda conn_info: conn)
+    for k, v in dict(host='h', port='5432', user='u', password='p', database='d').items():
+        monkeypatch.setenv(f'DOCMA_PGX_{k.upper()}', v)
+    ds = DataSourceSpec(src_type='postgres', location='pgx', query='q.yaml')
+
+    rows = postgres_streamer(ds, DocmaRenderContext(tpkg=PackageReader.new(tmp_path)))
+    if exhaust:
+        assert list(rows) == [{'n': n} for n in range(5)]
+    else:
+        assert next(rows) == {'n': 0}
+        rows.close()
+    assert client_cursor.execute.call_args.args[0].startswith('CLOSE docma_')
+    client_cursor.close.assert_called_once()
+    conn.rollback.assert_called_once()
@@ -52,3 +52,15 @@ def test_file_loader_query_no_file_fail(td) -> None:
             DataSourceSpec(src_type='file', location='no-such-file.csv'),
             DocmaRenderContext(PackageReader.new(td)),
         )
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('filename', ['custard100.csv', 'custard100.jsonl'])
+def test_file_streamer_ok(filename: str, td) -> None:
+    rows = file_streamer(
+        DataSourceSpec(src_type='file', location=filename),
+        DocmaRenderContext(PackageReader.new(td)),
+    )
+
+    assert isinstance(next(rows), dict)
+    assert sum(1 for _ in rows) == 99
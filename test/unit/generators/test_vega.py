@@ -2,6 +2,11 @@
 
 from __future__ import annotations
 
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+import jsonschema
 import pytest  # noqa
 from pydantic import ValidationError
 
@@ -102,3 +107,94 @@ def test_vega_chart_png(td, tmp_path):
 
     assert chart['mime_type'] == 'image/png'
     assert images_are_identical(chart['string'], td / 'images' / 'woof.png')
+
+
+# ------------------------------------------------------------------------------
+def test_vega_chart_cache(td, tmp_path, monkeypatch):
+    """Identical charts are only rendered once, with a disk tier shared across processes."""
+
+    monkeypatch.setenv('DOCMA_VEGA_CACHE_DIR', str(tmp_path))
+    chart_cache.cache_clear()
+    gen = content_generator_for_type('vega')
+    options = {'spec': 'charts/woof.yaml', 'data': 'file;dogs.csv'}
+    context = DocmaRenderContext(PackageReader.new(td))
+
+    try:
+        chart1 = gen(options, context)
+        chart2 = gen(options, context)
+        assert chart1 == chart2
+        assert chart_cache().stats['memory']['hits'] == 1
+
+        # Simulate a new worker process. The chart should come from disk.
+        chart_cache.cache_clear()
+        monkeypatch.setattr(alt.Chart, 'from_dict', None)
+        assert gen(options, context) == chart1
+        assert chart_cache().stats['disk']['hits'] == 1
+
+        # Different render options are a different chart.
+        assert chart_key({}, VegaOptions(spec='x')) != chart_key({}, VegaOptions(spec='x', ppi=100))
+    finally:
+        monkeypatch.undo()
+        chart_cache.cache_clear()
+
+
+# ------------------------------------------------------------------------------
+def test_validate_chart_spec_once(td, monkeypatch):
+    """A chart spec is validated without data and only once."""
+
+    spec = yaml.safe_load((td / 'charts' / 'woof.yaml').read_text())
+    spec['title'] = 'test_validate_chart_spec_once'
+    validated = []
+    from_dict = alt.Chart.from_dict
+    monkeypatch.setattr(alt.Chart, 'from_dict', lambda d: validated.append(d) or from_dict(d))
+
+    validate_chart_spec(spec, ['data.values'])
+    validate_chart_spec(spec, ['data.values'])
+    assert len(validated) == 1
+    assert validated[0]['data']['values'] == []
+    # The original spec is not modified
+    assert spec['data']['values']
+
+
+# ------------------------------------------------------------------------------
+def test_validate_chart_spec_fail(td):
+    spec = yaml.safe_load((td / 'charts' / 'woof.yaml').read_text())
+    spec['mark'] = {'type': 'no-such-mark'}
+    with pytest.raises(jsonschema.ValidationError, match='no-such-mark'):
+        validate_chart_spec(spec, [])
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('fmt, magic', [('svg', b'<svg'), ('png', b'\x89PNG')])
+def test_render_chart_in_memory(td, monkeypatch, fmt, magic):
+    """Charts are rendered without any temporary files."""
+
+    def no_temp_files(*args, **kwargs):
+        raise AssertionError('Temporary file created')
+
+    monkeypatch.setattr(tempfile, 'mkstemp', no_temp_files)
+    monkeypatch.setattr(tempfile, 'NamedTemporaryFile', no_temp_files)
+    spec = yaml.safe_load((td / 'charts' / 'woof.yaml').read_text())
+    assert render_chart(spec, VegaOptions(spec='woof', format=fmt)).startswith(magic)
+
+
+# ------------------------------------------------------------------------------
+def test_render_chart_date_values():
+    """Data providers can return dates, times and decimals (e.g. from Postgres)."""
+
+    spec = {
+        'mark': 'point',
+        'data': {
+            'values': [
+                {'d': date(2024, 1, 2), 'v': Decimal('1.5')},
+                {'d': datetime(2024, 3, 2, 10, 30), 'v': Decimal('2')},
+            ]
+        },
+        'encoding': {
+            'x': {'field': 'd', 'type': 'temporal'},
+            'y': {'field': 'v', 'type': 'quantitative'},
+        },
+    }
+    svg = render_chart(spec, VegaOptions(spec='dates', format='svg')).decode('utf-8')
+    # The dates are parsed as dates so the axis has month labels
+    assert 'Feb' in svg
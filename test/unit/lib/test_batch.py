@@ -0,0 +1,153 @@
+"""Tests for docma.lib.batch."""
+
+from __future__ import annotations
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import sleep
+
+import pytest
+
+from docma.lib.batch import *
+
+
+# ------------------------------------------------------------------------------
+class CountingExecutor(ThreadPoolExecutor):
+    """Thread pool that tracks how many tasks are in flight."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = Lock()
+        self.in_flight = self.max_in_flight = self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        with self.lock:
+            self.submitted += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        future = super().submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self.done())
+        return future
+
+    def done(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('chunksize', [1, 3, 100])
+def test_batch_map_ordered(chunksize):
+    with CountingExecutor(max_workers=4) as executor:
+        results = list(
+            batch_map(executor, pow, range(20), (2 for _ in range(20)), chunksize=chunksize)
+        )
+    assert results == [n**2 for n in range(20)]
+    assert executor.submitted == -(-20 // chunksize)
+
+
+# ------------------------------------------------------------------------------
+def test_batch_map_unordered():
+    def slow_first(n):
+        if n == 0:
+            sleep(0.2)
+        return n
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(batch_map(executor, slow_first, range(10), window=2, ordered=False))
+    assert sorted(results) == list(range(10))
+    assert results[-1] == 0
+
+
+# ------------------------------------------------------------------------------
+def test_batch_map_window_is_bounded():
+    consumed = 0
+
+    def rows():
+        nonlocal consumed
+        for n in range(1000):
+            consumed += 1
+            yield n
+
+    with CountingExecutor(max_workers=2) as executor:
+        results = batch_map(executor, abs, rows(), chunksize=5, window=3)
+        assert next(results) == 0
+        # Only the first window of chunks has been read from the iterable
+        assert consumed <= 4 * 5
+        assert sum(1 for _ in results) == 999
+    assert executor.max_in_flight <= 3
+
+
+# ------------------------------------------------------------------------------
+def test_batch_map_error_stops_submission():
+    def fail_on_3(n):
+        if n == 3:
+            raise ValueError('boom')
+        return n
+
+    with CountingExecutor(max_workers=1) as executor:
+        results = batch_map(executor, fail_on_3, range(100), window=2)
+        with pytest.raises(ValueError, match='boom'):
+            list(results)
+    assert executor.submitted < 10
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('kwargs', [{'chunksize': 0}, {'window': 0}])
+def test_batch_map_bad_args(kwargs):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(ValueError):
+            list(batch_map(executor, abs, range(3), **kwargs))
+
+
+# ------------------------------------------------------------------------------
+def test_batch_manifest_resume(tmp_path):
+    manifest_path = tmp_path / 'manifest.jsonl'
+    outputs = [tmp_path / f'{n}.pdf' for n in range(4)]
+    with BatchManifest(manifest_path, 'tpl1', {'p': 1}) as manifest:
+        for n, output in enumerate(outputs):
+            assert manifest.start(n + 1, {'n': n}, str(output))
+        for n, output in enumerate(outputs[:3]):
+            output.write_text('x')
+            manifest.record(n + 1)
+    # Partial line from a killed batch
+    with manifest_path.open('a') as fp:
+        fp.write('{"row": 4, "out')
+    entries = [json.loads(line) for line in manifest_path.read_text().splitlines()[:3]]
+    assert [e['row'] for e in entries] == [1, 2, 3]
+    assert {e['status'] for e in entries} == {'ok'}
+    assert {e['template_hash'] for e in entries} == {'tpl1'}
+
+    outputs[1].unlink()
+    with BatchManifest(manifest_path, 'tpl1', {'p': 1}, resume=True) as manifest:
+        assert not manifest.start(1, {'n': 0}, str(outputs[0]))
+        assert manifest.start(2, {'n': 1}, str(outputs[1]))  # Output file missing
+        assert manifest.start(3, {'n': 99}, str(outputs[2]))  # Row params changed
+        assert manifest.start(4, {'n': 3}, str(outputs[3]))  # Never completed
+        assert manifest.skipped == 1
+
+    for template_hash, common_params in (('tpl2', {'p': 1}), ('tpl1', {'p': 2})):
+        with BatchManifest(manifest_path, template_hash, common_params, resume=True) as manifest:
+            assert manifest.start(1, {'n': 0}, str(outputs[0]))
+
+    # Without resume, nothing is skipped
+    with BatchManifest(manifest_path, 'tpl1', {'p': 1}) as manifest:
+        assert manifest.start(1, {'n': 0}, str(outputs[0]))
+
+
+# ------------------------------------------------------------------------------
+def test_batch_manifest_duplicate_outputs(tmp_path):
+    """Rows that render to the same output file are recorded separately."""
+
+    manifest_path = tmp_path / 'manifest.jsonl'
+    output = str(tmp_path / 'same.pdf')
+    with BatchManifest(manifest_path, 'tpl1') as manifest:
+        assert manifest.start(1, {'n': 1}, output)
+        assert manifest.start(2, {'n': 2}, output)
+        manifest.record(2)
+        manifest.record(1, 'error')
+    entries = [json.loads(line) for line in manifest_path.read_text().splitlines()]
+    assert [(e['row'], e['output'], e['status']) for e in entries] == [
+        (2, output, 'ok'),
+        (1, output, 'error'),
+    ]
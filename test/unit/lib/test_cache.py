@@ -0,0 +1,208 @@
+"""Tests for docma.lib.cache."""
+
+from __future__ import annotations
+
+import os
+from hashlib import md5
+
+import pytest
+
+from docma.lib.cache import *
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize(
+    'parts1, parts2, same',
+    [
+        (('abc',), ('abc',), True),
+        (('abc',), (b'abc',), True),
+        (('ab', 'c'), ('a', 'bc'), False),
+        (('abc',), ('abd',), False),
+    ],
+)
+def test_content_key(parts1, parts2, same):
+    assert (content_key(*parts1) == content_key(*parts2)) == same
+
+
+# ------------------------------------------------------------------------------
+def test_stats_cache_ok():
+    cache = StatsCache(2)
+    assert cache.get('a') is None
+    assert cache.get_or_create('a', lambda: 1) == 1
+    assert cache.get_or_create('a', lambda: 2) == 1
+    assert 'a' in cache
+    assert cache.stats == {'hits': 1, 'misses': 2, 'size': 1, 'maxsize': 2}
+
+    # LRU eviction
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert len(cache) == 2
+
+    cache.clear()
+    assert cache.stats == {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 2}
+
+
+# ------------------------------------------------------------------------------
+def test_stats_cache_disabled():
+    cache = StatsCache(0)
+    assert cache.get_or_create('a', lambda: 1) == 1
+    assert cache.get_or_create('a', lambda: 2) == 2
+    assert cache.stats == {'hits': 0, 'misses': 2, 'size': 0, 'maxsize': 0}
+
+
+# ------------------------------------------------------------------------------
+def test_disk_cache_ok(tmp_path):
+    cache = DiskCache(tmp_path / 'cache', max_size=1000)
+    assert cache.get('aa01') is None
+    cache.put('aa01', b'x' * 100)
+    assert cache.get('aa01') == b'x' * 100
+    assert cache.stats == {'hits': 1, 'misses': 1, 'size': 100, 'maxsize': 1000}
+
+    # A second instance (e.g. another process) sees the same entries.
+    cache2 = DiskCache(tmp_path / 'cache', max_size=1000)
+    assert cache2.get('aa01') == b'x' * 100
+    assert cache2.stats['size'] == 100
+
+    cache.clear()
+    assert cache2.get('aa01') is None
+
+
+# ------------------------------------------------------------------------------
+def test_disk_cache_eviction(tmp_path):
+    cache = DiskCache(tmp_path, max_size=1000)
+    for n in range(4):
+        cache.put(f'k{n}', b'x' * 300)
+        # Make sure the mtimes are distinct and in order.
+        os.utime(tmp_path / f'k{n}' / f'k{n}', (n, n))
+    # Only the most recently used entries survive.
+    assert cache.stats['size'] <= 900
+    assert cache.get('k0') is None
+    assert cache.get('k3') == b'x' * 300
+
+    # Too big to cache at all
+    cache.put('big', b'x' * 2000)
+    assert cache.get('big') is None
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('with_disk', [True, False])
+def test_tiered_cache_ok(tmp_path, with_disk):
+    disk = DiskCache(tmp_path, max_size=1000) if with_disk else None
+    cache = TieredCache(10, disk)
+    assert cache.get_or_create('k1', lambda: b'v1') == b'v1'
+    assert cache.get_or_create('k1', lambda: b'v2') == b'v1'
+    assert cache.stats['memory']['hits'] == 1
+
+    if not with_disk:
+        assert 'disk' not in cache.stats
+        return
+
+    # A fresh process starts with an empty memory tier but shares the disk tier.
+    cache2 = TieredCache(10, DiskCache(tmp_path, max_size=1000))
+    assert cache2.get_or_create('k1', lambda: b'v2') == b'v1'
+    assert cache2.stats['disk']['hits'] == 1
+    assert cache2.get_or_create('k1', lambda: b'v2') == b'v1'
+    assert cache2.stats['memory']['hits'] == 1
+    assert cache2.get('k2') is None
+    cache2.put('k2', b'v2')
+    assert TieredCache(10, DiskCache(tmp_path, max_size=1000)).get('k2') == b'v2'
+
+
+# ------------------------------------------------------------------------------
+def weasy_load_image(cache: WeasyImageCache, url: str) -> str:
+    """Mimic the way WeasyPrint uses its image cache."""
+
+    if url in cache:
+        return cache[url]
+    image_id = md5(url.encode()).hexdigest()
+    cache[f'{image_id}-source-'] = f'data for {url}'
+    cache[url] = f'image for {url}'
+    return cache[url]
+
+
+# ------------------------------------------------------------------------------
+def test_weasy_image_cache_ok():
+    cache = WeasyImageCache(2, ('file',))
+    assert weasy_load_image(cache, 'file:logo.png') == 'image for file:logo.png'
+    assert weasy_load_image(cache, 'docma:swatch') == 'image for docma:swatch'
+    assert len(cache) == 4
+    cache.end_render()
+
+    # Only the file image, and its data, survive the end of the render.
+    assert set(cache) == {'file:logo.png', f'{md5(b"file:logo.png").hexdigest()}-source-'}
+    assert 'docma:swatch' not in cache
+    assert weasy_load_image(cache, 'file:logo.png') == 'image for file:logo.png'
+    assert cache.stats == {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 2}
+
+    # Evicted images have their data discarded at the end of the next render.
+    weasy_load_image(cache, 'file:a.png')
+    weasy_load_image(cache, 'file:b.png')
+    cache.end_render()
+    assert 'file:logo.png' not in cache
+    assert len(cache) == 4
+
+
+# ------------------------------------------------------------------------------
+def test_weasy_image_cache_disabled():
+    cache = WeasyImageCache(0, ('file',))
+    weasy_load_image(cache, 'file:logo.png')
+    cache.end_render()
+    assert len(cache) == 0
+
+
+# ------------------------------------------------------------------------------
+def test_weasy_resource_cache_url_fetcher():
+    fetched = []
+
+    def fetcher(url: str) -> dict:
+        fetched.append(url)
+        if url.startswith('http'):
+            return {'file_obj': None}
+        return {'string': url.encode(), 'mime_type': 'text/plain'}
+
+    cache = WeasyResourceCache(10, ('file', 'http'))
+    cached_fetcher = cache.url_fetcher(fetcher)
+    for _ in range(2):
+        for url in ('file:a.css', 'docma:swatch', 'http://x.com/a.css'):
+            cached_fetcher(url)
+
+    # Only cacheable results for the specified schemes are cached
+    assert fetched.count('file:a.css') == 1
+    assert fetched.count('docma:swatch') == 2
+    assert fetched.count('http://x.com/a.css') == 2
+    assert cache.stats['payloads']['hits'] == 1
+
+
+# ------------------------------------------------------------------------------
+def test_weasy_resource_cache_images_keyed_by_content():
+    content = {'file:logo.png': b'v1'}
+    cache = WeasyResourceCache(10, ('file',))
+    cached_fetcher = cache.url_fetcher(lambda url: {'string': content[url]})
+
+    def load_image(url: str) -> str:
+        """Mimic WeasyPrint fetching and decoding an image."""
+        if url in cache.images:
+            return cache.images[url]
+        data = cached_fetcher(url)['string']
+        cache.images[url] = f'image of {data.decode()}'
+        return cache.images[url]
+
+    assert load_image('file:logo.png') == 'image of v1'
+    cache.images.end_render()
+    assert load_image('file:logo.png') == 'image of v1'
+    assert cache.images.stats['hits'] == 1
+
+    # The content is fetched again (e.g. after eviction) and has changed.
+    content['file:logo.png'] = b'v2'
+    cache.payloads.clear()
+    cached_fetcher('file:logo.png')
+    assert load_image('file:logo.png') == 'image of v2'
+
+
+# ------------------------------------------------------------------------------
+def test_weasy_image_cache_is_dict():
+    # WeasyPrint treats a cache that isn't a dict as a disk cache directory.
+    assert isinstance(WeasyImageCache(2, ('file',)), dict)
@@ -54,3 +54,33 @@ def test_html_append(h1: str, h2: str, expected: str):
     html_append(html1, BeautifulSoup(h2, 'html.parser'))
     print(html1)
     assert html1 == BeautifulSoup(expected, 'html.parser')
+
+
+# ------------------------------------------------------------------------------
+def test_resource_urls():
+    html = """
+    <html><head>
+    <link rel="stylesheet" href="s3://bucket/style.css">
+    <style>body { background: url( 'docma:swatch?width=10&height=10' ); }</style>
+    <a href="https://example.com/not-a-resource">link</a>
+    </head><body>
+    <img src="docma:vega?spec=a.yaml&amp;data=file;x.csv">
+    <img SRC='https://example.com/a b.png'>
+    <img src="docma:vega?spec=a.yaml&amp;data=file;x.csv">
+    <img src="images/local.png">
+    </body></html>
+    """
+    assert resource_urls(html, ('docma', 'http', 'https', 's3')) == [
+        's3://bucket/style.css',
+        'docma:swatch?width=10&height=10',
+        'docma:vega?spec=a.yaml&data=file;x.csv',
+        'https://example.com/a%20b.png',
+    ]
+    assert resource_urls(html, ('s3',)) == ['s3://bucket/style.css']
+    assert resource_urls(html)[-1] == 'images/local.png'
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('url', ['https://x.com/a b', 'docma:vega?spec=ä', 'docma:x?a=1&b=%20'])
+def test_normalise_url_idempotent(url):
+    assert normalise_url(normalise_url(url)) == normalise_url(url)
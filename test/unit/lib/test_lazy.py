@@ -0,0 +1,66 @@
+"""Tests for docma.lib.lazy."""
+
+from __future__ import annotations
+
+import sys
+
+import pytest
+
+from docma.lib.lazy import *
+
+
+# ------------------------------------------------------------------------------
+def test_lazy_import_loaded_module():
+    """An already imported module is returned as is."""
+
+    assert lazy_import('json') is sys.modules['json']
+
+
+# ------------------------------------------------------------------------------
+def test_lazy_import_deferred(monkeypatch):
+    """The real import is deferred until first attribute access."""
+
+    monkeypatch.delitem(sys.modules, 'colorsys', raising=False)
+    mod = lazy_import('colorsys')
+    assert isinstance(mod, LazyModule)
+    assert 'colorsys' not in sys.modules
+    assert mod.rgb_to_hsv(0, 0, 0) == (0, 0, 0)
+    assert 'colorsys' in sys.modules
+    assert 'rgb_to_hsv' in dir(mod)
+
+
+# ------------------------------------------------------------------------------
+def test_lazy_import_setattr(monkeypatch):
+    """Setting an attribute on a lazy module sets it on the real module."""
+
+    mod = LazyModule('colorsys')
+    monkeypatch.setattr(mod, 'ONE_THIRD', 0.5)
+    assert sys.modules['colorsys'].ONE_THIRD == 0.5
+
+
+# ------------------------------------------------------------------------------
+def test_lazy_import_fail_keeps_error(tmp_path, monkeypatch):
+    """A failed import raises the original error on every attempt."""
+
+    (tmp_path / 'lazy_broken.py').write_text(
+        "import sys\nsys.modules.pop('lazy_broken')\nraise OSError('no libpango')\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    mod = lazy_import('lazy_broken')
+    errors = []
+    for _ in range(2):
+        with pytest.raises(OSError, match='no libpango') as exc:
+            mod.anything  # noqa: B018
+        errors.append(exc.value)
+    assert errors[0] is errors[1]
+
+
+# ------------------------------------------------------------------------------
+def test_import_submodules():
+    """Handler modules are loaded by the first registry lookup."""
+
+    from docma.url_fetchers import get_url_fetcher_for_scheme
+
+    get_url_fetcher_for_scheme('http')
+    assert 'docma.url_fetchers.http' in sys.modules
+    assert 'docma.url_fetchers.s3' in sys.modules
@@ -192,6 +192,16 @@ def test_html_to_pdf():
     assert pdf.pages[0].extract_text(0) == 'Hello World'
 
 
+# ------------------------------------------------------------------------------
+def test_documents_to_pdf():
+    documents = [
+        html_to_document(f'<HTML><BODY><H1>Page {n}</H1></BODY></HTML>') for n in range(1, 3)
+    ]
+    pdf = documents_to_pdf(documents)
+    assert len(pdf.pages) == 2
+    assert [p.extract_text(0) for p in pdf.pages] == ['Page 1', 'Page 2']
+
+
 # ------------------------------------------------------------------------------
 def test_env_config(env):
     e = env_config('docma', 'PGLOCAL')
@@ -231,3 +241,34 @@ def test_load_font(name: str, size: int) -> None:
     f = load_font(name, size)
     assert f.size == size
     assert f.getname()[1] == 'Regular'
+
+
+# ------------------------------------------------------------------------------
+def test_is_transient_error():
+    class Timeout(OSError):  # e.g. requests.exceptions.Timeout
+        pass
+
+    assert is_transient_error(ConnectionResetError())
+    assert is_transient_error(Timeout())
+    assert not is_transient_error(ValueError())
+
+    try:
+        try:
+            raise TimeoutError('timed out')
+        except TimeoutError:
+            raise RuntimeError('wrapped')  # noqa: B904
+    except RuntimeError as e:
+        assert is_transient_error(e)
+
+    try:
+        try:
+            raise ConnectionError('refused')
+        except ConnectionError:
+            raise RuntimeError('outer') from ValueError('cause')
+    except RuntimeError as e:
+        assert is_transient_error(e)
+        # Loops in the chain are OK
+        e.__cause__.__cause__ = e
+        assert is_transient_error(e)
+        e.__context__ = None
+        assert not is_transient_error(e)
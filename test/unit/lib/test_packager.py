@@ -64,6 +64,61 @@ def test_zip_package_reader(td, tmp_path):
         assert pkg.exists('README.md')
 
 
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('pkg_name', ['pkg', 'pkg.zip'])
+def test_package_reader_fingerprint(tmp_path, pkg_name):
+    with PackageWriter.new(tmp_path / pkg_name) as pkg:
+        pkg.write_bytes(b'Hello world', 'a.bin')
+        pkg.write_bytes(b'', 'empty.bin')
+
+    with PackageReader.new(tmp_path / pkg_name) as pkg:
+        fingerprint = pkg.fingerprint('a.bin')
+        assert fingerprint == pkg.fingerprint('a.bin')
+        assert fingerprint != pkg.fingerprint('empty.bin')
+        digest = pkg.digest()
+        assert digest == pkg.digest()
+
+    if pkg_name.endswith('.zip'):
+        with PackageWriter.new(tmp_path / pkg_name, append=True) as pkg:
+            pkg.write_bytes(b'Goodbye', 'b.bin')
+    else:
+        (tmp_path / pkg_name / 'a.bin').write_bytes(b'Goodbye world')
+    with PackageReader.new(tmp_path / pkg_name) as pkg:
+        assert pkg.exists('a.bin')
+        assert pkg.digest() != digest
+        if pkg_name.endswith('.zip'):
+            assert pkg.read_bytes('b.bin') == b'Goodbye'
+        else:
+            assert pkg.fingerprint('a.bin') != fingerprint
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('pkg_name', ['pkg', 'pkg.zip'])
+def test_package_reader_open_text(tmp_path, pkg_name):
+    with PackageWriter.new(tmp_path / pkg_name) as pkg:
+        pkg.write_string('line 1\nline 2\n', 'a.txt')
+
+    with PackageReader.new(tmp_path / pkg_name) as pkg, pkg.open_text('a.txt') as fp:
+        assert next(fp) == 'line 1\n'
+        assert list(fp) == ['line 2\n']
+
+
+# ------------------------------------------------------------------------------
+def test_zip_package_reader_reopen(tmp_path):
+    with PackageWriter.new(tmp_path / 'pkg.zip') as pkg:
+        pkg.write_string('Hello world', 'a.txt')
+
+    pkg1 = PackageReader.new(tmp_path / 'pkg.zip')
+    with PackageReader.new(tmp_path / 'pkg.zip') as pkg2:
+        pass
+    # This is what happens in a forked child process
+    ZipPackageReader._reopen_all()  # noqa: SLF001
+    assert pkg1.read_text('a.txt') == 'Hello world'
+    with pytest.raises(ValueError):
+        pkg2.read_text('a.txt')
+    pkg1.close()
+
+
 # ------------------------------------------------------------------------------
 def test_dir_package_writer(td, tmp_path):
 
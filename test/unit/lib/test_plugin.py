@@ -1,20 +1,33 @@
 """Test Jinja plugin mgmt."""
 
+import importlib
 import warnings
+from unittest.mock import Mock
 from uuid import uuid4
 
 import pytest  # noqa
 
 from docma.lib.plugin import (
+    IndexedPackageResolver,
     MappingResolver,
+    PLUGIN_INDEX_MODULE,
     PLUGIN_JINJA_FILTER,
     PLUGIN_JINJA_TEST,
+    PLUGIN_JSONSCHEMA_FORMAT,
     PackageResolver,
+    PluginIndex,
     PluginRouter,
     jfilter,
     jtest,
+    scan_plugin_package,
 )
 
+PLUGIN_PACKAGES = {
+    'docma.plugins.format_checkers': {PLUGIN_JINJA_TEST, PLUGIN_JSONSCHEMA_FORMAT},
+    'docma.plugins.jinja_filters': {PLUGIN_JINJA_FILTER},
+    'docma.plugins.jinja_tests': {PLUGIN_JINJA_FILTER, PLUGIN_JINJA_TEST},
+}
+
 
 # ------------------------------------------------------------------------------
 @pytest.mark.parametrize('plugin', ['tojson', 'au.acn', 'AU.Acn', 'phone'])
@@ -226,3 +239,104 @@ def f(value):
         # Try to load the sub category
         assert res.resolve('l1.l2.whizbang')('gizmo') == 'Whizbang gizmo'
         assert len(res._plugins) == 1
+
+
+# ------------------------------------------------------------------------------
+class TestIndexedPackageResolver:
+    # --------------------------------------------------------------------------
+    @pytest.mark.parametrize('package', PLUGIN_PACKAGES)
+    def test_static_plugin_index_is_current(self, package):
+        """If this fails, run etc/plugin-index."""
+
+        static_index = importlib.import_module(f'{package}.{PLUGIN_INDEX_MODULE}').PLUGINS
+        assert static_index == scan_plugin_package(package)
+
+    # --------------------------------------------------------------------------
+    @pytest.mark.parametrize('package, plugin_types', PLUGIN_PACKAGES.items())
+    def test_indexed_package_resolver_matches_package_resolver(self, package, plugin_types):
+
+        for plugin_type in plugin_types:
+            indexed = IndexedPackageResolver(package, plugin_type)
+            scanned = PackageResolver(package, plugin_type)
+            for name in PluginIndex.for_package(package).modules:
+                assert indexed.resolve(name) is scanned.resolve(name)
+
+    # --------------------------------------------------------------------------
+    def test_indexed_package_resolver_shared_index(self):
+
+        res1 = IndexedPackageResolver('docma.plugins.jinja_filters', PLUGIN_JINJA_FILTER)
+        res2 = IndexedPackageResolver('docma.plugins.jinja_filters', PLUGIN_JINJA_FILTER)
+        assert res1._index is res2._index
+        assert res1.resolve('au.abn') is res2.resolve('au.abn')
+        assert res1.resolve('bad-bad-bad.something') is None
+
+    # --------------------------------------------------------------------------
+    def test_indexed_package_resolver_lazy_import(self, tmp_path, capsys, monkeypatch):
+
+        pkg_dir = tmp_path / 'lazy_idx_package'
+        (pkg_dir / 'l1').mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('\n')
+        (pkg_dir / 'l1' / '__init__.py').write_text('\n')
+        (pkg_dir / 'l1' / 'module.py').write_text(
+            """
+from docma.lib.plugin import jfilter
+
+print('IMPORT WHIZBANG')
+
+@jfilter('whizbang')
+def f(value):
+    return f'Whizbang {value}'
+        """
+        )
+        (pkg_dir / f'{PLUGIN_INDEX_MODULE}.py').write_text(
+            "PLUGINS = {'l1.whizbang': 'lazy_idx_package.l1.module'}\n"
+        )
+        monkeypatch.syspath_prepend(str(tmp_path))
+
+        res = IndexedPackageResolver('lazy_idx_package', PLUGIN_JINJA_FILTER)
+        assert len(PluginIndex.for_package('lazy_idx_package').modules) == 1
+        assert 'IMPORT WHIZBANG' not in capsys.readouterr().out
+
+        assert res.resolve('l1.whizbang')('gizmo') == 'Whizbang gizmo'
+        assert 'IMPORT WHIZBANG' in capsys.readouterr().out
+
+        # Wrong plugin type
+        assert (
+            IndexedPackageResolver('lazy_idx_package', PLUGIN_JINJA_TEST).resolve('l1.whizbang')
+            is None
+        )
+
+    # --------------------------------------------------------------------------
+    def test_indexed_package_resolver_stale_index(self, tmp_path, monkeypatch):
+
+        pkg_dir = tmp_path / 'stale_idx_package'
+        pkg_dir.mkdir()
+        (pkg_dir / '__init__.py').write_text('\n')
+        for name in ('old', 'new'):
+            (pkg_dir / f'{name}.py').write_text(
+                f"""
+from docma.lib.plugin import jfilter
+
+@jfilter('{name}')
+def f(value):
+    return f'{name} {{value}}'
+            """
+            )
+        # The index was generated before new.py was added
+        (pkg_dir / f'{PLUGIN_INDEX_MODULE}.py').write_text(
+            "PLUGINS = {'old': 'stale_idx_package.old'}\n"
+        )
+        monkeypatch.syspath_prepend(str(tmp_path))
+
+        res = IndexedPackageResolver('stale_idx_package', PLUGIN_JINJA_FILTER)
+        assert res.resolve('old')('x') == 'old x'
+        with pytest.warns(
+            UserWarning, match=r'out of date \(missing new\) - rerun etc/plugin-index'
+        ):
+            assert res.resolve('new')('x') == 'new x'
+
+        # The package is only scanned once
+        monkeypatch.setattr(
+            'docma.lib.plugin.scan_plugin_package', Mock(side_effect=Exception('Scanned'))
+        )
+        assert res.resolve('nothing.here') is None
@@ -4,6 +4,9 @@ Test docma.lib.query.
 Mostly this is edge cases as the main paths are covered elsewhere.
 """
 
+import sqlite3
+from itertools import islice
+
 import pytest
 import yaml
 
@@ -88,3 +91,20 @@ class TestDocmaQuerySpecification:
 
         with pytest.raises(ValueError, match='Unknown paramstyle'):
             dqs.prepare_query(context, params={'k': 'v'}, paramstyle='bad-paramstyle')
+
+    # --------------------------------------------------------------------------
+    def test_iter_cursor_ok(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE t (N INTEGER)')
+        conn.executemany('INSERT INTO t VALUES (?)', [(n,) for n in range(5)])
+        dqs = DocmaQuerySpecification(
+            name='t', description='t', query='x', options={'fold_headers': True, 'row_limit': 4}
+        )
+
+        rows = dqs.iter_cursor(conn.execute('SELECT N FROM t ORDER BY N'), fetch_size=2)
+        assert next(rows) == {'n': 0}
+        assert [r['n'] for r in islice(rows, 3)] == [1, 2, 3]
+        with pytest.raises(DocmaDataProviderError, match=r'Row limit \(4\) reached'):
+            next(rows)
+
+        assert dqs.fetch_from_cursor(conn.execute('SELECT N FROM t WHERE N > 5')) == []
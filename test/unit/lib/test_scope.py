@@ -0,0 +1,87 @@
+"""Tests for docma.lib.scope."""
+
+from __future__ import annotations
+
+import pytest
+
+from docma.jinja import DocmaJinjaEnvironment
+from docma.lib.misc import deep_update_dict
+from docma.lib.scope import *
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize(
+    'layers',
+    [
+        [],
+        [{'a': 1}, None, {}],
+        [{'a': 1, 'b': {'x': 1}}, {'a': 2, 'c': 3}],
+        [{'a': {'x': 1, 'y': {'z': 1}}}, {'a': {'y': {'w': 2}}}, {'a': {'v': 3}}],
+        [{'a': {'x': 1}}, {'a': 2}],
+        [{'a': 2}, {'a': {'x': 1}}],
+        [{'a': {'x': 1}}, {'a': 2}, {'a': {'y': 3}}],
+    ],
+)
+def test_param_scope_matches_deep_update_dict(layers):
+    scope = ParamScope(*layers)
+    merged = deep_update_dict({}, *layers)
+    assert scope == merged
+    assert scope.to_dict() == merged
+    assert list(scope) == list(merged)
+    assert len(scope) == len(merged)
+    assert bool(scope) == bool(merged)
+
+
+# ------------------------------------------------------------------------------
+def test_param_scope_no_copies():
+    table = {'k': list(range(10))}
+    scope = ParamScope({'table': table, 'a': {'x': 1}}, {'a': {'y': 2}})
+    assert scope['table']['k'] is table['k']
+    assert isinstance(scope['a'], ParamScope)
+    assert scope['a'] is scope['a']
+
+
+# ------------------------------------------------------------------------------
+def test_param_scope_changes_do_not_modify_layers():
+    base = {'a': {'x': 1, 'y': {'z': 1}}, 'b': 1}
+    scope = ParamScope(base, {'a': {'w': 2}})
+
+    scope['a']['y']['z'] = 99
+    scope['a']['v'] = 3
+    scope['c'] = 4
+    del scope['b']
+    del scope['a']['x']
+
+    assert scope == {'a': {'y': {'z': 99}, 'w': 2, 'v': 3}, 'c': 4}
+    assert base == {'a': {'x': 1, 'y': {'z': 1}}, 'b': 1}
+    assert 'b' not in scope
+    with pytest.raises(KeyError):
+        scope['b']  # noqa
+    with pytest.raises(KeyError):
+        del scope['b']
+
+    # Local values can be deleted, revealing anything underneath.
+    scope['c'] = 5
+    del scope['c']
+    assert 'c' not in scope
+    scope['b'] = 2
+    assert scope['b'] == 2
+
+
+# ------------------------------------------------------------------------------
+def test_param_scope_nested_scopes():
+    inner = ParamScope({'a': {'x': 1}, 'b': 1})
+    inner['a']['y'] = 2
+    outer = ParamScope(inner, {'a': {'z': 3}})
+    assert outer == {'a': {'x': 1, 'y': 2, 'z': 3}, 'b': 1}
+    outer['a']['x'] = 0
+    assert inner['a']['x'] == 1
+
+
+# ------------------------------------------------------------------------------
+def test_param_scope_jinja():
+    env = DocmaJinjaEnvironment()
+    scope = ParamScope({'a': {'x': 1, 'y': [1, 2]}, 'n': 'N'}, {'a': {'z': 'Z'}})
+    assert env.from_string('{{ n }}{{ a.x }}{{ a["z"] }}{{ a.y | sum }}').render(**scope) == 'N1Z3'
+    assert env.from_string('{{ a | tojson }}').render(**scope) == '{"x": 1, "y": [1, 2], "z": "Z"}'
+    assert env.from_string('{{ a is mapping }}').render(**scope) == 'True'
@@ -25,3 +25,30 @@ def test_jfunc():
         return 42
 
     assert DOCMA_JINJA_EXTRAS['funky']() == 42
+
+
+# ------------------------------------------------------------------------------
+def test_from_string_cache():
+    env = DocmaJinjaEnvironment(template_cache_size=2)
+    t1 = env.from_string('Hello {{ name }}')
+    t2 = env.from_string('Hello {{ name }}')
+    assert t1 is t2
+    assert t1.render(name='world') == 'Hello world'
+    assert env.template_cache.stats['hits'] == 1
+    assert env.template_cache.stats['misses'] == 1
+
+    # Templates with their own globals are not cached
+    t3 = env.from_string('Hello {{ name }}', globals={'name': 'you'})
+    assert t3 is not t1
+    assert t3.render() == 'Hello you'
+
+    # Cache is bounded
+    env.from_string('a')
+    env.from_string('b')
+    assert len(env.template_cache) == 2
+
+
+# ------------------------------------------------------------------------------
+def test_from_string_cache_disabled():
+    env = DocmaJinjaEnvironment(template_cache_size=0)
+    assert env.from_string('x') is not env.from_string('x')
@@ -3,14 +3,23 @@
 from __future__ import annotations
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from io import BytesIO
+from threading import Barrier
 from time import sleep
 from urllib.error import URLError
 
 import boto3
+import jsonschema
+import pypdf
 import pytest  # noqa
+from bs4 import BeautifulSoup, Tag
 from moto import mock_aws  # noqa
+from pypdf.generic import RectangleObject
 
 from docma.compilers import content_compiler
+from docma.config import DOC_CACHE_DIR_ENV, JINJA_BYTECODE_DIR, PRERENDER_DIR
 from docma.docma_core import *
 from docma.exceptions import DocmaPackageError, DocmaUrlFetchError
 from docma.jinja import DocmaRenderContext
@@ -244,6 +253,133 @@ def test_url_fetcher_no_such_object_fail(url, error, msg, dirs):
             docma_url_fetcher(url, DocmaRenderContext(tpkg))
 
 
+# ------------------------------------------------------------------------------
+def test_prefetch_url_fetcher_ok():
+    """Resources are fetched concurrently before they are requested."""
+
+    barrier = Barrier(3, timeout=5)
+    fetched = []
+
+    def fetcher(url: str, *args, **kwargs):
+        fetched.append(url)
+        if url.startswith('http'):
+            # Only completes if all three are fetched concurrently
+            barrier.wait()
+        if 'bad' in url:
+            raise DocmaUrlFetchError(url)
+        return {'string': url.encode(), 'mime_type': 'text/plain'}
+
+    html = """
+        <img src="https://x.com/a?a=1&amp;b=2"><img src="https://x.com/a?a=2">
+        <img src="http://x.com/bad"><img src="https://x.com/a?a=1&amp;b=2">
+        <img src="images/local.png"><img src="docma:swatch">
+    """
+    prefetcher = prefetch_url_fetcher(html, fetcher)
+    assert len(fetched) == 4
+
+    assert prefetcher('https://x.com/a?a=1&b=2')['string'] == b'https://x.com/a?a=1&b=2'
+    assert prefetcher('docma:swatch')['string'] == b'docma:swatch'
+    with pytest.raises(DocmaUrlFetchError, match='bad'):
+        prefetcher('http://x.com/bad')
+    assert len(fetched) == 4
+
+    # Not prefetched so passed through to the original fetcher.
+    assert prefetcher('file:images/local.png')['string'] == b'file:images/local.png'
+    assert len(fetched) == 5
+
+
+# ------------------------------------------------------------------------------
+def test_prefetch_url_fetcher_task_fetchers():
+    """Each prefetch task can have its own URL fetcher."""
+
+    task_fetchers = []
+
+    def task_url_fetcher():
+        def fetcher(url: str, *args, **kwargs):
+            return {'string': f'{n}:{url}'.encode()}
+
+        n = len(task_fetchers)
+        task_fetchers.append(fetcher)
+        return fetcher
+
+    def shared_fetcher(url: str, *args, **kwargs):
+        return {'string': url.encode()}
+
+    html = '<img src="docma:swatch?a=1"><img src="docma:swatch?a=2">'
+    prefetcher = prefetch_url_fetcher(html, shared_fetcher, task_url_fetcher)
+    assert len(task_fetchers) == 2
+    results = {prefetcher(f'docma:swatch?a={a}')['string'] for a in (1, 2)}
+    assert {r.split(b':', 1)[0] for r in results} == {b'0', b'1'}
+    assert prefetcher('file:x.png')['string'] == b'file:x.png'
+
+
+# ------------------------------------------------------------------------------
+def test_document_to_weasy_prefetch_contexts(monkeypatch, tmp_path):
+    """Concurrently prefetched docma: URLs don't share the rendering context."""
+
+    contexts = []
+
+    def recording_url_fetcher(url, context, *args, **kwargs):
+        contexts.append(context)
+        context.params['touched'] = url
+        return {'string': b'', 'mime_type': 'image/png'}
+
+    monkeypatch.setattr('docma.docma_core.docma_url_fetcher', recording_url_fetcher)
+    monkeypatch.setattr('docma.docma_core.html_to_document', lambda html, **kwargs: 'document')
+    with PackageWriter.new(tmp_path / 'pkg') as tpkg:
+        tpkg.write_string('<img src="docma:a"><img src="docma:b">', 'doc.html')
+    with PackageReader.new(tmp_path / 'pkg') as tpkg:
+        context = DocmaRenderContext(tpkg, {'x': 1})
+        assert document_to_weasy('doc.html', context) == 'document'
+    assert len(contexts) == 2
+    assert all(c is not context and c.params['x'] == 1 for c in contexts)
+    assert 'touched' not in context.params
+
+
+# ------------------------------------------------------------------------------
+def test_prefetch_url_fetcher_single_url():
+    """Prefetching a single URL is pointless."""
+
+    def fetcher(url: str, *args, **kwargs):
+        return {}
+
+    assert prefetch_url_fetcher('<img src="https://x.com/a">', fetcher) is fetcher
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize(
+    'error, transient',
+    [
+        (DocmaUrlFetchError('docma:x: Not found'), False),
+        (ConnectionRefusedError('refused'), True),
+    ],
+)
+def test_document_to_weasy_fetch_errors(error, transient, monkeypatch, tmp_path):
+    """Transient URL fetch errors, which WeasyPrint would suppress, are raised."""
+
+    def failing_url_fetcher(url, *args, **kwargs):
+        raise DocmaUrlFetchError(f'{url}: {error}') from error
+
+    def weasy_html_to_document(html, url_fetcher, **kwargs):
+        # WeasyPrint logs URL fetch errors and carries on.
+        with suppress(Exception):
+            url_fetcher('docma:x')
+        return 'document'
+
+    monkeypatch.setattr('docma.docma_core.docma_url_fetcher', failing_url_fetcher)
+    monkeypatch.setattr('docma.docma_core.html_to_document', weasy_html_to_document)
+    with PackageWriter.new(tmp_path / 'pkg') as tpkg:
+        tpkg.write_string('<img src="docma:x">', 'doc.html')
+    with PackageReader.new(tmp_path / 'pkg') as tpkg:
+        context = DocmaRenderContext(tpkg)
+        if not transient:
+            assert document_to_weasy('doc.html', context) == 'document'
+            return
+        with pytest.raises(Exception, match='Error rendering doc.html: docma:x: refused') as exc:
+            document_to_weasy('doc.html', context)
+        assert exc.value.__cause__.__cause__ is error
+
+
 # ------------------------------------------------------------------------------
 def test_get_template_info_ok(dirs, tmp_path):
 
@@ -655,3 +791,533 @@ def test_rectangles_approx_equal(width_1, height_1, width_2, height_2, are_simil
         )
         == are_similar
     )
+
+
+# ------------------------------------------------------------------------------
+def test_template_session_ok(dirs, tmp_path):
+    compile_template(dirs.templates / 'test1.src', str(tmp_path))
+    test_text = 'Welcome to docma!'
+
+    with TemplateSession(str(tmp_path)) as session:
+        # Same session should be reusable across renders and formats
+        for _ in range(2):
+            pdf = session.render_pdf({})
+            assert test_text in pdf.pages[0].extract_text(0)
+            pdf = session.render_pdf({}, watermark=['grid'])
+            assert test_text in pdf.pages[0].extract_text(0)
+        html = session.render_html({})
+        assert html.head.title.text.strip() == test_text
+
+
+# ------------------------------------------------------------------------------
+def test_template_session_render_pdf_single_pass(tmp_path, monkeypatch):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    documents = ['a.html', 'b.html', 'c.pdf', 'd.html']
+    (src_dir / 'config.yaml').write_text(
+        'id: single\ndescription: single\nowner: me\nversion: "1.0.0"\ndocuments:\n'
+        + ''.join(f'  - content/{d}\n' for d in documents)
+    )
+    for d in documents[:2] + documents[3:]:
+        (src_dir / 'content' / d).write_text(
+            '<html><body>{{ docma.template.doc_no }}:{{ docma.template.page }}</body></html>'
+        )
+    (src_dir / 'content' / 'c.pdf').write_bytes(
+        html_to_document('<html><body>PDF</body></html>').write_pdf()
+    )
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+
+    calls = []
+
+    def counting_documents_to_pdf(docs):
+        calls.append(len(docs))
+        return documents_to_pdf(docs)
+
+    monkeypatch.setattr('docma.docma_core.documents_to_pdf', counting_documents_to_pdf)
+    with TemplateSession(str(tmp_path / 'pkg')) as session:
+        pdf = session.render_pdf({})
+    # HTML documents either side of the PDF are each written as one PDF
+    assert calls == [2, 1]
+    assert [p.extract_text(0) for p in pdf.pages] == ['1:1', '2:2', 'PDF', '4:4']
+
+
+# ------------------------------------------------------------------------------
+def test_template_session_render_pdf_deduplicate(tmp_path):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: dedup\ndescription: dedup\nowner: me\nversion: "1.0.0"\ndocuments:\n'
+        '  - content/a.pdf\n  - content/b.pdf\n'
+    )
+    # Two static PDFs with identical (largish) content
+    static_pdf = pypdf.PdfWriter()
+    page = static_pdf.add_blank_page(200, 200)
+    content = pypdf.generic.DecodedStreamObject()
+    content.set_data(b''.join(f'0 0 m {n} {n} l S\n'.encode() for n in range(1000)))
+    page.replace_contents(content)
+    for name in ('a.pdf', 'b.pdf'):
+        static_pdf.write(src_dir / 'content' / name)
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+
+    sizes = {}
+    with TemplateSession(str(tmp_path / 'pkg')) as session:
+        for deduplicate in (False, True):
+            buf = BytesIO()
+            pdf = session.render_pdf({}, deduplicate=deduplicate)
+            assert len(pdf.pages) == 2
+            pdf.write(buf)
+            sizes[deduplicate] = len(buf.getvalue())
+    assert sizes[True] < sizes[False] - len(content.get_data()) // 2
+
+
+# ------------------------------------------------------------------------------
+def text_pdf(path: Path, text: str, pages: int = 1, width: int = 595, height: int = 842):
+    """Create a simple PDF with some text on each page."""
+
+    name = pypdf.generic.NameObject
+    font = pypdf.generic.DictionaryObject(
+        {name('/Type'): name('/Font'), name('/Subtype'): name('/Type1')}
+    )
+    font[name('/BaseFont')] = name('/Helvetica')
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        page = writer.add_blank_page(width, height)
+        page[name('/Resources')] = pypdf.generic.DictionaryObject(
+            {name('/Font'): pypdf.generic.DictionaryObject({name('/F1'): font})}
+        )
+        content = pypdf.generic.DecodedStreamObject()
+        content.set_data(f'BT /F1 24 Tf 72 400 Td ({text}) Tj ET'.encode())
+        page.replace_contents(content)
+    writer.write(path)
+
+
+# ------------------------------------------------------------------------------
+def test_template_session_overlay_form_xobject(tmp_path):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: ovl\ndescription: ovl\nowner: me\nversion: "1.0.0"\n'
+        'documents:\n  - content/body.pdf\n'
+        'overlays:\n'
+        '  copy:\n    - content/letter.pdf\n    - content/copy.pdf\n'
+        '  draft: content/draft.html\n'
+        '  letter: content/letter.pdf\n'
+    )
+    text_pdf(src_dir / 'content' / 'body.pdf', 'Body', pages=3)
+    text_pdf(src_dir / 'content' / 'copy.pdf', 'COPY')
+    text_pdf(src_dir / 'content' / 'letter.pdf', 'LETTER', width=612, height=792)
+    (src_dir / 'content' / 'draft.html').write_text('<html><body>DRAFT</body></html>')
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+
+    with TemplateSession(str(tmp_path / 'pkg')) as session:
+        for over in ('stamp', 'watermark'):
+            buf = BytesIO()
+            session.render_pdf({}, **{over: ['copy']}).write(buf)
+            pdf = pypdf.PdfReader(buf)
+            assert len(pdf.pages) == 3
+            forms = set()
+            for page in pdf.pages:
+                assert page.extract_text(0).split() == (
+                    ['Body', 'COPY'] if over == 'stamp' else ['COPY', 'Body']
+                )
+                xobjects = page['/Resources']['/XObject']
+                forms.update(xobjects.raw_get(name).idnum for name in xobjects)
+            # All pages share one copy of the overlay
+            assert len(forms) == 1
+
+        with pytest.raises(Exception, match='No overlay found for page 1'):
+            session.render_pdf({}, stamp=['letter'])
+
+        # HTML overlays are only rendered once per session for the same content
+        session.overlay_cache.clear()
+        for _ in range(3):
+            session.render_pdf({}, watermark=['draft'])
+        assert session.overlay_cache.stats['misses'] == 1
+        assert session.overlay_cache.stats['hits'] == 2
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize(
+    'r1, r2, same',
+    [
+        ((0, 0, 595, 842), (0, 0, 595.2756, 841.8898), True),
+        ((0, 0, 595, 842), (0, 0, 842, 595), False),
+    ],
+)
+def test_geometry_key(r1, r2, same):
+    assert (geometry_key(RectangleObject(r1)) == geometry_key(RectangleObject(r2))) == same
+
+
+# ------------------------------------------------------------------------------
+def test_template_session_doc_cache(tmp_path, monkeypatch):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: cache\ndescription: cache\nowner: me\nversion: "1.0.0"\ndocuments:\n'
+        '  - content/static.html\n  - content/dynamic.html\n  - content/generated.html\n'
+    )
+    (src_dir / 'content' / 'static.html').write_text(
+        # Jinja so that it's not pre-rendered at compile time
+        '<html><body><img src="file:logo.svg">{{ "Terms" }}</body></html>'
+    )
+    (src_dir / 'logo.svg').write_text('<svg xmlns="http://www.w3.org/2000/svg"/>')
+    (src_dir / 'content' / 'dynamic.html').write_text('<html><body>{{ name }}</body></html>')
+    # Generated content may depend on the rendering params, so is never cached
+    (src_dir / 'content' / 'generated.html').write_text(
+        '<html><body><img src="docma:swatch?width=10&height=10"></body></html>'
+    )
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+
+    layouts = []
+
+    def counting_html_to_document(html, **kwargs):
+        layouts.append(html)
+        return html_to_document('<html></html>', **kwargs)
+
+    monkeypatch.setattr('docma.docma_core.html_to_document', counting_html_to_document)
+    monkeypatch.setenv(DOC_CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    with TemplateSession(str(tmp_path / 'pkg')) as session:
+        for n, expected in enumerate([3, 3, 2, 2]):
+            layouts.clear()
+            pdf = session.render_pdf({'name': f'fred{n}'})
+            assert len(pdf.pages) == 3
+            assert len(layouts) == expected
+        # The static document was only laid out twice: once with the other
+        # documents and once on its own to be cached.
+        assert session.doc_cache.stats['memory']['hits'] == 2
+
+    # A new session picks up the static document from the disk tier
+    with TemplateSession(str(tmp_path / 'pkg')) as session:
+        layouts.clear()
+        session.render_pdf({'name': 'barney'})
+        assert not any('Terms' in html for html in layouts)
+        assert session.doc_cache.stats['disk']['hits'] == 1
+
+
+# ------------------------------------------------------------------------------
+def test_template_session_doc_cache_package_changed(tmp_path, monkeypatch):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: cache\ndescription: cache\nowner: me\nversion: "1.0.0"\ndocuments:\n'
+        '  - content/terms.html\n'
+    )
+    (src_dir / 'content' / 'terms.html').write_text(
+        '<html><body><img src="file:logo.svg">{{ "Terms" }}</body></html>'
+    )
+    (src_dir / 'logo.svg').write_text('<svg xmlns="http://www.w3.org/2000/svg"/>')
+
+    layouts = []
+
+    def counting_html_to_document(html, **kwargs):
+        layouts.append(html)
+        return html_to_document('<html></html>', **kwargs)
+
+    monkeypatch.setattr('docma.docma_core.html_to_document', counting_html_to_document)
+    monkeypatch.setenv(DOC_CACHE_DIR_ENV, str(tmp_path / 'cache'))
+
+    def render_twice() -> int:
+        """Render twice in a new session and return the doc cache disk hits."""
+        with TemplateSession(str(tmp_path / 'pkg')) as session:
+            for _ in range(2):
+                session.render_pdf({})
+            return session.doc_cache.stats['disk']['hits']
+
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+    render_twice()
+    assert render_twice() == 1
+
+    # A new logo: the disk cache entry from the old template is not used.
+    (src_dir / 'logo.svg').write_text('<svg xmlns="http://www.w3.org/2000/svg" width="9"/>')
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+    layouts.clear()
+    assert render_twice() == 0
+    assert len(layouts) == 2
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize(
+    'html, is_static',
+    [
+        ('<html><body>Hello</body></html>', True),
+        ('<html><body><img src="file:logo.png"><img src="data:,x"></body></html>', True),
+        ('<html><body>{{ name }}</body></html>', False),
+        ('<html><body>{# comment #}</body></html>', False),
+        ('<html><body>{% if x %}{% endif %}</body></html>', False),
+        ('<html><body>{% if x %}</body></html>', False),
+        ('<html><body><img src="docma:swatch?width=10"></body></html>', False),
+        ('<html><body><img src="https://example.com/logo.png"></body></html>', False),
+        ('<html><body><img src="logo.png"></body></html>', False),
+    ],
+)
+def test_is_static_html(html, is_static):
+    assert is_static_html(html) == is_static
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('dynamic', [False, True])
+def test_template_session_stylesheet_context(dynamic, tmp_path, monkeypatch):
+    """Stylesheets are only shared between renders if they don't use docma: URLs."""
+
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: css\ndescription: css\nowner: me\nversion: "1.0.0"\n'
+        'documents:\n  - content/a.html\noptions:\n  stylesheets:\n    - styles.css\n'
+    )
+    (src_dir / 'content' / 'a.html').write_text('<html><body>{{ name }}</body></html>')
+    (src_dir / 'styles.css').write_text(
+        '@import url("docma:query?x=y");\n' if dynamic else 'p { color: red; }\n'
+    )
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+
+    names = []
+
+    def recording_set_weasy_options(*args, url_fetcher, **kwargs):
+        names.append(url_fetcher.keywords['context'].params.get('name'))
+
+    monkeypatch.setattr('docma.docma_core.set_weasy_options', recording_set_weasy_options)
+    with TemplateSession(str(tmp_path / 'pkg')) as session:
+        for name in ('fred', 'barney'):
+            session.render_pdf({'name': name})
+    assert names == (['fred', 'barney'] if dynamic else [None])
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('pkg_name', ['pkg', 'pkg.zip'])
+def test_template_prerender(tmp_path, monkeypatch, pkg_name):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: pre\ndescription: pre\nowner: me\nversion: "1.0.0"\ndocuments:\n'
+        '  - content/static.html\n  - content/dynamic.html\n  - content/terms.html\n'
+    )
+    (src_dir / 'content' / 'static.html').write_text('<html><body>Static</body></html>')
+    (src_dir / 'content' / 'dynamic.html').write_text('<html><body>{{ name }}</body></html>')
+    (src_dir / 'content' / 'terms.md').write_text('# Terms\n\nNo Jinja here.\n')
+    compile_template(str(src_dir), str(tmp_path / pkg_name))
+
+    with PackageReader.new(tmp_path / pkg_name) as tpkg:
+        for doc_path, expected in (
+            ('content/static.html', True),
+            ('content/terms.html', True),
+            ('content/dynamic.html', False),
+        ):
+            assert tpkg.exists(prerendered_path(doc_path, tpkg.read_text(doc_path))) == expected
+
+    layouts = []
+
+    def counting_html_to_document(html, **kwargs):
+        layouts.append(html)
+        return html_to_document(html, **kwargs)
+
+    monkeypatch.setattr('docma.docma_core.html_to_document', counting_html_to_document)
+    with TemplateSession(str(tmp_path / pkg_name)) as session:
+        for name in ('fred', 'barney'):
+            layouts.clear()
+            pdf = session.render_pdf({'name': name})
+            assert len(pdf.pages) == 3
+            assert layouts == [f'<html><body>{name}</body></html>']
+
+
+# ------------------------------------------------------------------------------
+def test_template_prerender_recompile(tmp_path, monkeypatch):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: pre\ndescription: pre\nowner: me\nversion: "1.0.0"\ndocuments:\n'
+        '  - content/static.html\n'
+    )
+    (src_dir / 'content' / 'static.html').write_text('<html><body>Static</body></html>')
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+    assert list((tmp_path / 'pkg').glob(f'{PRERENDER_DIR}/**/*.pdf'))
+
+    # Recompile into the same directory after the document becomes dynamic.
+    (src_dir / 'content' / 'static.html').write_text('<html><body>{{ name }}</body></html>')
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+    assert not list((tmp_path / 'pkg').glob(f'{PRERENDER_DIR}/**/*.pdf'))
+    layouts = []
+
+    def counting_html_to_document(html, **kwargs):
+        layouts.append(html)
+        return html_to_document(html, **kwargs)
+
+    monkeypatch.setattr('docma.docma_core.html_to_document', counting_html_to_document)
+    with TemplateSession(str(tmp_path / 'pkg')) as session:
+        session.render_pdf({'name': 'Dynamic'})
+        assert layouts == ['<html><body>Dynamic</body></html>']
+
+
+# ------------------------------------------------------------------------------
+def test_template_prerender_stale_source(tmp_path, monkeypatch):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: pre\ndescription: pre\nowner: me\nversion: "1.0.0"\ndocuments:\n'
+        '  - content/static.html\n'
+    )
+    (src_dir / 'content' / 'static.html').write_text('<html><body>Static</body></html>')
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+
+    # Change the document in the compiled package. The pre-rendered PDF is ignored.
+    (tmp_path / 'pkg' / 'content' / 'static.html').write_text(
+        '<html><body>{{ name }}</body></html>'
+    )
+    layouts = []
+
+    def counting_html_to_document(html, **kwargs):
+        layouts.append(html)
+        return html_to_document(html, **kwargs)
+
+    monkeypatch.setattr('docma.docma_core.html_to_document', counting_html_to_document)
+    with TemplateSession(str(tmp_path / 'pkg')) as session:
+        session.render_pdf({'name': 'Dynamic'})
+        assert layouts == ['<html><body>Dynamic</body></html>']
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('pkg_name', ['pkg', 'pkg.zip'])
+def test_package_pdf_cached(tmp_path, pkg_name):
+    text_pdf(tmp_path / 'brochure.pdf', 'Brochure', pages=2)
+    with PackageWriter.new(tmp_path / pkg_name) as tpkg:
+        tpkg.add_file(tmp_path / 'brochure.pdf', 'brochure.pdf')
+
+    with PackageReader.new(tmp_path / pkg_name) as tpkg:
+        context = DocmaRenderContext(tpkg)
+        pdf = document_to_pdf('brochure.pdf', context)
+        assert len(pdf.pages) == 2
+        assert document_to_pdf('brochure.pdf', context) is pdf
+
+        # Each thread gets its own reader
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            other = executor.submit(document_to_pdf, 'brochure.pdf', context).result()
+        assert other is not pdf
+        assert len(other.pages) == 2
+
+    if pkg_name == 'pkg':
+        # Changed content is picked up. Rewriting the file in place doesn't
+        # affect the cached reader.
+        text_pdf(tmp_path / pkg_name / 'brochure.pdf', 'Brochure', pages=3)
+        assert len(pdf.pages) == 2
+        with PackageReader.new(tmp_path / pkg_name) as tpkg:
+            assert len(document_to_pdf('brochure.pdf', DocmaRenderContext(tpkg)).pages) == 3
+
+
+# ------------------------------------------------------------------------------
+def test_template_session_not_a_template_fail(tmp_path):
+    with pytest.raises(DocmaPackageError, match='Not a compiled docma template package'):
+        TemplateSession(str(tmp_path))
+
+
+# ------------------------------------------------------------------------------
+def test_coalesce_docma_render_params_no_side_effects():
+    config = {
+        'id': 'x',
+        'description': 'x',
+        'owner': 'x',
+        'version': '1.0.0',
+        'parameters': {'defaults': {'a': {'x': 1}}},
+    }
+    params = coalesce_docma_render_params(config, {'a': {'y': 2}})
+    assert params['a'] == {'x': 1, 'y': 2}
+    assert params['docma']['template']['id'] == 'x'
+    # Neither the config nor the global Jinja extras should have been modified.
+    assert config['parameters']['defaults'] == {'a': {'x': 1}}
+    assert 'template' not in DOCMA_JINJA_EXTRAS
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('pkg_name', ['pkg', 'pkg.zip'])
+def test_template_bytecode_ok(tmp_path, pkg_name):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: bytecode\ndescription: bytecode\nowner: me\nversion: "1.0.0"\n'
+        'documents:\n  - content/main.html\n'
+        'parameters:\n  defaults:\n    locale: en_AU\n'
+    )
+    (src_dir / 'content' / 'main.html').write_text(
+        '<html><body>Hello {{ name }} {% include "content/part.html" %}</body></html>'
+    )
+    (src_dir / 'content' / 'part.html').write_text('<p>{{ name | upper }}</p>')
+    compile_template(str(src_dir), str(tmp_path / pkg_name))
+
+    with TemplateSession(str(tmp_path / pkg_name)) as session:
+        assert len(list(session.tpkg.namelist(JINJA_BYTECODE_DIR))) == 2
+        html = session.render_html({'name': 'fred'})
+        assert 'Hello fred' in html.text
+        assert 'FRED' in html.text
+        # Both the document and the included partial come from bytecode
+        assert session.env.bytecode_cache.hits == 2
+        assert session.env.bytecode_cache.misses == 0
+
+
+# ------------------------------------------------------------------------------
+def test_template_bytecode_stale_ignored(tmp_path):
+    pkg = tmp_path / 'pkg'
+    with PackageWriter.new(pkg) as tpkg:
+        tpkg.write_string('Hello {{ name }}', 'a.html')
+        write_template_bytecode('Hello {{ name }}', Path('a.html'), tpkg)
+        # Source changed after the bytecode was created
+        tpkg.write_string('Goodbye {{ name }}', 'a.html')
+
+    with PackageReader.new(pkg) as tpkg:
+        context = DocmaRenderContext(tpkg, params={'name': 'fred'})
+        assert get_document_template('a.html', context).render(name='fred') == 'Goodbye fred'
+        assert context.env.bytecode_cache.misses == 1
+
+
+# ------------------------------------------------------------------------------
+def test_template_session_warm_up(tmp_path, monkeypatch, caplog):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: warm\ndescription: warm\nowner: me\nversion: "1.0.0"\n'
+        'parameters:\n  defaults:\n    locale: en_AU\ndocuments:\n  - content/a.html\n'
+    )
+    (src_dir / 'content' / 'a.html').write_text(
+        '<html><body>{{ n | phone }}{% if 3 is odd %}Y{% endif %}</body></html>'
+    )
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+
+    locales = []
+    monkeypatch.setattr('babel.localedata.load', lambda name: locales.append(name))
+    with TemplateSession(str(tmp_path / 'pkg')) as session:
+        session.warm_up()
+        assert 'phone' in session.env.filters._plugins  # noqa: SLF001
+        assert 'odd' in session.env.tests._plugins  # noqa: SLF001
+        assert locales == ['en_AU']
+
+        renders = []
+        monkeypatch.setattr(session, 'render_pdf', lambda params: renders.append(params) or 1 / 0)
+        with caplog.at_level(logging.WARNING, logger=LOGNAME):
+            session.warm_up({'n': '0491 570 006'})
+        assert renders == [{'n': '0491 570 006'}]
+        assert 'Warm-up render failed' in caplog.text
+
+
+# ------------------------------------------------------------------------------
+def test_template_session_validate_params(tmp_path, monkeypatch):
+    src_dir = tmp_path / 'src'
+    (src_dir / 'content').mkdir(parents=True)
+    (src_dir / 'config.yaml').write_text(
+        'id: valid\ndescription: valid\nowner: me\nversion: "1.0.0"\n'
+        'parameters:\n  defaults:\n    locale: en_AU\n'
+        '  schema:\n    type: object\n    properties:\n      n: {type: integer}\n'
+        '    required: [n]\n'
+        'documents:\n  - content/a.html\n'
+    )
+    (src_dir / 'content' / 'a.html').write_text('<html><body>{{ n }}</body></html>')
+    compile_template(str(src_dir), str(tmp_path / 'pkg'))
+
+    with TemplateSession(str(tmp_path / 'pkg')) as session:
+        validator = session.params_validator
+        assert validator is session.params_validator
+        # The compiled validator gets reused instead of creating a new one.
+        monkeypatch.setattr('jsonschema.validate', lambda *a, **k: 1 / 0)
+        session.validate_params({'n': 1})
+        assert '1' in session.render_html({'n': 1}).body.text
+        with pytest.raises(jsonschema.ValidationError, match="'x' is not of type 'integer'"):
+            session.validate_params({'n': 'x'}, 'HTML')
+        with pytest.raises(jsonschema.ValidationError, match="'n' is a required property"):
+            session.render_html({})